@@ -1,6 +1,7 @@
 from flask import Flask, session
 from .config import Config
 from .extension import db, migrate
+from . import cache
 from .routes.reservation import reservation_bp, init_scheduler
 from .routes.cart import cart_bp
 from .routes.favorites import favorites_bp
@@ -9,15 +10,18 @@ from .routes.report import report_bp
 from .routes import home, incubatee_showroom, layouts, shop, notification, login, admin, contact, about, user
 from .utils.auto_stock_notifier import get_auto_notifier
 from .routes.void_product import void_bp
+from .utils.json_provider import FastJSONProvider
 
 
 def create_app(config_class=Config):
     app = Flask(__name__, template_folder="templates", static_folder="static")
     app.config.from_object(config_class)
+    app.json = FastJSONProvider(app)
 
     # Initialize Flask extensions
     db.init_app(app)
     migrate.init_app(app, db)
+    cache.init_app(app)
 
     # Register blueprints
     app.register_blueprint(about.about_bp)
@@ -50,7 +54,34 @@ def create_app(config_class=Config):
             print(f"⚠️ Could not initialize popularity data: {e}")
             
     # Initialize the scheduler with the app
-    init_scheduler(app)
+    scheduler = init_scheduler(app)
+    
+    # Roll the rolling popularity windows over daily and add `flask backfill-popularity-windows`
+    from app.services.popularity_service import ProductPopularityService
+    ProductPopularityService.init_app(app, scheduler)
+    
+    # Deliver queued emails in the background
+    from .utils.email_outbox import email_outbox
+    email_outbox.init_app(app, scheduler)
+    
+    # Serve catalog searches from an in-memory index kept in sync across workers
+    from .services.catalog_index import catalog_index
+    catalog_index.init_app(app, scheduler, cache.get_redis_client)
+    
+    # Generate XLSX/Parquet sales exports in the background
+    from .services.report_export import report_exports
+    report_exports.init_app(app, scheduler, cache.get_redis_client)
+    
+    from .utils import email_stats
+    email_stats.init_app(app)
+    
+    # Keep the product search index current and add `flask rebuild-search-index`
+    from .services.product_search import ProductSearch
+    ProductSearch.init_app(app)
+    
+    # Keep sales_daily_rollup current and add `flask backfill-sales-rollup`
+    from .services.sales_rollup import SalesRollup
+    SalesRollup.init_app(app)
     
     # Initialize auto stock notifier AFTER app context is fully set up
     from .utils.auto_stock_notifier import init_auto_notifier
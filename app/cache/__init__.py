@@ -0,0 +1,51 @@
+# app/cache/__init__.py
+"""
+Shared two-tier cache for all blueprints.
+
+Reads check a size-bounded LRU in the worker's own memory first
+(CACHE_LOCAL_MAX_ENTRIES entries, at most CACHE_LOCAL_TTL_SECONDS old), then
+Redis. Invalidations delete from Redis and are published on
+`cache:invalidate` so every worker drops its local copies.
+
+get_or_set and @cached coalesce concurrent misses (one rebuild per key across
+all workers) and can serve an expired value while it is rebuilt.
+
+Entries are registered under tags when they are written and invalidated by
+tag, so a write only touches the entries it affects. Tags in use:
+
+    products                every product listing (admin and shop)
+    product:<id>            anything showing one product's data or queue
+    incubatee:<id>          one incubatee's details, logo and products
+    incubatees              incubatee lists
+    reservations            every reservation list
+    reservations:global     reservation lists not scoped to one user or product
+    user:<id>               one user's reservation lists
+    sales                   sales reports and summaries
+    shop                    shop pages
+    pricing_units, users, admin
+"""
+from .store import (
+    init_app,
+    get_redis_client,
+    cache_key,
+    get_cached_data,
+    set_cached_data,
+    invalidate_tags,
+    invalidate_keys,
+    cache_stats,
+)
+from .singleflight import get_or_set
+from .decorators import cached
+
+__all__ = [
+    "init_app",
+    "cached",
+    "get_or_set",
+    "cache_stats",
+    "get_redis_client",
+    "cache_key",
+    "get_cached_data",
+    "set_cached_data",
+    "invalidate_tags",
+    "invalidate_keys",
+]
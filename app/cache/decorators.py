@@ -0,0 +1,55 @@
+# app/cache/decorators.py
+from functools import wraps
+from flask import request, jsonify, make_response
+from .store import cache_key
+from .singleflight import get_or_set
+
+
+class _Uncacheable(Exception):
+    """Carries a non-200 view response past get_or_set without caching it"""
+
+    def __init__(self, response):
+        super().__init__(response.status_code)
+        self.response = response
+
+
+def cached(prefix, expire_seconds=3600, tags=(), vary_on_query=False, stale_seconds=0, vary_on=None):
+    """
+    Cache the JSON body of a view's 200 responses.
+
+    The key is `prefix` followed by the view arguments (and the sorted query
+    string with vary_on_query=True). `vary_on` is a callable taking the view
+    arguments and returning further key parts for the current request, e.g.
+    normalized filters and a data version. `tags` is a tuple or a callable
+    taking the view arguments, e.g. tags=lambda product_id: (f"product:{product_id}",).
+
+    Concurrent misses are coalesced so only one request per key rebuilds it;
+    with stale_seconds the expired value keeps being served for that long
+    while the rebuild runs.
+
+    Runs before anything else in the view, so keep permission checks outside
+    the cached function.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            parts = list(args) + [kwargs[name] for name in sorted(kwargs)]
+            if vary_on_query and request.args:
+                parts += [f"{name}={value}" for name, value in sorted(request.args.items(multi=True))]
+            if vary_on is not None:
+                parts += list(vary_on(*args, **kwargs))
+            key = cache_key(prefix, *parts)
+
+            def build():
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or not response.is_json:
+                    raise _Uncacheable(response)
+                return response.get_json()
+
+            entry_tags = tags(*args, **kwargs) if callable(tags) else tags
+            try:
+                return jsonify(get_or_set(key, build, expire_seconds, entry_tags, stale_seconds))
+            except _Uncacheable as e:
+                return e.response
+        return wrapper
+    return decorator
@@ -0,0 +1,84 @@
+# app/cache/local.py
+import threading
+import time
+from collections import OrderedDict
+
+
+class LocalCache:
+    """
+    Size-bounded LRU with per-entry TTL, private to one worker process.
+
+    Values are stored as the decoded Python objects so a hit costs neither a
+    Redis round trip nor json.loads. Entries set with tags are indexed so
+    invalidate_tags works even when Redis is unavailable.
+    """
+
+    def __init__(self, max_entries=2048, on_evict=None):
+        self.max_entries = max_entries
+        self.on_evict = on_evict
+        self._entries = OrderedDict()  # key -> (expires_at, value, tags)
+        self._tags = {}  # tag -> set of keys
+        self._lock = threading.Lock()
+        # Bumped on every invalidation; lets a reader tell that its Redis
+        # value may predate an invalidation and must not be kept locally
+        self.generation = 0
+
+    def get(self, key):
+        """Return (value, found)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, False
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                return None, False
+            self._entries.move_to_end(key)
+            return entry[1], True
+
+    def set(self, key, value, ttl_seconds, tags=(), generation=None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl_seconds, value, tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                evicted = next(iter(self._entries))
+                self._remove(evicted)
+                if self.on_evict:
+                    self.on_evict(evicted)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def delete(self, *keys):
+        with self._lock:
+            self.generation += 1
+            for key in keys:
+                self._remove(key)
+
+    def invalidate_tags(self, *tags):
+        with self._lock:
+            self.generation += 1
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._tags.clear()
+
+    def __len__(self):
+        return len(self._entries)
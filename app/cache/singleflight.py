@@ -0,0 +1,175 @@
+# app/cache/singleflight.py
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from . import store
+from .store import FRESH_PREFIX, local_cache, stats, get_redis_client, set_cached_data
+
+logger = logging.getLogger(__name__)
+
+LOCK_PREFIX = "lock:"
+
+# How long an expired entry may still be served while one worker rebuilds it
+DEFAULT_STALE_SECONDS = 300
+# Upper bound on a rebuild; waiters stop waiting and the lock expires after this
+LOCK_TIMEOUT_SECONDS = 30
+WAIT_POLL_SECONDS = 0.05
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# key -> Future of the build running in this worker
+_inflight = {}
+# key -> expired value served to this worker's other threads while it is rebuilt
+_stale_values = {}
+_inflight_lock = threading.Lock()
+
+
+def get_or_set(key, builder, expire_seconds=3600, tags=(), stale_seconds=DEFAULT_STALE_SECONDS):
+    """
+    Return the cached value for `key`, calling builder() to rebuild it at most
+    once across all workers.
+
+    - Threads of one worker asking for the same key share one build (a local
+      future).
+    - Across workers a Redis lock (SET NX PX) picks the single rebuilder.
+    - For stale_seconds after expiry the old value is served to everyone
+      except the rebuilder (stale-while-revalidate). On a cold miss the
+      other workers wait for the rebuilder instead of querying too.
+
+    If builder() raises, nothing is cached and the exception propagates.
+    """
+    data, found = local_cache.get(key)
+    if found:
+        stats.incr(key, "local_hits")
+        return data
+
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+
+    if not leader:
+        stale = _stale_values.get(key)
+        if stale is not None:
+            stats.incr(key, "stale_hits")
+            return stale
+        stats.incr(key, "coalesced")
+        try:
+            return future.result(timeout=LOCK_TIMEOUT_SECONDS)
+        except Exception:
+            # The build we waited on failed or hung; do our own
+            return builder()
+
+    try:
+        result = _get_or_build(key, builder, expire_seconds, tags, stale_seconds)
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def _build_and_store(key, builder, expire_seconds, tags, stale_seconds):
+    data = builder()
+    set_cached_data(key, data, expire_seconds, tags=tags, stale_seconds=stale_seconds)
+    return data
+
+
+def _get_or_build(key, builder, expire_seconds, tags, stale_seconds):
+    client = get_redis_client()
+    if not client:
+        stats.incr(key, "misses")
+        return _build_and_store(key, builder, expire_seconds, tags, stale_seconds)
+
+    try:
+        generation = local_cache.generation
+        pipe = client.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.pttl(FRESH_PREFIX + key)
+        cached, fresh_ms = pipe.execute()
+    except Exception as e:
+        logger.warning(f"Cache get error for key {key}: {str(e)}")
+        stats.incr(key, "misses")
+        return _build_and_store(key, builder, expire_seconds, tags, stale_seconds)
+
+    if cached:
+        data = json.loads(cached)
+        if not stale_seconds or (fresh_ms and fresh_ms > 0):
+            local_ttl = min(store.LOCAL_TTL_SECONDS, fresh_ms / 1000) if fresh_ms and fresh_ms > 0 else store.LOCAL_TTL_SECONDS
+            local_cache.set(key, data, local_ttl, generation=generation)
+            stats.incr(key, "redis_hits")
+            return data
+
+        # Expired but still within the stale window
+        token = _try_lock(client, key)
+        if token is None:
+            stats.incr(key, "stale_hits")
+            return data
+        _stale_values[key] = data
+        try:
+            stats.incr(key, "misses")
+            return _build_and_store(key, builder, expire_seconds, tags, stale_seconds)
+        except Exception as e:
+            logger.warning(f"Cache rebuild failed for {key}, serving stale value: {str(e)}")
+            stats.incr(key, "stale_hits")
+            return data
+        finally:
+            _stale_values.pop(key, None)
+            _release_lock(client, key, token)
+
+    # Cold miss: one worker builds, the others wait for its result
+    stats.incr(key, "misses")
+    token = _try_lock(client, key)
+    if token is not None:
+        try:
+            return _build_and_store(key, builder, expire_seconds, tags, stale_seconds)
+        finally:
+            _release_lock(client, key, token)
+
+    deadline = time.monotonic() + LOCK_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_POLL_SECONDS)
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.get(key)
+            pipe.exists(LOCK_PREFIX + key)
+            cached, locked = pipe.execute()
+        except Exception:
+            break
+        if cached:
+            stats.incr(key, "coalesced")
+            return json.loads(cached)
+        if not locked:
+            # The rebuilder gave up without caching anything
+            break
+    return _build_and_store(key, builder, expire_seconds, tags, stale_seconds)
+
+
+def _try_lock(client, key):
+    token = uuid.uuid4().hex
+    try:
+        if client.set(LOCK_PREFIX + key, token, nx=True, px=LOCK_TIMEOUT_SECONDS * 1000):
+            return token
+        return None
+    except Exception:
+        # Redis trouble: build without coordination rather than fail the request
+        return token
+
+
+def _release_lock(client, key, token):
+    try:
+        client.eval(_RELEASE_LOCK_SCRIPT, 1, LOCK_PREFIX + key, token)
+    except Exception:
+        pass
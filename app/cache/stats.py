@@ -0,0 +1,37 @@
+# app/cache/stats.py
+import threading
+from collections import defaultdict
+
+COUNTERS = (
+    "local_hits", "redis_hits", "stale_hits", "misses", "coalesced",
+    "sets", "evictions", "invalidations"
+)
+
+
+class CacheStats:
+    """Per-namespace counters; the namespace is the key prefix before the first ':'"""
+
+    def __init__(self):
+        self._counts = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def namespace(key):
+        return key.split(":", 1)[0]
+
+    def incr(self, key, counter, amount=1):
+        with self._lock:
+            self._counts[self.namespace(key)][counter] += amount
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for namespace, counts in sorted(self._counts.items()):
+                hits = counts["local_hits"] + counts["redis_hits"] + counts["stale_hits"] + counts["coalesced"]
+                lookups = hits + counts["misses"]
+                result[namespace] = dict(counts, hit_rate=round(hits / lookups, 3) if lookups else None)
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
@@ -0,0 +1,237 @@
+# app/cache/store.py
+import json
+import logging
+import os
+import redis
+from .local import LocalCache
+from .stats import CacheStats
+
+logger = logging.getLogger(__name__)
+
+redis_client = None
+
+# Tag sets outlive every cached entry (longest entry TTL is 24 hours)
+TAG_TTL_SECONDS = 86400
+TAG_PREFIX = "tag:"
+# Marks a stale-while-revalidate entry as fresh until this key expires
+FRESH_PREFIX = "fresh:"
+
+# Local tier defaults, overridden by CACHE_LOCAL_* in the app config
+LOCAL_TTL_SECONDS = 60
+LOCAL_MAX_ENTRIES = 2048
+
+# Workers drop their local copies of the keys published here
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# Delete every key registered under the given tag sets, then the sets themselves,
+# and return the deleted keys. Runs atomically so an entry cached during
+# invalidation cannot lose its tag.
+_INVALIDATE_TAGS_SCRIPT = """
+local deleted = {}
+for _, tag in ipairs(KEYS) do
+    local members = redis.call('smembers', tag)
+    for _, key in ipairs(members) do
+        redis.call('del', key)
+        table.insert(deleted, key)
+    end
+    redis.call('del', tag)
+end
+return deleted
+"""
+
+stats = CacheStats()
+local_cache = LocalCache(LOCAL_MAX_ENTRIES, on_evict=lambda key: stats.incr(key, "evictions"))
+_listener_thread = None
+
+
+def get_redis_client():
+    """Get redis client with lazy initialization"""
+    global redis_client
+    if redis_client is None:
+        try:
+            redis_url = os.environ.get('redis_url')
+            if redis_url:
+                redis_client = redis.from_url(redis_url)
+            else:
+                # Fallback to local redis if no environment variable
+                redis_client = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
+        except Exception as e:
+            logger.error(f"Redis Connection failed: {str(e)}")
+            redis_client = None
+    return redis_client
+
+
+def init_app(app):
+    """Apply local tier settings and subscribe to cross-worker invalidations"""
+    global LOCAL_TTL_SECONDS, _listener_thread
+    LOCAL_TTL_SECONDS = app.config.get("CACHE_LOCAL_TTL_SECONDS", LOCAL_TTL_SECONDS)
+    local_cache.max_entries = app.config.get("CACHE_LOCAL_MAX_ENTRIES", LOCAL_MAX_ENTRIES)
+
+    client = get_redis_client()
+    if client is None or _listener_thread is not None:
+        return
+    try:
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{INVALIDATION_CHANNEL: _on_invalidation})
+        _listener_thread = pubsub.run_in_thread(
+            sleep_time=1.0, daemon=True, exception_handler=_on_listener_error
+        )
+    except Exception as e:
+        # Without the listener local entries can be stale for up to LOCAL_TTL_SECONDS
+        logger.warning(f"Cache invalidation listener not started: {str(e)}")
+
+
+def _on_invalidation(message):
+    try:
+        keys = json.loads(message["data"])
+    except (TypeError, ValueError):
+        return
+    local_cache.delete(*keys)
+
+
+def _on_listener_error(error, pubsub, thread):
+    global _listener_thread
+    logger.warning(f"Cache invalidation listener stopped: {str(error)}")
+    thread.stop()
+    _listener_thread = None
+    local_cache.clear()
+
+
+def _publish_invalidation(client, keys):
+    try:
+        client.publish(INVALIDATION_CHANNEL, json.dumps(list(keys)))
+    except Exception as e:
+        logger.warning(f"Cache invalidation publish failed: {str(e)}")
+
+
+def cache_key(prefix, *args):
+    """Generate cache key with prefix and arguments"""
+    key_parts = [prefix] + [str(arg) for arg in args]
+    return ":".join(key_parts)
+
+
+def tag_key(tag):
+    return f"{TAG_PREFIX}{tag}"
+
+
+def get_cached_data(key, expire_seconds=3600):
+    """
+    Get data from cache, return (data, found) tuple.
+    Checks this worker's memory first, then Redis. The returned object is
+    shared with the local tier and must not be mutated.
+    """
+    data, found = local_cache.get(key)
+    if found:
+        stats.incr(key, "local_hits")
+        return data, True
+
+    redis_client = get_redis_client()
+    if not redis_client:
+        stats.incr(key, "misses")
+        return None, False
+
+    try:
+        generation = local_cache.generation
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.pttl(key)
+        cached, ttl_ms = pipe.execute()
+        if cached:
+            data = json.loads(cached)
+            local_ttl = min(LOCAL_TTL_SECONDS, ttl_ms / 1000) if ttl_ms and ttl_ms > 0 else LOCAL_TTL_SECONDS
+            # Skipped if an invalidation arrived while we were reading
+            local_cache.set(key, data, local_ttl, generation=generation)
+            stats.incr(key, "redis_hits")
+            return data, True
+        stats.incr(key, "misses")
+        return None, False
+    except Exception as e:
+        logger.warning(f"Cache get error for key {key}: {str(e)}")
+        stats.incr(key, "misses")
+        return None, False
+
+
+def set_cached_data(key, data, expire_seconds=3600, tags=(), stale_seconds=0):
+    """
+    Set data in cache with expiration and register the key under each tag,
+    e.g. tags=("reservations", f"user:{user_id}"). With stale_seconds the
+    value is kept that much longer for stale-while-revalidate readers
+    (see singleflight.get_or_set).
+    """
+    stats.incr(key, "sets")
+    local_cache.set(key, data, min(expire_seconds, LOCAL_TTL_SECONDS), tags=tags)
+
+    redis_client = get_redis_client()
+    if not redis_client:
+        return
+
+    try:
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.setex(key, expire_seconds + stale_seconds, json.dumps(data, default=str))
+        if stale_seconds:
+            pipe.setex(FRESH_PREFIX + key, expire_seconds, 1)
+        for tag in tags:
+            pipe.sadd(tag_key(tag), key)
+            pipe.expire(tag_key(tag), TAG_TTL_SECONDS)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Cache set error for key {key}: {str(e)}")
+
+
+def invalidate_tags(*tags):
+    """
+    Drop every cached entry registered under any of the tags, in Redis and
+    in every worker's local tier. Costs O(entries under those tags) - no
+    keyspace scan.
+    """
+    if not tags:
+        return 0
+    local_cache.invalidate_tags(*tags)
+
+    redis_client = get_redis_client()
+    if not redis_client:
+        return 0
+
+    try:
+        deleted = redis_client.eval(_INVALIDATE_TAGS_SCRIPT, len(tags), *[tag_key(tag) for tag in tags])
+        deleted = [key.decode() if isinstance(key, bytes) else key for key in deleted]
+    except Exception as e:
+        logger.warning(f"Cache invalidation error for tags {tags}: {str(e)}")
+        return 0
+
+    if deleted:
+        local_cache.delete(*deleted)
+        for key in deleted:
+            stats.incr(key, "invalidations")
+        _publish_invalidation(redis_client, deleted)
+    return len(deleted)
+
+
+def invalidate_keys(*keys):
+    """Drop specific cache entries"""
+    if not keys:
+        return
+    local_cache.delete(*keys)
+
+    redis_client = get_redis_client()
+    if not redis_client:
+        return
+
+    try:
+        redis_client.delete(*keys)
+        for key in keys:
+            stats.incr(key, "invalidations")
+        _publish_invalidation(redis_client, keys)
+    except Exception as e:
+        logger.warning(f"Cache invalidation error for keys {keys}: {str(e)}")
+
+
+def cache_stats():
+    """Per-namespace hit/miss/eviction counters for this worker"""
+    return {
+        "local_entries": len(local_cache),
+        "local_max_entries": local_cache.max_entries,
+        "local_ttl_seconds": LOCAL_TTL_SECONDS,
+        "invalidation_listener": _listener_thread is not None,
+        "namespaces": stats.snapshot()
+    }
@@ -21,9 +21,55 @@ class BaseConfig:
     FROM_EMAIL = 'atbi.system@gmail.com'  
     ADMIN_EMAIL = 'reginejoycefrancisco110603@gmail.com'  
     
+    # Reused SMTP sessions (per worker)
+    SMTP_POOL_MAX_SIZE = 2
+    SMTP_POOL_HEALTH_CHECK_SECONDS = 30  # NOOP-check connections idle longer than this
+    SMTP_POOL_MAX_CONNECTION_AGE = 300  # Reconnect after 5 minutes
+    
+    # Email outbox: queued emails are delivered by background workers
+    EMAIL_OUTBOX_WORKERS = 2  # Send threads per worker (keep <= SMTP_POOL_MAX_SIZE)
+    EMAIL_OUTBOX_BATCH_SIZE = 20
+    EMAIL_OUTBOX_POLL_SECONDS = 15  # Pick up emails queued by other workers and due retries
+    EMAIL_OUTBOX_MAX_ATTEMPTS = 6
+    EMAIL_OUTBOX_BACKOFF_BASE_SECONDS = 30  # 30s, 1m, 2m, 4m, ... between retries
+    EMAIL_OUTBOX_BACKOFF_MAX_SECONDS = 3600
+    EMAIL_OUTBOX_LOCK_TIMEOUT_SECONDS = 600  # Reclaim emails left 'sending' by a dead worker
+    EMAIL_RECIPIENT_RATE_LIMIT = 60  # Emails per recipient per window (None to disable)
+    EMAIL_RECIPIENT_RATE_WINDOW_SECONDS = 3600
+    
+    # Product search (tsvector + pg_trgm on PostgreSQL, LIKE on SQLite)
+    SEARCH_TEXT_CONFIG = 'simple'  # No stemming: product names are mixed-language
+    SEARCH_PAGE_SIZE = 20
+    SEARCH_MAX_PAGE_SIZE = 100
+    
+    # In-memory catalog index for typeahead search (per worker)
+    CATALOG_INDEX_ENABLED = True
+    CATALOG_INDEX_REFRESH_SECONDS = 300  # Full rebuild; catches changes a worker missed while Redis was down
+    CATALOG_INDEX_MAX_PREFIX = 20  # Name word starts ranked as prefix matches, up to 20 characters
+    
+    # Product popularity: rolling windows over daily sales buckets
+    POPULARITY_WEEK_DAYS = 7
+    POPULARITY_MONTH_DAYS = 30
+    POPULARITY_BUCKET_RETENTION_DAYS = 90  # Never less than POPULARITY_MONTH_DAYS
+    
+    # CSV exports are streamed; gzip them for clients sending Accept-Encoding: gzip
+    EXPORT_GZIP = True
+    
+    # Background XLSX/Parquet exports (need openpyxl/pyarrow installed)
+    REPORT_EXPORT_DIR = None  # Default: <tmp>/report_exports, shared by the workers
+    REPORT_EXPORT_TTL_SECONDS = 3600  # Files and job state are deleted after an hour
+    
     # Redis configuration (optional - comment out if not using Redis)
     REDIS_URL = 'redis://localhost:6379/0'  # Default local Redis
     
+    # In-process cache tier in front of Redis (per worker)
+    CACHE_LOCAL_MAX_ENTRIES = 2048
+    CACHE_LOCAL_TTL_SECONDS = 60  # Upper bound on staleness if an invalidation message is missed
+    
+    # Scheduler leader leases: 'redis', 'postgres' or 'local'. None picks redis
+    # when redis_url is set, else postgres on PostgreSQL, else local
+    SCHEDULER_LEASE_BACKEND = None
+    
     # Low stock notification settings - UPDATED FOR THESIS DEMO
     LOW_STOCK_THRESHOLD = 10
     NOTIFICATION_COOLDOWN_HOURS = 24
@@ -5,6 +5,8 @@ from .reservation import Reservation
 from .admin import Incubatee, IncubateeProduct
 from .user import User
 from .void_product import VoidProduct
+from .email_outbox import OutboundEmail
+from .product_search import ProductSearchDocument
 
 # Export models for easy access
 __all__ = [
@@ -12,4 +14,5 @@ __all__ = [
     "Notification",
     "User",
     "Incubatee",
-    "IncubateeProduct", "InventoryAlert", "InventoryHistory", "voidProduct"]
+    "IncubateeProduct", "InventoryAlert", "InventoryHistory", "voidProduct",
+    "OutboundEmail", "ProductSearchDocument"]
@@ -60,6 +60,10 @@ class Incubatee(db.Model):
 
 class IncubateeProduct(db.Model):
     __tablename__ = "incubatee_products"
+    __table_args__ = (
+        # Keyset pagination order (services/product_listing.py)
+        db.Index("ix_incubatee_products_added_on_id", "added_on", "product_id"),
+    )
     
     product_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     incubatee_id = db.Column(db.Integer, db.ForeignKey("incubatees.incubatee_id", ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
@@ -125,7 +129,13 @@ class AdminProfile(db.Model):
 class SalesReport(db.Model):
     """Sales reports for incubatees"""
     __tablename__ = "sales_reports"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # Previous purchase of a product by a customer (popularity customer counts)
+        db.Index("ix_sales_reports_product_user_date", "product_id", "user_id", "sale_date"),
+        # Date-range reports (services/sales_summary.py)
+        db.Index("ix_sales_reports_sale_date", "sale_date"),
+        {'extend_existing': True},
+    )
     
     # Match your exact database columns
     sales_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -149,10 +159,34 @@ class SalesReport(db.Model):
     
     def __repr__(self):
         return f"<SalesReport {self.sales_id}>"
+
+class SalesDailyRollup(db.Model):
+    """Quantity, revenue and orders per sale day, incubatee, product and category (report reads)"""
+    __tablename__ = "sales_daily_rollup"
+    __table_args__ = (
+        db.Index("ix_sales_daily_rollup_incubatee_date", "incubatee_id", "sale_date"),
+        db.Index("ix_sales_daily_rollup_category_date", "category", "sale_date"),
+    )
+
+    sale_date = db.Column(db.Date, primary_key=True)
+    incubatee_id = db.Column(db.Integer, db.ForeignKey("incubatees.incubatee_id", ondelete="CASCADE"), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("incubatee_products.product_id", ondelete="CASCADE"), primary_key=True)
+    category = db.Column(db.String(100), primary_key=True, default='')  # '' for uncategorized products
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<SalesDailyRollup {self.sale_date} {self.product_id}>"
     
 class ProductPopularity(db.Model):
     """Enhanced product popularity tracking with period-based stats"""
     __tablename__ = "product_popularity"
+    __table_args__ = (
+        # Top-N ranking scans (services/popularity_service.py)
+        db.Index("ix_product_popularity_week_sold", "week_start_date", "weekly_sold"),
+        db.Index("ix_product_popularity_month_customers", "month_start_date", "monthly_customers"),
+    )
     
     popularity_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     product_id = db.Column(db.Integer, db.ForeignKey("incubatee_products.product_id"), nullable=False, unique=True)
@@ -193,6 +227,33 @@ class ProductPopularity(db.Model):
     def __repr__(self):
         return f"<ProductPopularity {self.product_id}>"
 
+class ProductSalesBucket(db.Model):
+    """Units, revenue and orders of a product per sale day (rolling popularity windows)"""
+    __tablename__ = "product_sales_buckets"
+
+    product_id = db.Column(db.Integer, db.ForeignKey("incubatee_products.product_id", ondelete="CASCADE"), primary_key=True)
+    bucket_date = db.Column(db.Date, primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ProductSalesBucket {self.product_id} {self.bucket_date}>"
+
+class ProductCustomerActivity(db.Model):
+    """Last purchase of a product by a customer (distinct customers in rolling windows)"""
+    __tablename__ = "product_customer_activity"
+    __table_args__ = (
+        db.Index("ix_product_customer_activity_last_purchase", "product_id", "last_purchase_date"),
+    )
+
+    product_id = db.Column(db.Integer, db.ForeignKey("incubatee_products.product_id", ondelete="CASCADE"), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id_no", ondelete="CASCADE"), primary_key=True)
+    last_purchase_date = db.Column(db.Date, nullable=False)
+
+    def __repr__(self):
+        return f"<ProductCustomerActivity {self.product_id} {self.user_id}>"
+
 class ProductSalesLog(db.Model):
     """Log individual sales for detailed tracking"""
     __tablename__ = "product_sales_log"
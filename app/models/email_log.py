@@ -4,6 +4,10 @@ from app import db
 class EmailLog(db.Model):
     """Model to log all email notifications sent"""
     __tablename__ = 'email_logs'
+    __table_args__ = (
+        db.Index('ix_email_logs_incubatee_product_sent', 'incubatee_id', 'product_id', 'sent_at'),  # cooldown lookups
+        db.Index('ix_email_logs_sent_status', 'sent_at', 'status'),  # stats and log listings by time window
+    )
     
     log_id = db.Column(db.Integer, primary_key=True)
     email_type = db.Column(db.String(50), nullable=False)  # 'low_stock', 'admin_notification', etc.
@@ -43,4 +47,16 @@ class EmailLog(db.Model):
             'sent_at': self.sent_at.isoformat() if self.sent_at else None,
             'next_scheduled': self.next_scheduled.isoformat() if self.next_scheduled else None,
             'interval_minutes': self.interval_minutes
-        }
\ No newline at end of file
+        }
+
+class EmailLogCounter(db.Model):
+    """Hourly email_logs counts per status and type, kept up to date as logs are written"""
+    __tablename__ = 'email_log_counters'
+    
+    bucket_start = db.Column(db.DateTime, primary_key=True)  # Start of the hour (UTC)
+    status = db.Column(db.String(20), primary_key=True)
+    email_type = db.Column(db.String(50), primary_key=True)
+    email_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<EmailLogCounter {self.bucket_start} {self.email_type}/{self.status}: {self.email_count}>'
@@ -0,0 +1,52 @@
+from datetime import datetime
+from app.extension import db
+
+class OutboundEmail(db.Model):
+    """Email waiting in the outbox to be delivered by the email workers"""
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+        db.Index('ix_email_outbox_recipient_sent', 'recipient_email', 'sent_at'),
+    )
+
+    outbox_id = db.Column(db.Integer, primary_key=True)
+    idempotency_key = db.Column(db.String(255), nullable=False, unique=True)
+    email_type = db.Column(db.String(50), nullable=False)
+    recipient_email = db.Column(db.String(255), nullable=False)
+    recipient_name = db.Column(db.String(255))
+    subject = db.Column(db.String(255), nullable=False)
+    html_content = db.Column(db.Text, nullable=False)
+    text_content = db.Column(db.Text, nullable=True)
+
+    # Copied to the EmailLog row once the email is delivered or gives up
+    product_id = db.Column(db.Integer, nullable=True)
+    incubatee_id = db.Column(db.Integer, nullable=True)
+    stock_amount = db.Column(db.Integer, nullable=True)
+    threshold = db.Column(db.Integer, nullable=True)
+    interval_minutes = db.Column(db.Integer, default=5)
+
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'sending', 'sent', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<OutboundEmail {self.outbox_id}: {self.email_type} to {self.recipient_email} ({self.status})>'
+
+    def to_dict(self):
+        return {
+            'outbox_id': self.outbox_id,
+            'idempotency_key': self.idempotency_key,
+            'email_type': self.email_type,
+            'recipient_email': self.recipient_email,
+            'subject': self.subject,
+            'status': self.status,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
@@ -0,0 +1,29 @@
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from app.extension import db
+
+class ProductSearchDocument(db.Model):
+    """
+    Search document for one product: its searchable text (name, products,
+    category, details and the incubatee's company name) and, on PostgreSQL,
+    the weighted tsvector built from it. Kept current by ProductSearch.
+    """
+    __tablename__ = 'product_search_documents'
+    __table_args__ = (
+        db.Index('ix_product_search_vector', 'search_vector', postgresql_using='gin'),
+        db.Index('ix_product_search_document_trgm', 'document',
+                 postgresql_using='gin', postgresql_ops={'document': 'gin_trgm_ops'}),
+    )
+
+    product_id = db.Column(
+        db.Integer,
+        db.ForeignKey('incubatee_products.product_id', ondelete='CASCADE'),
+        primary_key=True
+    )
+    document = db.Column(db.Text, nullable=False, default='')
+    # Plain text on SQLite, where the search falls back to LIKE over `document`
+    search_vector = db.Column(TSVECTOR().with_variant(db.Text, 'sqlite'), nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ProductSearchDocument {self.product_id}>'
@@ -1,7 +1,7 @@
 # app/models/shop.py
 from ..models.admin import IncubateeProduct, PricingUnit, Incubatee
-from sqlalchemy import or_
 from ..extension import db
+from ..services.product_search import ProductSearch
 
 class Shop:
     """Handles shop-related queries using the incubatee_products table."""
@@ -19,6 +19,17 @@ class Shop:
             .all()
         )
 
+    @staticmethod
+    def products_query():
+        """Base query of get_all_products, without ordering, for paginated listings."""
+        return (
+            IncubateeProduct.query
+            .join(PricingUnit, IncubateeProduct.pricing_unit_id == PricingUnit.unit_id)
+            .join(Incubatee, IncubateeProduct.incubatee_id == Incubatee.incubatee_id)
+            .options(db.joinedload(IncubateeProduct.pricing_unit))
+            .options(db.joinedload(IncubateeProduct.incubatee))
+        )
+
     @staticmethod
     def get_products_by_incubatee(incubatee_id):
         """Get products for a specific incubatee with pricing details."""
@@ -35,29 +46,38 @@ class Shop:
 
     @staticmethod
     def search_products(keyword):
-        """Search by name, products, category, or details."""
+        """Search by name, products, category, details or company name, best match first."""
         if not keyword:
             return Shop.get_all_products()
 
-        search = f"%{keyword.lower()}%"
-        return (
-            IncubateeProduct.query
-            .join(PricingUnit)
-            .join(Incubatee)
-            .filter(
-                or_(
-                    db.func.lower(IncubateeProduct.name).like(search),
-                    db.func.lower(IncubateeProduct.products).like(search),
-                    db.func.lower(IncubateeProduct.category).like(search),
-                    db.func.lower(IncubateeProduct.details).like(search),
-                    db.func.lower(Incubatee.company_name).like(search)
-                )
+        products, _ = ProductSearch.search(keyword)
+        return products
+
+    @staticmethod
+    def search_products_page(keyword, page=1, per_page=20):
+        """One page of search results with the total number of matches."""
+        if keyword:
+            products, total = ProductSearch.search(keyword, page, per_page)
+        else:
+            query = (
+                IncubateeProduct.query
+                .join(PricingUnit)
+                .join(Incubatee)
+                .options(db.joinedload(IncubateeProduct.pricing_unit))
+                .options(db.joinedload(IncubateeProduct.incubatee))
             )
-            .options(db.joinedload(IncubateeProduct.pricing_unit))
-            .options(db.joinedload(IncubateeProduct.incubatee))
-            .order_by(IncubateeProduct.added_on.desc())
-            .all()
-        )
+            total = query.count()
+            products = (
+                query.order_by(IncubateeProduct.added_on.desc(), IncubateeProduct.product_id.desc())
+                .limit(per_page).offset((page - 1) * per_page).all()
+            )
+        return {
+            "products": products,
+            "total": total,
+            "page": page,
+            "per_page": per_page,
+            "pages": (total + per_page - 1) // per_page
+        }
         
     @staticmethod
     def get_product_by_id(product_id):
@@ -5,8 +5,13 @@ from ..models.admin import ProductPopularity, ProductSalesLog, db, IncubateeProd
 from datetime import datetime, timedelta
 from ..models.user import User
 from ..models.reservation import Reservation
+from ..services.stock_service import StockService
 from sqlalchemy import func, desc
-import redis, json
+from ..services.catalog_index import catalog_index
+from ..services.product_listing import ProductListing
+from ..services.product_reads import ProductReads
+from ..cache import get_redis_client, cache_key, cached, cache_stats, get_cached_data, set_cached_data, invalidate_tags
+from ..utils.email_outbox import email_outbox
 
 admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
 
@@ -22,71 +27,11 @@ ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}
 LOGO_UPLOAD_FOLDER = "static/incubatee_logo"  # Changed to relative path
 LOGO_ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'svg'}
 last_notification_time = {}
-redis_client = None
 
 last_notification_time = {}
 email_counter = {}  # Track email counts per 5-minute window
 MAX_EMAILS_PER_5_MIN = 2  # Maximum 2 emails per 5 minutes
     
-def get_redis_client():
-    """Get redis client with lazy inizialization"""
-    global redis_client
-    if redis_client is None:
-        try:
-            redis_url = os.environ.get('redis_url')
-            if redis_url:
-                redis_client = redis.from_url(redis_url)
-            else:
-                #Fallback to local redis if no environment variable
-                redis_client = redis.Redis(host='localhost', port=6379, db=0,decode_responses=True)
-        except Exception as e:
-            current_app.logger.error(f"Redis Connection failed: {str(e)}")
-            redis_client = None
-    return redis_client
-
-def cache_key(prefix, *args):
-    """Generate cache key with prefix and arguments"""
-    key_parts = [prefix] + [str(arg) for arg in args]
-    return ":".join(key_parts)
-
-def get_cached_data(key, expire_seconds=3600):
-    """Get data from cache, return (data, found) tuple"""
-    redis_client = get_redis_client()
-    if not redis_client:
-        return None, False
-    
-    try:
-        cached = redis_client.get(key)
-        if cached:
-            return json.loads(cached), True
-        return None, False
-    except Exception as e:
-        current_app.logger.warning(f"Cache get error for key {key}: {str(e)}")
-        return None, False
-    
-def set_cached_data(key, data, expire_seconds=3600):
-    """Set data in cache with expiration"""
-    redis_client = get_redis_client()
-    if not redis_client:
-        return
-    
-    try:
-        redis_client.setex(key, expire_seconds, json.dumps(data, default=str))
-    except Exception as e:
-        current_app.logger.warning(f"Cache set error for key {key}: {str(e)}")
-def invalidate_cache(pattern):
-    """Invalidate cache keys matching pattern"""
-    redis_client = get_redis_client()
-    if not redis_client:
-        return
-    
-    try:
-        keys = redis_client.keys(pattern)
-        if keys:
-            redis_client.delete(*keys)
-    except Exception as e:
-        current_app.logger.warning(f"Cache invalidation error for pattern {pattern}: {str(e)}")
-        
 def allowed_logo_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in LOGO_ALLOWED_EXTENSIONS
@@ -123,7 +68,7 @@ def admin_login_post():
             session['admin_username'] = username
             
             #Invalidate any cached admin data on login
-            invalidate_cache("admin:*")
+            invalidate_tags("admin")
             
             if request.is_json:
                 return jsonify({'success': True,'message': '✅ Login successful! Welcome Admin!','redirect_url': url_for('admin.admin_dashboard')})
@@ -147,7 +92,7 @@ def admin_logout():
     """Admin logout"""
     session.pop('admin_logged_in', None)
     session.pop('admin_username', None)
-    invalidate_cache("admin:*")
+    invalidate_tags("admin")
     return redirect(url_for('admin.admin_login'))
 
 @admin_bp.route("/users")
@@ -188,12 +133,12 @@ def get_incubatee_logo(incubatee_id):
         
         if not incubatee.logo_path:
             response_data = {"success": False, "error": "No logo available"}
-            set_cached_data(cache_key_str, response_data, 3600) #cache negative result for 1 hour
+            set_cached_data(cache_key_str, response_data, 3600, tags=(f"incubatee:{incubatee_id}",)) #cache negative result for 1 hour
             return jsonify(response_data), 404
             
         # Return the logo URL using the model's property
         response_data = {"success": True, "logo_url": incubatee.logo_url,"company_name": incubatee.company_name}
-        set_cached_data(cache_key_str, response_data, 86400)  # Cache for 24 hours
+        set_cached_data(cache_key_str, response_data, 86400, tags=(f"incubatee:{incubatee_id}",))  # Cache for 24 hours
         return jsonify(response_data)
         
     except Exception as e:
@@ -239,7 +184,7 @@ def get_incubatee_details(incubatee_id):
                 "products": products_list,
                 "product_count": len(products_list)}}
         
-        set_cached_data(cache_key_str, response_data, 1800)  # Cache for 30 minutes
+        set_cached_data(cache_key_str, response_data, 1800, tags=(f"incubatee:{incubatee_id}",))  # Cache for 30 minutes
         return jsonify(response_data)
         
     except Exception as e:
@@ -272,7 +217,7 @@ def get_incubatee_products(incubatee_id):
                 "image_path": product.image_path})
         
         response_data = {"success": True, "products": products_list}
-        set_cached_data(cache_key_str, response_data, 1800)  # Cache for 30 minutes
+        set_cached_data(cache_key_str, response_data, 1800, tags=(f"incubatee:{incubatee_id}", "products"))  # Cache for 30 minutes
         return jsonify(response_data)
         
     except Exception as e:
@@ -309,7 +254,7 @@ def add_pricing_unit():
         db.session.commit()
         
         # Invalidate pricing units cache
-        invalidate_cache("pricing_units:*")
+        invalidate_tags("pricing_units")
         
         return jsonify({"success": True, "message": "Pricing unit added successfully!","unit_id": pricing_unit.unit_id,"existing": False})
         
@@ -342,7 +287,7 @@ def search_pricing_units():
         
         response_data = {"success": True,"pricing_units": [{"unit_id": unit.unit_id,"unit_name": unit.unit_name,"unit_description": unit.unit_description} for unit in pricing_units]}
         
-        set_cached_data(cache_key_str, response_data, 1800)  # Cache for 30 minutes
+        set_cached_data(cache_key_str, response_data, 1800, tags=("pricing_units",))  # Cache for 30 minutes
         return jsonify(response_data)
         
     except Exception as e:
@@ -417,9 +362,8 @@ def add_product():
         db.session.commit()
 
         # Invalidate relevant caches
-        invalidate_cache(f"incubatee_products:{incubatee_id}")
-        invalidate_cache("products:all")
-        invalidate_cache(f"incubatee_details:{incubatee_id}")
+        invalidate_tags(f"incubatee:{incubatee_id}", "products")
+        catalog_index.sync(upsert=[product.product_id])
 
         return jsonify({"success": True, "message": "✅ Product saved successfully!"}), 201
 
@@ -465,10 +409,8 @@ def delete_product(product_id):
         db.session.commit()
         
         # Invalidate relevant caches
-        invalidate_cache(f"incubatee_products:{incubatee_id}")
-        invalidate_cache("products:all")
-        invalidate_cache(f"incubatee_details:{incubatee_id}")
-        invalidate_cache(f"product:{product_id}")
+        invalidate_tags(f"incubatee:{incubatee_id}", "products", f"product:{product_id}")
+        catalog_index.sync(delete=[product_id])
         
         return jsonify({"success": True, "message": "🗑️ Product deleted successfully"})
         
@@ -479,53 +421,41 @@ def delete_product(product_id):
     
 @admin_bp.route("/get-products", methods=["GET"])
 def get_products():
-    """Get all products for display in admin panel - WITH CACHING"""
+    """
+    Get all products for display in admin panel - WITH CACHING.
+    ?limit=&cursor= (with category/incubatee_id/stock_status filters and ?fields=) returns keyset pages instead.
+    """
     if not session.get('admin_logged_in'):
         return jsonify({"success": False, "error": "Unauthorized"}), 401
     
-    cache_key_str = "products:all"
-    
-    # Try cache first
-    cached_data, found = get_cached_data(cache_key_str, expire_seconds=1800)  # 30 minutes cache
-    if found:
-        return jsonify(cached_data)
+    try:
+        listing = ProductListing.from_request(request.args, ADMIN_PRODUCT_FIELDS)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    if listing is None:
+        return all_products_response()
     
     try:
-        # Get all products with incubatee information
-        products = IncubateeProduct.query.options(
-            db.joinedload(IncubateeProduct.incubatee),
-            db.joinedload(IncubateeProduct.pricing_unit)
-        ).all()
-        
-        products_list = []
-        for product in products:
-            # Use new_price_per_stocks if available, otherwise use price_per_stocks
-            display_price = float(product.new_price_per_stocks) if product.new_price_per_stocks else float(product.price_per_stocks)
-            
-            products_list.append({
-                "product_id": product.product_id,
-                "incubatee_id": product.incubatee_id,
-                "name": product.name,
-                "stock_no": product.stock_no,
-                "products": product.products,
-                "stock_amount": product.stock_amount,
-                "price_per_stocks": float(product.price_per_stocks),  # Original price
-                "new_price_per_stocks": float(product.new_price_per_stocks) if product.new_price_per_stocks else None,  # New price
-                "display_price": display_price,  # Price to display (uses new price if available)
-                "pricing_unit": product.pricing_unit.unit_name if product.pricing_unit else "N/A",
-                "pricing_unit_id": product.pricing_unit_id,
-                "details": product.details,
-                "category": product.category,
-                "expiration_date": product.expiration_date.strftime("%Y-%m-%d") if product.expiration_date else "N/A",
-                "warranty": product.warranty,
-                "added_on": product.added_on.strftime("%Y-%m-%d") if product.added_on else "N/A",
-                "image_path": product.image_path,
-                "image_paths": product.image_path.split(',') if product.image_path else [],
-                "incubatee_name": f"{product.incubatee.first_name} {product.incubatee.last_name}" if product.incubatee else "Unknown"
-            })
+        return jsonify(listing.page_data("admin", ProductReads.admin_products(), ProductReads.admin_payload))
+    except Exception as e:
+        current_app.logger.error(f"Error fetching products: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+ADMIN_PRODUCT_FIELDS = (
+    "incubatee_id", "name", "stock_no", "products", "stock_amount", "price_per_stocks", "new_price_per_stocks",
+    "display_price", "pricing_unit", "pricing_unit_id", "details", "category", "expiration_date", "warranty",
+    "added_on", "image_path", "image_paths", "incubatee_name"
+)
+
+@cached("products:all", 1800, tags=("products",), stale_seconds=300)  # Cache for 30 minutes
+def all_products_response():
+    """Product list for the admin panel, served from the worker's memory when cached"""
+    try:
+        # Only the serialized columns, with incubatee and pricing unit joined in SQL
+        products = ProductReads.admin_products().all()
+        products_list = [ProductReads.admin_payload(product) for product in products]
         
         response_data = {"success": True, "products": products_list}
-        set_cached_data(cache_key_str, response_data, 1800)  # Cache for 30 minutes
         return jsonify(response_data)
         
     except Exception as e:
@@ -559,7 +489,7 @@ def get_pricing_units():
             ]
         }
         
-        set_cached_data(cache_key_str, response_data, 1800)  # Cache for 30 minutes
+        set_cached_data(cache_key_str, response_data, 1800, tags=("pricing_units",))  # Cache for 30 minutes
         return jsonify(response_data)
         
     except Exception as e:
@@ -642,8 +572,7 @@ def add_incubatee():
         db.session.commit()
 
         # Invalidate incubatees cache
-        invalidate_cache("incubatees:*")
-        invalidate_cache("incubatees_list:all")
+        invalidate_tags("incubatees")
 
         return jsonify({"success": True, "message": "Incubatee added successfully!","incubatee_id": incubatee.incubatee_id})
 
@@ -680,7 +609,7 @@ def get_incubatees():
                     "full_name": i.full_name  # Include full name for display
                 } for i in incubatees]}
         
-        set_cached_data(cache_key_str, response_data, 3600)  # Cache for 1 hour
+        set_cached_data(cache_key_str, response_data, 3600, tags=("incubatees",))  # Cache for 1 hour
         return jsonify(response_data)
     except Exception as e:
         current_app.logger.error(f"Error fetching incubatees: {str(e)}")
@@ -720,7 +649,7 @@ def update_admin_profile():
         db.session.commit()
         
         # Invalidate admin profile cache if you cache it
-        invalidate_cache(f"admin_profile:{username}")
+        invalidate_tags("admin")
         
         return jsonify({"success": True, "message": "Profile updated successfully!"})
         
@@ -758,7 +687,7 @@ def get_users():
                 "approved_reservations": approved_reservations,"completed_reservations": completed_reservations})
         
         response_data = {"success": True, "users": users_list}
-        set_cached_data(cache_key_str, response_data, 900)  # Cache for 15 minutes
+        set_cached_data(cache_key_str, response_data, 900, tags=("users",))  # Cache for 15 minutes
         return jsonify(response_data)
         
     except Exception as e:
@@ -798,7 +727,7 @@ def get_incubatees_list():
                 "created_at": incubatee.created_at.strftime("%Y-%m-%d") if incubatee.created_at else "Unknown"})
         
         response_data = {"success": True, "incubatees": incubatees_list}
-        set_cached_data(cache_key_str, response_data, 1800)  # Cache for 30 minutes
+        set_cached_data(cache_key_str, response_data, 1800, tags=("incubatees",))  # Cache for 30 minutes
         return jsonify(response_data)
         
     except Exception as e:
@@ -817,9 +746,7 @@ def toggle_incubatee_approval(incubatee_id):
         db.session.commit()
         
         # Invalidate incubatee caches
-        invalidate_cache(f"incubatee_details:{incubatee_id}")
-        invalidate_cache("incubatees_list:all")
-        invalidate_cache("incubatees:all")
+        invalidate_tags(f"incubatee:{incubatee_id}", "incubatees")
         
         action = "approved" if incubatee.is_approved else "disapproved"
         return jsonify({"success": True, "message": f"Incubatee {action} successfully!"})
@@ -878,7 +805,7 @@ def get_product(product_id):
             "incubatee_name": f"{product.incubatee.first_name} {product.incubatee.last_name}" if product.incubatee else "Unknown"
         }
         
-        set_cached_data(cache_key_str, product_data, 1800)  # Cache for 30 minutes
+        set_cached_data(cache_key_str, product_data, 1800, tags=(f"product:{product_id}",))  # Cache for 30 minutes
         return jsonify({"success": True, "product": product_data})
         
     except Exception as e:
@@ -1052,10 +979,8 @@ def update_product(product_id):
                 current_app.logger.warning(f"Could not update product_popularity: {str(e)}")
             
             # Invalidate relevant caches
-            invalidate_cache(f"product:{product_id}")
-            invalidate_cache(f"incubatee_products:{product.incubatee_id}")
-            invalidate_cache("products:all")
-            invalidate_cache(f"incubatee_details:{product.incubatee_id}")
+            invalidate_tags(f"product:{product_id}", f"incubatee:{product.incubatee_id}", "products")
+            catalog_index.sync(upsert=[product_id])
             
             return jsonify({
                 "success": True,
@@ -1113,7 +1038,14 @@ def test_redis():
                 return jsonify({"success": False, "message": "❌ Redis connection failed - check your redis_url value"})
     except Exception as e:
         return jsonify({"success": False, "message": f"❌ Redis error: {str(e)}"})
-    
+
+@admin_bp.route("/cache-stats")
+def get_cache_stats():
+    """Hit/miss/eviction counters per cache namespace for this worker"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    return jsonify({"success": True, "cache": cache_stats(), "catalog_index": catalog_index.status()})
+
 def should_send_notification(product_id):
     """Check if we should send notification (cooldown period)"""
     global last_notification_time
@@ -1214,32 +1146,29 @@ def check_overdue():
         # Calculate cutoff time
         cutoff_time = datetime.utcnow() - timedelta(milliseconds=timeout_ms)
         
-        # OPTIMIZED QUERY: Only get IDs that need processing
-        overdue_reservations = Reservation.query.with_entities(
-            Reservation.reservation_id
-        ).filter(
+        # Claim overdue approved reservations (max 100 at a time); rows another
+        # worker is already rejecting are skipped so stock is restored once
+        overdue_reservations = StockService.claim_reservations(
             Reservation.status == 'approved',
-            Reservation.reserved_at <= cutoff_time
-        ).limit(100).all()  # Process max 100 at a time
+            Reservation.reserved_at <= cutoff_time,
+            limit=100
+        )
         
-        reservation_ids = [r.reservation_id for r in overdue_reservations]
         rejected_count = 0
+        restore_quantities = {}
         
-        if reservation_ids:
-            # Update in batches for better performance
-            batch_size = 50
-            for i in range(0, len(reservation_ids), batch_size):
-                batch = reservation_ids[i:i + batch_size]
-                updated = Reservation.query.filter(
-                    Reservation.reservation_id.in_(batch)
-                ).update({
-                    'status': 'rejected',
-                    'rejected_reason': 'Not picked up on time (auto-rejected)',
-                    'updated_at': datetime.utcnow()
-                }, synchronize_session=False)
-                
-                db.session.commit()
-                rejected_count += updated
+        for reservation in overdue_reservations:
+            reservation.status = 'rejected'
+            reservation.rejected_reason = 'Not picked up on time (auto-rejected)'
+            reservation.updated_at = datetime.utcnow()
+            restore_quantities[reservation.product_id] = restore_quantities.get(reservation.product_id, 0) + reservation.quantity
+            rejected_count += 1
+        
+        # Give the reserved units back with one atomic increment per product
+        for product_id, quantity in restore_quantities.items():
+            StockService.release(product_id, quantity)
+        
+        db.session.commit()
         
         return jsonify({
             "success": True,
@@ -1273,7 +1202,7 @@ def send_low_stock_notifications():
             db.joinedload(IncubateeProduct.incubatee)
         ).all()
         
-        # 3. Send emails to incubatees
+        # 3. Queue emails to incubatees (the email workers send them)
         notifications_sent = 0
         failed_notifications = 0
         sent_emails = []
@@ -1281,7 +1210,7 @@ def send_low_stock_notifications():
         for product in low_stock_products:
             # Check if incubatee has email
             if product.incubatee and product.incubatee.email:
-                # Send email (all email logic is here)
+                # Queue email (all email logic is here)
                 email_sent = send_low_stock_email_to_incubatee({
                     'product_id': product.product_id,
                     'product_name': product.name,
@@ -1291,7 +1220,7 @@ def send_low_stock_notifications():
                     'incubatee_name': f"{product.incubatee.first_name} {product.incubatee.last_name}",
                     'incubatee_email': product.incubatee.email,
                     'status': "Critical" if product.stock_amount <= 3 else "Low"
-                })
+                }, commit=False)
                 
                 if email_sent:
                     notifications_sent += 1
@@ -1303,9 +1232,12 @@ def send_low_stock_notifications():
                 else:
                     failed_notifications += 1
         
+        db.session.commit()
+        email_outbox.wake()
+        
         return jsonify({
             "success": True,
-            "message": f"Sent {notifications_sent} email notifications",
+            "message": f"Queued {notifications_sent} email notifications",
             "notifications_sent": notifications_sent,
             "failed_notifications": failed_notifications,
             "total_low_stock": len(low_stock_products),
@@ -1313,11 +1245,12 @@ def send_low_stock_notifications():
         })
         
     except Exception as e:
+        db.session.rollback()
         current_app.logger.error(f"Error sending low stock notifications: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
     
-def send_low_stock_email_to_incubatee(product_data):
-    """Send email to incubatee about low stock"""
+def send_low_stock_email_to_incubatee(product_data, commit=True):
+    """Queue email to incubatee about low stock"""
     try:
         # Check if email is configured
         if not current_app.config.get('SMTP_USERNAME') or not current_app.config.get('SMTP_PASSWORD'):
@@ -1529,18 +1462,21 @@ def send_low_stock_email_to_incubatee(product_data):
             'incubatee_name': product_data['incubatee_name']
         }
         
-        # Try to send email
-        success = EmailSender.send_email(
+        # Queue the email; the outbox workers deliver and retry it
+        success = EmailSender.queue_email(
             to_email=email_data['to_email'],
             subject=email_data['subject'],
             html_content=email_data['html_content'],
-            text_content=email_data['text_content']
+            text_content=email_data['text_content'],
+            email_type='low_stock',
+            recipient_name=email_data['incubatee_name'],
+            commit=commit
         )
         
         if success:
-            current_app.logger.info(f"✅ Low stock email sent to {product_data['incubatee_email']} for product {product_data['product_name']}")
+            current_app.logger.info(f"📥 Low stock email queued for {product_data['incubatee_email']} for product {product_data['product_name']}")
         else:
-            current_app.logger.error(f"❌ Failed to send email to {product_data['incubatee_email']}")
+            current_app.logger.error(f"❌ Failed to queue email to {product_data['incubatee_email']}")
         
         return success
         
@@ -1629,8 +1565,8 @@ def send_admin_summary_email(sent_emails, total_low_stock):
         </html>
         """
         
-        # Send email
-        success = EmailSender.send_email(
+        # Queue email
+        success = EmailSender.queue_email(
             to_email=admin_email,
             subject=subject,
             html_content=html_content,
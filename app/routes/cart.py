@@ -5,7 +5,9 @@ from ..models.cart import Cart
 from ..models.reservation import Reservation
 from ..models.admin import IncubateeProduct
 from datetime import datetime, timezone
-from ..routes.reservation import process_product_reservations
+from ..services.reservation_service import ReservationService
+from ..services.reservation_queue import reservation_due_queue
+from ..services.product_reads import ProductReads
 
 cart_bp = Blueprint("cart_bp", __name__, url_prefix="/cart")
 
@@ -81,22 +83,19 @@ def get_cart_items():
         if not user_id:
             return jsonify({"success": False, "message": "User not logged in"}), 401
 
-        cart_items = (
-            db.session.query(Cart, IncubateeProduct)
-            .join(IncubateeProduct, Cart.product_id == IncubateeProduct.product_id)
-            .filter(Cart.user_id == user_id)
-            .all())
+        # Only the columns the cart shows, no ORM objects
+        cart_items = ProductReads.cart_items(user_id)
 
         if not cart_items:
             return jsonify({"success": True, "items": [], "message": "Your cart is empty."}), 200
 
         items = []
-        for cart, product in cart_items:
+        for item in cart_items:
             
             # FIX: Handle paths that start with "static/"
-            if product.image_path:
+            if item.image_path:
                 # Remove "static/" prefix if it exists
-                clean_path = product.image_path
+                clean_path = item.image_path
                 if clean_path.startswith('static/'):
                     clean_path = clean_path.replace('static/', '', 1)
                 
@@ -106,22 +105,22 @@ def get_cart_items():
             
             # Calculate discount percentage
             discount_percentage = 0
-            if product.new_price_per_stocks and product.new_price_per_stocks < product.price_per_stocks:
-                discount_amount = product.price_per_stocks - product.new_price_per_stocks
-                discount_percentage = (discount_amount / product.price_per_stocks) * 100
+            if item.new_price_per_stocks and item.new_price_per_stocks < item.price_per_stocks:
+                discount_amount = item.price_per_stocks - item.new_price_per_stocks
+                discount_percentage = (discount_amount / item.price_per_stocks) * 100
                 discount_percentage = round(discount_percentage)  # Round to nearest integer
             
             items.append({
-                "cart_id": cart.cart_id,
-                "product_id": product.product_id,
-                "name": product.name,
+                "cart_id": item.cart_id,
+                "product_id": item.product_id,
+                "name": item.name,
                 "image_path": image_url,
-                "price_per_stocks": float(product.price_per_stocks or 0),
-                "new_price_per_stocks": float(product.new_price_per_stocks or 0) if product.new_price_per_stocks else None,  # ADD THIS
+                "price_per_stocks": float(item.price_per_stocks or 0),
+                "new_price_per_stocks": float(item.new_price_per_stocks or 0) if item.new_price_per_stocks else None,  # ADD THIS
                 "discount_percentage": discount_percentage,  # ADD THIS
-                "stock_amount": product.stock_amount or 0,
-                "quantity": cart.quantity,
-                "added_at": cart.added_at.strftime("%Y-%m-%d %H:%M:%S")
+                "stock_amount": item.stock_amount or 0,
+                "quantity": item.quantity,
+                "added_at": item.added_at.strftime("%Y-%m-%d %H:%M:%S")
             })
 
         return jsonify({"success": True, "items": items}), 200
@@ -290,49 +289,28 @@ def reserve_selected_items():
         if not selected_items:
             return jsonify({"success": False, "message": "No valid items found"}), 404
 
-        # Prepare items for bulk reservation
-        reservation_items = []
-        for item in selected_items:
-            reservation_items.append({"product_id": item.product_id,"quantity": item.quantity})
+        # One product query, one multi-row INSERT ... RETURNING
+        selected_items = [item for item in selected_items if item.quantity and item.quantity > 0]
+        reservation_items = [{"product_id": item.product_id,"quantity": item.quantity} for item in selected_items]
+        created = ReservationService.create_bulk(user_id, reservation_items, commit=False)
 
-        # Use the bulk reservation endpoint
-        bulk_data = {"user_id": user_id,"items": reservation_items}
-        
-        # Create reservations using the bulk endpoint
-        reservation_results = []
-        for item in selected_items:
-            # Create individual reservation
-            reservation = Reservation(user_id=user_id,product_id=item.product_id,quantity=item.quantity,status="pending",reserved_at=datetime.now(timezone.utc))
-            db.session.add(reservation)
-            reservation_results.append({"cart_id": item.cart_id,"product_id": item.product_id,"reservation": reservation})
-
-        db.session.commit()
-
-        # Process each product's reservation queue
-        processed_products = set(item.product_id for item in selected_items)
-        for product_id in processed_products:
-            process_product_reservations(product_id)
-
-        # Remove successfully processed items from cart
+        # Remove successfully reserved items from cart in the same transaction
+        reserved_cart_ids = [item.cart_id for item, result in zip(selected_items, created) if result["status"] in ["approved", "pending"]]
         success_count = 0
-        for result in reservation_results:
-            db.session.refresh(result["reservation"])
-            if result["reservation"].status in ["approved", "pending"]:
-                cart_item = Cart.query.get(result["cart_id"])
-                if cart_item:
-                    db.session.delete(cart_item)
-                    success_count += 1
+        if reserved_cart_ids:
+            success_count = Cart.query.filter(Cart.cart_id.in_(reserved_cart_ids)).delete(synchronize_session=False)
 
         db.session.commit()
 
-        # Get final status of all reservations
-        final_results = []
-        for result in reservation_results:
-            final_results.append({
-                "product_id": result["product_id"],
-                "reservation_id": result["reservation"].reservation_id,
-                "status": result["reservation"].status,
-                "reason": result["reservation"].rejected_reason if result["reservation"].status == "rejected" else None})
+        # Decided by the due queue once the 2-minute delay has passed
+        reservation_due_queue.schedule_many(
+            (r["reservation_id"], r["product_id"], r["reserved_at"]) for r in created if r["status"] == "pending"
+        )
+
+        final_results = [
+            {"product_id": r["product_id"],"reservation_id": r["reservation_id"],"status": r["status"],"reason": r["reason"] if r["status"] != "pending" else None}
+            for r in created
+        ]
 
         return jsonify({"success": True, "message": f"Processed {success_count} items successfully","results": final_results})
 
@@ -2,6 +2,7 @@ from flask import Blueprint, jsonify, request, session, url_for
 from ..extension import db
 from ..models.favorites import Favorite
 from ..models.admin import IncubateeProduct
+from ..services.product_reads import ProductReads
 
 favorites_bp = Blueprint("favorites_bp", __name__, url_prefix="/favorites")
 
@@ -129,19 +130,14 @@ def get_user_favorites():
         if not user_id:
             return jsonify({"success": False, "message": "User not logged in"}), 401
 
-        # Get user's favorites with product details
-        favorites = (
-            db.session.query(Favorite, IncubateeProduct)
-            .join(IncubateeProduct, Favorite.product_id == IncubateeProduct.product_id)
-            .filter(Favorite.user_id == user_id)
-            .all()
-        )
+        # Get user's favorites with the product columns the page shows
+        favorites = ProductReads.favorites(user_id)
 
         favorite_products = []
-        for favorite, product in favorites:
+        for item in favorites:
             # Handle image path
-            if product.image_path:
-                clean_path = product.image_path
+            if item.image_path:
+                clean_path = item.image_path
                 if clean_path.startswith('static/'):
                     clean_path = clean_path.replace('static/', '', 1)
                 image_url = url_for('static', filename=clean_path)
@@ -149,14 +145,14 @@ def get_user_favorites():
                 image_url = url_for('static', filename='images/no-image.png')
                 
             favorite_products.append({
-                "favorite_id": favorite.favorite_id,
-                "product_id": product.product_id,
-                "name": product.name,
+                "favorite_id": item.favorite_id,
+                "product_id": item.product_id,
+                "name": item.name,
                 "image_path": image_url,
-                "price_per_stocks": float(product.price_per_stocks or 0),
-                "category": product.category,
-                "details": product.details,
-                "added_at": favorite.added_at.isoformat() if favorite.added_at else None
+                "price_per_stocks": float(item.price_per_stocks or 0),
+                "category": item.category,
+                "details": item.details,
+                "added_at": item.added_at.isoformat() if item.added_at else None
             })
 
         return jsonify({
@@ -71,7 +71,7 @@ def get_featured_products():
                 'weekly_rank': popularity.weekly_rank,
                 'tag': 'best_seller',
                 'tag_text': f'🔥 #{popularity.weekly_rank} Best Seller',
-                'period_text': f'{popularity.weekly_sold} sold this week'
+                'period_text': f'{popularity.weekly_sold} sold in the last 7 days'
             })
         
         # Format MONTHLY known products
@@ -90,7 +90,7 @@ def get_featured_products():
                 'monthly_customers': popularity.monthly_customers,
                 'tag': 'known_product',
                 'tag_text': f'👥 Popular Choice',
-                'period_text': f'{popularity.monthly_customers} customers this month'
+                'period_text': f'{popularity.monthly_customers} customers in the last 30 days'
             })
         
         # Combine products - WEEKLY first, then MONTHLY
@@ -138,7 +138,7 @@ def get_featured_products():
                     'monthly_sold': popularity.monthly_sold,
                     'tag': 'best_seller',
                     'tag_text': f'⭐ Monthly Performer',
-                    'period_text': f'{popularity.monthly_sold} sold this month'
+                    'period_text': f'{popularity.monthly_sold} sold in the last 30 days'
                 })
         
         print(f"✅ Found {len(featured_products)} featured products: "
@@ -201,7 +201,7 @@ def get_featured_products_api():
 
 @home_bp.route("/api/refresh-rankings", methods=["POST"])
 def refresh_rankings():
-    """Manual trigger to refresh product rankings"""
+    """Manual trigger to roll the popularity windows over and refresh rankings (also runs daily)"""
     try:
         ProductPopularityService.update_product_rankings()
         return jsonify({
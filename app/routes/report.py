@@ -1,391 +1,198 @@
 # report.py
-from flask import Blueprint, json, render_template, request, jsonify, session, redirect, url_for, current_app, Response
-from datetime import datetime, timedelta
+import os
+from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, current_app, Response, send_file
+from datetime import timedelta
 from sqlalchemy import func, desc
-import csv
-from io import StringIO
-from app.routes.shop import get_redis_client
-from ..models.admin import SalesReport, Incubatee, IncubateeProduct, db
+from app.cache import cached
+from ..models.admin import Incubatee, IncubateeProduct, db
 from ..models.user import User
 from ..models.reservation import Reservation
+from ..services.sales_summary import SalesSummary, DEFAULT_LINE_ITEMS_PAGE_SIZE, MAX_LINE_ITEMS_PAGE_SIZE, EXPORT_HEADER
+from ..services.report_export import report_exports, EXPORT_FORMATS
+from ..utils.csv_stream import csv_response
 
 report_bp = Blueprint("report", __name__, url_prefix="/admin/reports")
 
+PREVIEW_ROWS = 20
+
+def report_cache_parts(*extra):
+    """Normalized filters and the sales data version: the key parts of a cached report"""
+    return SalesSummary.cache_parts(SalesSummary.filters(request.args)) + list(extra) + [SalesSummary.data_version()]
+
+def invalid_filters():
+    """400 response for malformed report filters, else None (checked before the cache key is built)"""
+    try:
+        SalesSummary.filters(request.args)
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid date format or incubatee id"}), 400
+    return None
+
 @report_bp.route("/sales-summary")
 def sales_summary():
     """Get sales summary for reports - FIXED for User model without names"""
     if not session.get('admin_logged_in'):
         return jsonify({"success": False, "error": "Unauthorized"}), 401
     
+    return invalid_filters() or sales_summary_response()
+
+# Keyed by the data version, so a new sale is visible at once and unchanged
+# data stays a hit for the hour
+@cached("sales_summary", 3600, tags=("sales",), vary_on=report_cache_parts, stale_seconds=300)
+def sales_summary_response():
+    """Build the sales summary for the current query parameters"""
     try:
-        # Get date range from query parameters
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        report_type = request.args.get('type', 'overview')
-        filter_type = request.args.get('filter', 'all')  # New: all, incubatee, category
-        
-        # Create cache key based on parameters
-        cache_key_str = f"sales_summary:{start_date}:{end_date}:{report_type}:{filter_type}"
-        
-        # Try cache first (shorter cache for reports - 5 minutes)
-        redis_client = get_redis_client()
-        if redis_client:
-            cached_data = redis_client.get(cache_key_str)
-            if cached_data:
-                return jsonify(json.loads(cached_data))
-        
-        # Base query for sales data
-        sales_query = SalesReport.query
-        
-        # Apply date filter if provided
-        start_date_obj = None
-        end_date_obj = None
-        if start_date and end_date:
-            try:
-                start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-                end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-                sales_query = sales_query.filter(SalesReport.sale_date >= start_date_obj,
-                                               SalesReport.sale_date <= end_date_obj)
-            except ValueError:
-                return jsonify({"success": False, "error": "Invalid date format"}), 400
-        
-        # Apply additional filters based on filter_type
-        if filter_type == 'incubatee':
-            incubatee_id = request.args.get('incubatee_id')
-            if incubatee_id:
-                # multiple approaches to find sales for this incubatee
-                # 1. Direct match on incubatee_id in SalesReport
-                # 2. Match through product's incubatee_id
-                sales_query = sales_query.join(IncubateeProduct, 
-                                            SalesReport.product_id == IncubateeProduct.product_id)\
-                                        .filter(db.or_(
-                                            SalesReport.incubatee_id == incubatee_id,
-                                            IncubateeProduct.incubatee_id == incubatee_id))
-        elif filter_type == 'category':
-            category = request.args.get('category')
-            if category:
-                sales_query = sales_query.join(IncubateeProduct).filter(
-                    IncubateeProduct.category == category)
-        
-        # Get sales data with related information
-        sales_data = sales_query.options(
-            db.joinedload(SalesReport.incubatee),
-            db.joinedload(SalesReport.product),
-            db.joinedload(SalesReport.user)
-        ).all()
-        
-        # Process sales data
-        sales_list = []
-        for sale in sales_data:
-            # Get customer name from username (since User model only has username)
-            customer_name = "Unknown"
-            if sale.user:
-                customer_name = sale.user.username
-            
-            # Get incubatee name
-            incubatee_name = "Unknown"
-            if sale.incubatee:
-                incubatee_name = f"{sale.incubatee.first_name} {sale.incubatee.last_name}"
-            elif sale.product and sale.product.incubatee:
-                incubatee_name = f"{sale.product.incubatee.first_name} {sale.product.incubatee.last_name}"
-            
-            sales_list.append({
-                "sale_date": sale.sale_date.isoformat() if sale.sale_date else None,
-                "reservation_id": sale.reservation_id,
-                "incubatee_name": incubatee_name,
-                "product_name": sale.product_name,
-                "customer_name": customer_name,
-                "quantity": sale.quantity,
-                "unit_price": float(sale.unit_price) if sale.unit_price else 0,
-                "total_price": float(sale.total_price) if sale.total_price else 0,
-                "status": "completed"
-            })
-        
-        # Calculate summary statistics
-        total_revenue = sum(float(sale.total_price) for sale in sales_data if sale.total_price)
-        total_orders = len(sales_data)
-        completed_orders = len(sales_data)
-        completion_rate = 100.0 if total_orders > 0 else 0
-        
-        # Get unique incubatees
-        incubatee_ids = set()
-        for sale in sales_data:
-            if sale.incubatee_id:
-                incubatee_ids.add(sale.incubatee_id)
-            elif sale.product and sale.product.incubatee_id:
-                incubatee_ids.add(sale.product.incubatee_id)
-        
-        active_incubatees = len(incubatee_ids)
+        filters = SalesSummary.filters(request.args)
         
-        # Incubatee performance data
-        incubatee_performance = []
-        incubatee_sales = {}
+        # Totals, incubatee performance and charts in one grouped query
+        response_data = {"success": True, **SalesSummary.build(filters)}
         
-        # Group sales by incubatee
-        for sale in sales_data:
-            incubatee_id = None
-            incubatee_name = "Unknown"
-            
-            if sale.incubatee:
-                incubatee_id = sale.incubatee_id
-                incubatee_name = f"{sale.incubatee.first_name} {sale.incubatee.last_name}"
-            elif sale.product and sale.product.incubatee:
-                incubatee_id = sale.product.incubatee_id
-                incubatee_name = f"{sale.product.incubatee.first_name} {sale.product.incubatee.last_name}"
-            
-            if incubatee_id not in incubatee_sales:
-                incubatee_sales[incubatee_id] = {
-                    'name': incubatee_name,
-                    'revenue': 0,
-                    'order_count': 0,
-                    'product_count': 0,
-                    'completed_orders': 0,
-                    'products': set()
-                }
-            
-            incubatee_sales[incubatee_id]['revenue'] += float(sale.total_price) if sale.total_price else 0
-            incubatee_sales[incubatee_id]['order_count'] += 1
-            incubatee_sales[incubatee_id]['products'].add(sale.product_name)
-            incubatee_sales[incubatee_id]['completed_orders'] += 1
+        # First page of line items; /sales-lines serves the rest
+        total_orders = response_data["summary"]["total_orders"]
+        response_data["sales_data"] = SalesSummary.line_items(filters)
+        response_data["sales_data_pagination"] = SalesSummary.pagination(1, DEFAULT_LINE_ITEMS_PAGE_SIZE, total_orders)
         
-        # Format incubatee performance data
-        for incubatee_id, data in incubatee_sales.items():
-            incubatee_performance.append({
-                'name': data['name'],
-                'revenue': data['revenue'],
-                'order_count': data['order_count'],
-                'product_count': len(data['products']),
-                'completion_rate': (data['completed_orders'] / data['order_count'] * 100) if data['order_count'] > 0 else 0,
-                'top_product': next(iter(data['products'])) if data['products'] else 'N/A'
-            })
-        
-        # Sort incubatees by revenue
-        incubatee_performance.sort(key=lambda x: x['revenue'], reverse=True)
-        
-        # Sales by incubatee for doughnut chart
-        incubatee_sales_chart = {}
-        for sale in sales_data:
-            incubatee_name = "Unknown"
-            if sale.incubatee:
-                incubatee_name = f"{sale.incubatee.first_name} {sale.incubatee.last_name}"
-            elif sale.product and sale.product.incubatee:
-                incubatee_name = f"{sale.product.incubatee.first_name} {sale.product.incubatee.last_name}"
-            
-            if incubatee_name not in incubatee_sales_chart:
-                incubatee_sales_chart[incubatee_name] = 0
-            incubatee_sales_chart[incubatee_name] += float(sale.total_price) if sale.total_price else 0
-        
-        # Convert to lists for chart, limit to top 8 for better visualization
-        sorted_incubatee_sales = sorted(incubatee_sales_chart.items(), key=lambda x: x[1], reverse=True)
-        incubatee_sales_labels = [inc[0] for inc in sorted_incubatee_sales[:8]]
-        incubatee_sales_data = [inc[1] for inc in sorted_incubatee_sales[:8]]
-        
-        # If there are more than 8 incubatees, group the rest as "Others"
-        if len(sorted_incubatee_sales) > 8:
-            others_total = sum(inc[1] for inc in sorted_incubatee_sales[8:])
-            if others_total > 0:
-                incubatee_sales_labels.append("Others")
-                incubatee_sales_data.append(others_total)
+        return jsonify(response_data)
         
-        # Top incubatees for bar chart (limit to 5)
-        top_incubatees_labels = [inc['name'] for inc in incubatee_performance[:5]]
-        top_incubatees_data = [inc['revenue'] for inc in incubatee_performance[:5]]
+    except Exception as e:
+        current_app.logger.error(f"Error in sales_summary: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def line_items_page():
+    page = max(request.args.get('page', 1, type=int) or 1, 1)
+    per_page = request.args.get('per_page', DEFAULT_LINE_ITEMS_PAGE_SIZE, type=int) or DEFAULT_LINE_ITEMS_PAGE_SIZE
+    return page, min(max(per_page, 1), MAX_LINE_ITEMS_PAGE_SIZE)
+
+@report_bp.route("/sales-lines")
+def sales_lines():
+    """Paginated line items of the sales summary (same filters, plus page/per_page)"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    
+    return invalid_filters() or sales_lines_response()
+
+def sales_lines_cache_parts():
+    page, per_page = line_items_page()
+    return report_cache_parts(f"page={page}", f"per_page={per_page}")
+
+@cached("sales_lines", 3600, tags=("sales",), vary_on=sales_lines_cache_parts)
+def sales_lines_response():
+    try:
+        filters = SalesSummary.filters(request.args)
+        page, per_page = line_items_page()
         
-        response_data = {
+        return jsonify({
             "success": True,
-            "summary": {
-                "total_revenue": total_revenue,
-                "total_orders": total_orders,
-                "completed_orders": completed_orders,
-                "completion_rate": completion_rate,
-                "active_incubatees": active_incubatees
-            },
-            "sales_data": sales_list,
-            "incubatee_performance": incubatee_performance,
-            "charts": {
-                "incubatee_sales": {
-                    "labels": incubatee_sales_labels,
-                    "data": incubatee_sales_data
-                },
-                "top_incubatees": {
-                    "labels": top_incubatees_labels,
-                    "data": top_incubatees_data
-                }
-            }
-        }
-        
-        # Cache the response
-        if redis_client:
-            redis_client.setex(cache_key_str, 300, json.dumps(response_data, default=str))
-        
-        return jsonify(response_data)
+            "sales_data": SalesSummary.line_items(filters, page, per_page),
+            "pagination": SalesSummary.pagination(page, per_page, SalesSummary.count(filters))
+        })
         
     except Exception as e:
-        current_app.logger.error(f"Error in sales_summary: {str(e)}")
+        current_app.logger.error(f"Error in sales_lines: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
 
 @report_bp.route("/export")
 def export_report():
-    """Export sales report to CSV"""
+    """
+    Export the sales report. CSV is streamed; ?format=xlsx|parquet (or
+    csv with ?background=1) is generated by a background job and answers 202
+    with a token to poll at /export/<token>.
+    """
     if not session.get('admin_logged_in'):
         return jsonify({"success": False, "error": "Unauthorized"}), 401
     
     try:
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        report_type = request.args.get('type', 'overview')
-        filter_type = request.args.get('filter', 'all')
-        incubatee_id = request.args.get('incubatee_id')
-        category = request.args.get('category')
-        
-        # Get sales data (similar to sales_summary)
-        sales_query = SalesReport.query.options(
-            db.joinedload(SalesReport.incubatee),
-            db.joinedload(SalesReport.product),
-            db.joinedload(SalesReport.user)
-        )
+        invalid = invalid_filters()
+        if invalid:
+            return invalid
+        filters = SalesSummary.filters(request.args)
         
-        if start_date and end_date:
-            start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-            end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-            sales_query = sales_query.filter(
-                SalesReport.sale_date >= start_date_obj,
-                SalesReport.sale_date <= end_date_obj
-            )
+        export_format = request.args.get('format', 'csv').lower()
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"success": False, "error": f"Unsupported format: {export_format}"}), 400
+        if export_format not in report_exports.available_formats():
+            return jsonify({"success": False, "error": f"{export_format.upper()} export is not available on this server"}), 400
         
-        # Apply additional filters
-        if filter_type == 'incubatee' and incubatee_id:
-            sales_query = sales_query.join(IncubateeProduct,
-                                        SalesReport.product_id == IncubateeProduct.product_id)\
-                                    .filter(db.or_(SalesReport.incubatee_id == incubatee_id,IncubateeProduct.incubatee_id == incubatee_id))
-        elif filter_type == 'category' and category:
-            sales_query = sales_query.join(IncubateeProduct).filter(
-                IncubateeProduct.category == category)
-        
-        sales_data = sales_query.all()
-        
-        # Create CSV content
-        output = StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow(['Date', 'Order ID', 'Incubatee', 'Product', 'Customer', 'Quantity', 'Unit Price', 'Total', 'Status'])
-        
-        for sale in sales_data:
-            # Get customer name from username
-            customer_name = "Unknown"
-            if sale.user:
-                customer_name = sale.user.username
-            
-            # Get incubatee name
-            incubatee_name = "Unknown"
-            if sale.incubatee:
-                incubatee_name = f"{sale.incubatee.first_name} {sale.incubatee.last_name}"
-            elif sale.product and sale.product.incubatee:
-                incubatee_name = f"{sale.product.incubatee.first_name} {sale.product.incubatee.last_name}"
-            
-            writer.writerow([
-                sale.sale_date.isoformat() if sale.sale_date else '',
-                sale.reservation_id,
-                incubatee_name,
-                sale.product_name,
-                customer_name,
-                sale.quantity,
-                float(sale.unit_price) if sale.unit_price else 0,
-                float(sale.total_price) if sale.total_price else 0,
-                'completed'
-            ])
-        
-        # Return CSV file
-        response = Response(
-            output.getvalue(),
-            mimetype="text/csv",
-            headers={"Content-disposition": f"attachment; filename=report-{start_date}-to-{end_date}.csv"}
-        )
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        filename_stem = f"report-{start_date}-to-{end_date}"
+        if export_format == 'csv' and not request.args.get('background'):
+            return csv_response(EXPORT_HEADER, SalesSummary.export_rows(filters), f"{filename_stem}.csv")
         
-        return response
+        state = report_exports.start(export_format, filters, filename_stem)
+        return jsonify({"success": True, **export_status_payload(state)}), 202
         
     except Exception as e:
         current_app.logger.error(f"Error exporting report: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
 
+def export_status_payload(state):
+    total = state.get('total')
+    payload = {
+        "token": state['token'],
+        "format": state['format'],
+        "status": state['status'],
+        "filename": state['filename'],
+        "progress": {
+            "rows": state.get('rows', 0),
+            "total": total,
+            "percent": round(state.get('rows', 0) * 100 / total, 1) if total else (100.0 if state['status'] == 'done' else 0.0)
+        },
+        "status_url": url_for('report.export_status', token=state['token']),
+        "download_url": url_for('report.export_download', token=state['token']) if state['status'] == 'done' else None
+    }
+    if state.get('error'):
+        payload["error"] = state['error']
+    return payload
+
+@report_bp.route("/export/<token>")
+def export_status(token):
+    """Progress of a background export"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    
+    state = report_exports.status(token)
+    if state is None:
+        return jsonify({"success": False, "error": "Export not found or expired"}), 404
+    return jsonify({"success": state['status'] != 'failed', **export_status_payload(state)})
+
+@report_bp.route("/export/<token>/download")
+def export_download(token):
+    """Download a finished background export"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    
+    state = report_exports.status(token)
+    if state is None or state['status'] != 'done' or not os.path.exists(report_exports.file_path(state)):
+        return jsonify({"success": False, "error": "Export not ready, expired or not found"}), 404
+    return send_file(
+        report_exports.file_path(state),
+        mimetype=EXPORT_FORMATS[state['format']][0],
+        as_attachment=True,
+        download_name=state['filename']
+    )
+
 @report_bp.route("/preview")
 def preview_report():
     """Preview report data (limited rows)"""
     if not session.get('admin_logged_in'):
         return jsonify({"success": False, "error": "Unauthorized"}), 401
     
+    return invalid_filters() or preview_report_response()
+
+@cached("sales_preview", 3600, tags=("sales",), vary_on=report_cache_parts)
+def preview_report_response():
     try:
-        # Get parameters
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        filter_type = request.args.get('filter', 'all')
-        incubatee_id = request.args.get('incubatee_id')
-        category = request.args.get('category')
-        
-        # Base query
-        sales_query = SalesReport.query.options(
-            db.joinedload(SalesReport.incubatee),
-            db.joinedload(SalesReport.product),
-            db.joinedload(SalesReport.user)
-        )
-        
-        # Apply filters
-        if start_date and end_date:
-            start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-            end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-            sales_query = sales_query.filter(
-                SalesReport.sale_date >= start_date_obj,
-                SalesReport.sale_date <= end_date_obj
-            )
-        
-        if filter_type == 'incubatee' and incubatee_id:
-            sales_query = sales_query.join(IncubateeProduct,
-                                        SalesReport.product_id == IncubateeProduct.product_id)\
-                                    .filter(db.or_(SalesReport.incubatee_id == incubatee_id,IncubateeProduct.incubatee_id == incubatee_id))
-        elif filter_type == 'category' and category:
-            sales_query = sales_query.join(IncubateeProduct).filter(
-                IncubateeProduct.category == category)
-        
-        # Get limited data for preview (first 20 rows)
-        sales_data = sales_query.limit(20).all()
-        
-        # Prepare preview data
-        preview_data = []
-        total_revenue = 0
+        filters = SalesSummary.filters(request.args)
         
-        for sale in sales_data:
-            # Get customer name from username
-            customer_name = "Unknown"
-            if sale.user:
-                customer_name = sale.user.username
-            
-            # Get incubatee name
-            incubatee_name = "Unknown"
-            if sale.incubatee:
-                incubatee_name = f"{sale.incubatee.first_name} {sale.incubatee.last_name}"
-            elif sale.product and sale.product.incubatee:
-                incubatee_name = f"{sale.product.incubatee.first_name} {sale.product.incubatee.last_name}"
-            
-            preview_data.append({
-                "date": sale.sale_date.strftime("%Y-%m-%d") if sale.sale_date else "",
-                "order_id": sale.reservation_id,
-                "incubatee": incubatee_name,
-                "product": sale.product_name,
-                "customer": customer_name,
-                "quantity": sale.quantity,
-                "unit_price": float(sale.unit_price) if sale.unit_price else 0,
-                "total": float(sale.total_price) if sale.total_price else 0
-            })
-            
-            total_revenue += float(sale.total_price) if sale.total_price else 0
+        # First rows of the export, with the same filters
+        preview_data = SalesSummary.preview_rows(filters, PREVIEW_ROWS)
         
         return jsonify({
             "success": True,
             "preview_data": preview_data,
-            "total_rows": len(sales_data),
-            "total_revenue": total_revenue,
-            "has_more_data": sales_query.count() > 20
+            "total_rows": len(preview_data),
+            "total_revenue": sum(row["total"] for row in preview_data),
+            "has_more_data": SalesSummary.count(filters) > PREVIEW_ROWS
         })
         
     except Exception as e:
@@ -1,102 +1,45 @@
 from flask import Blueprint, request, jsonify, session, current_app, url_for, Response
 from ..extension import db
 from ..models.reservation import Reservation
-from ..models.admin import IncubateeProduct, SalesReport
+from ..models.admin import IncubateeProduct, SalesReport, SalesDailyRollup
 from datetime import datetime, timezone, timedelta
-import csv
-from io import StringIO
-import redis, json, os
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 import atexit
 from decimal import Decimal, ROUND_HALF_UP
+from ..services.reservation_service import ReservationService
+from ..services.stock_service import StockService
+from ..services.sales_rollup import SalesRollup
+from ..services.reservation_queue import reservation_due_queue
+from ..utils.scheduler_lease import get_lease, interval_lease_ttl
+from ..utils.scheduler_metrics import track_scheduler, scheduler_metrics
+from ..utils.csv_stream import csv_response
+from ..cache import get_redis_client, cache_key, cached, get_cached_data, set_cached_data, invalidate_tags
 
 reservation_bp = Blueprint("reservation_bp", __name__, url_prefix="/reservations")
 
-# Redis client setup
-redis_client = None
 scheduler = None
+# Reservations are processed when they fall due (see services/reservation_queue.py);
+# this sweep only re-queues pending reservations the due queue does not know about
+RESERVATION_RECONCILE_INTERVAL_SECONDS = 600
+reservation_lease = get_lease("reservation_processor", interval_lease_ttl(RESERVATION_RECONCILE_INTERVAL_SECONDS))
 
-def get_redis_client():
-    """Get redis client with lazy initialization"""
-    global redis_client
-    if redis_client is None:
-        try:
-            redis_url = os.environ.get('redis_url')
-            if redis_url:
-                redis_client = redis.from_url(redis_url)
-            else:
-                # Fallback to local redis if no environment variable
-                redis_client = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
-        except Exception as e:
-            current_app.logger.error(f"Redis Connection failed: {str(e)}")
-            redis_client = None
-    return redis_client
-
-def cache_key(prefix, *args):
-    """Generate cache key with prefix and arguments"""
-    key_parts = [prefix] + [str(arg) for arg in args]
-    return ":".join(key_parts)
-
-def get_cached_data(key, expire_seconds=3600):
-    """Get data from cache, return (data, found) tuple"""
-    redis_client = get_redis_client()
-    if not redis_client:
-        return None, False
-    
-    try:
-        cached = redis_client.get(key)
-        if cached:
-            return json.loads(cached), True
-        return None, False
-    except Exception as e:
-        current_app.logger.warning(f"Cache get error for key {key}: {str(e)}")
-        return None, False
-    
-def set_cached_data(key, data, expire_seconds=3600):
-    """Set data in cache with expiration"""
-    redis_client = get_redis_client()
-    if not redis_client:
-        return
-    
-    try:
-        redis_client.setex(key, expire_seconds, json.dumps(data, default=str))
-    except Exception as e:
-        current_app.logger.warning(f"Cache set error for key {key}: {str(e)}")
-
-def invalidate_cache(pattern):
-    """Invalidate cache keys matching pattern"""
-    redis_client = get_redis_client()
-    if not redis_client:
+def invalidate_reservation_caches(user_id=None, product_id=None):
+    """
+    Invalidate reservation-related caches. With a user or product only the
+    global lists and that user's/product's lists are dropped; without either
+    every reservation list goes.
+    """
+    if user_id is None and product_id is None:
+        invalidate_tags("reservations")
         return
-    
-    try:
-        keys = redis_client.keys(pattern)
-        if keys:
-            redis_client.delete(*keys)
-    except Exception as e:
-        current_app.logger.warning(f"Cache invalidation error for pattern {pattern}: {str(e)}")
 
-def invalidate_reservation_caches(user_id=None, product_id=None):
-    """Invalidate reservation-related caches"""
-    patterns = [
-        "reservations:*",
-        "reservations_user:*",
-        "reservations_status:*",
-        "product_queue:*",
-        "sales:*"
-    ]
-    
+    tags = ["reservations:global"]
     if user_id:
-        patterns.append(f"reservations_user:{user_id}*")
-        patterns.append(f"reservations_status:*:{user_id}")
-    
+        tags.append(f"user:{user_id}")
     if product_id:
-        patterns.append(f"product_queue:{product_id}")
-        patterns.append(f"reservations_product:{product_id}*")
-    
-    for pattern in patterns:
-        invalidate_cache(pattern)
+        tags.append(f"product:{product_id}")
+    invalidate_tags(*tags)
 
 def init_scheduler(app):
     """Initialize the APScheduler for automatic reservation processing"""
@@ -108,19 +51,24 @@ def init_scheduler(app):
     
     try:
         scheduler = BackgroundScheduler()
+        track_scheduler(scheduler, 'reservation_scheduler')
         scheduler.start()
         
-        # Add job to process reservations every 30 seconds
+        # Wake up exactly when the next pending reservation becomes due
+        reservation_due_queue.init_app(app, scheduler, process_reservation_queues, get_redis_client)
+        
+        # Re-queue pending reservations on startup and every 10 minutes (leader worker only)
         scheduler.add_job(
-            id='reservation_processor',
+            id='reservation_reconciler',
             func=lambda: process_reservation_queues_job(app),
-            trigger=IntervalTrigger(seconds=30),
+            trigger=IntervalTrigger(seconds=RESERVATION_RECONCILE_INTERVAL_SECONDS),
+            next_run_time=datetime.now(timezone.utc),
             max_instances=1,
             replace_existing=True
         )
         
         app.logger.info("✅ APScheduler initialized - Auto-approval is ACTIVE")
-        app.logger.info("🕒 Will process pending reservations every 30 seconds")
+        app.logger.info("🕒 Pending reservations are processed as soon as they become due")
         
         # Register shutdown handler
         atexit.register(lambda: scheduler.shutdown() if scheduler else None)
@@ -132,19 +80,26 @@ def init_scheduler(app):
         return None
 
 def process_reservation_queues_job(app):
-    """Wrapper function for the scheduler job"""
+    """Wrapper function for the scheduler job: re-queue every pending reservation"""
     try:
         # Use the passed app instance to create context
         with app.app_context():
-            current_time = datetime.now(timezone.utc)
-            app.logger.info(f"🔄 Auto-processing reservations at {current_time.strftime('%Y-%m-%d %H:%M:%S')}")
+            # Only the worker holding the lease reconciles this tick
+            if not reservation_lease.acquire():
+                app.logger.debug("⏭️ Skipping reservation reconcile - another worker holds the lease")
+                return
             
-            success = process_reservation_queues()
+            pending = db.session.query(
+                Reservation.reservation_id,
+                Reservation.product_id,
+                Reservation.reserved_at
+            ).filter(Reservation.status == "pending").all()
+            db.session.commit()
             
-            if success:
-                app.logger.info("✅ Reservation auto-processing completed successfully")
-            else:
-                app.logger.error("❌ Reservation auto-processing failed")
+            # Already-due reservations are processed right away by the due queue
+            reservation_due_queue.schedule_many(pending)
+            if pending:
+                app.logger.info(f"🔄 Reconciled {len(pending)} pending reservations into the due queue")
                 
     except Exception as e:
         # Use the passed app instance for logging
@@ -155,39 +110,58 @@ def get_scheduler_status():
     global scheduler
     if scheduler and scheduler.running:
         jobs = scheduler.get_jobs()
-        next_run = jobs[0].next_run_time if jobs else None
+        due_job = scheduler.get_job(reservation_due_queue.JOB_ID)
+        next_run = due_job.next_run_time if due_job else None
+        next_due = reservation_due_queue.next_due()
         return {
             "running": True,
             "jobs_count": len(jobs),
-            "next_run_time": next_run.isoformat() if next_run else None
+            "next_run_time": next_run.isoformat() if next_run else None,
+            "queued_reservations": reservation_due_queue.size(),
+            "next_due_at": datetime.fromtimestamp(next_due, timezone.utc).isoformat() if next_due else None,
+            "lease": reservation_lease.status(),
+            "thread_pool": scheduler_metrics('reservation_scheduler')
         }
-    return {"running": False}
+    return {"running": False, "lease": reservation_lease.status()}
 
-def process_reservation_queues():
+def process_reservation_queues(product_ids=None):
     """
     Process all pending reservations for all products using FCFS algorithm
     This function automatically approves reservations when stock is available
-    and rejects reservations when stock is insufficient
+    and rejects reservations when stock is insufficient.
+
+    Returns per-product counts from ReservationService.allocate_pending,
+    or None if processing failed.
     """
     try:
-        # Get all products that have pending reservations
-        products_with_pending = db.session.query(IncubateeProduct).join(Reservation).filter(
-            Reservation.status == "pending").distinct().all()
-
-        for product in products_with_pending:
-            process_product_reservations(product.product_id)
-            
-        db.session.commit()
-        
-        # Invalidate relevant caches after processing
-        invalidate_reservation_caches()
-        invalidate_cache("products:*")  # Invalidate product stock caches
-        
-        return True
+        results = ReservationService.allocate_pending(product_ids)
+
+        # Invalidate caches only for products whose queue actually changed
+        changed = {pid: r for pid, r in results.items() if r["approved"] or r["rejected"]}
+        if changed:
+            tags = {"reservations:global", "products"}  # Invalidate product stock caches
+            for product_id, result in changed.items():
+                tags.add(f"product:{product_id}")
+                tags.add(f"incubatee:{result['incubatee_id']}")
+            invalidate_tags(*tags)
+
+        return results
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error processing reservation queues: {e}")
-        return False
+        return None
+
+def processing_summary(results):
+    """Per-product approve/reject counts for JSON responses"""
+    return {
+        str(product_id): {
+            "approved": result["approved"],
+            "rejected": result["rejected"],
+            "still_pending": result["still_pending"],
+            "remaining_stock": result["remaining_stock"]
+        }
+        for product_id, result in results.items()
+    }
 
 def process_product_reservations(product_id):
     """
@@ -195,88 +169,8 @@ def process_product_reservations(product_id):
     Automatically approves when stock is available after 2-minute delay
     Rejects reservations when stock is insufficient
     """
-    try:
-        product = IncubateeProduct.query.get(product_id)
-        if not product:
-            current_app.logger.warning(f"❌ Product {product_id} not found for processing")
-            return False
-
-        # Get all pending reservations for this product, ordered by reservation time (FCFS)
-        pending_reservations = Reservation.query.filter_by(product_id=product_id, status="pending").order_by(Reservation.reserved_at.asc()).all()
-
-        if not pending_reservations:
-            return True  # No pending reservations to process
-
-        available_stock = product.stock_amount or 0
-        current_time = datetime.now(timezone.utc)
-        
-        current_app.logger.info(f"🔍 Processing {len(pending_reservations)} pending reservations for product '{product.name}' (ID: {product_id})")
-        current_app.logger.info(f"📦 Available stock: {available_stock}")
-        
-        approved_count = 0
-        rejected_count = 0
-        still_pending_count = 0
-        
-        for reservation in pending_reservations:
-            # Calculate how long the reservation has been pending
-            time_pending = current_time - reservation.reserved_at
-            time_pending_minutes = time_pending.total_seconds() / 60
-            
-            # Check if reservation has been pending for at least 2 minutes
-            if time_pending_minutes >= 2:
-                if available_stock >= reservation.quantity:
-                    # Enough stock AND 2 minutes have passed - APPROVE the reservation
-                    reservation.status = "approved"
-                    reservation.approved_at = current_time
-                    available_stock -= reservation.quantity
-                    product.stock_amount = available_stock
-                    
-                    approved_count += 1
-                    current_app.logger.info(
-                        f"✅ Reservation {reservation.reservation_id} AUTO-APPROVED after {time_pending_minutes:.1f} minutes. "
-                        f"Stock deducted: {reservation.quantity}, Remaining: {available_stock}"
-                    )
-                else:
-                    # Not enough stock - REJECT the reservation
-                    reservation.status = "rejected"
-                    reservation.rejected_at = current_time
-                    reservation.rejected_reason = "Insufficient stock - product out of stock"
-                    
-                    rejected_count += 1
-                    current_app.logger.info(
-                        f"❌ Reservation {reservation.reservation_id} AUTO-REJECTED after {time_pending_minutes:.1f} minutes. "
-                        f"Requested: {reservation.quantity}, Available: {available_stock}"
-                    )
-            else:
-                # Reservation is still within the 2-minute waiting period
-                minutes_remaining = 2 - time_pending_minutes
-                still_pending_count += 1
-                current_app.logger.debug(
-                    f"⏳ Reservation {reservation.reservation_id} still pending. "
-                    f"Time elapsed: {time_pending_minutes:.1f} minutes, "
-                    f"Time remaining: {minutes_remaining:.1f} minutes"
-                )
-        
-        db.session.commit()
-        
-        # Log summary
-        if approved_count > 0 or rejected_count > 0:
-            current_app.logger.info(
-                f"📊 Processing complete for product {product_id}: "
-                f"{approved_count} approved, {rejected_count} rejected, {still_pending_count} still pending"
-            )
-        
-        # Invalidate caches for this product
-        invalidate_reservation_caches(product_id=product_id)
-        invalidate_cache(f"product:{product_id}")
-        invalidate_cache(f"incubatee_products:{product.incubatee_id}")
-        
-        return True
-        
-    except Exception as e:
-        db.session.rollback()
-        current_app.logger.error(f"❌ Error processing reservations for product {product_id}: {e}")
-        return False
+    results = process_reservation_queues([product_id])
+    return results is not None
     
 def calculate_discount_percentage(original_price, discounted_price):
     """
@@ -366,12 +260,8 @@ def create_reservation():
         db.session.add(reservation)
         db.session.commit()
 
-        # Process immediately to check if it should be approved/rejected
-        # But with the 2-minute delay logic, it will remain pending if stock is available
-        process_product_reservations(product_id)
-        
-        # Refresh to get the final status
-        db.session.refresh(reservation)
+        # Decided by the due queue once the 2-minute delay has passed
+        reservation_due_queue.schedule(reservation.reservation_id, product_id, reservation.reserved_at)
 
         # Calculate time until potential approval
         time_until_approval = "2 minutes" if reservation.status == "pending" else "immediately"
@@ -400,10 +290,10 @@ def process_delayed_reservations():
     Useful for testing the 2-minute delay functionality
     """
     try:
-        success = process_reservation_queues()
+        results = process_reservation_queues()
         
-        if success:
-            return jsonify({"success": True, "message": "Delayed reservations processed successfully","note": "Reservations pending for 2+ minutes were approved if stock available"})
+        if results is not None:
+            return jsonify({"success": True, "message": "Delayed reservations processed successfully","note": "Reservations pending for 2+ minutes were approved if stock available","products": processing_summary(results)})
         else:
             return jsonify({"success": False, "message": "Error processing delayed reservations"})
             
@@ -422,55 +312,28 @@ def create_bulk_reservations():
         if not user_id or not items:
             return jsonify({"success": False, "error": "Missing required fields"}), 400
 
-        results = []
-        processed_products = set()
-        
-        # First, create all reservations as pending
-        for item in items:
-            product_id = item.get("product_id")
-            quantity = item.get("quantity")
+        # One product query, one multi-row INSERT ... RETURNING
+        created = ReservationService.create_bulk(user_id, items)
 
-            if not product_id or quantity <= 0:
-                continue
+        # Decided by the due queue once the 2-minute delay has passed
+        pending = [r for r in created if r["status"] == "pending"]
+        reservation_due_queue.schedule_many(
+            (r["reservation_id"], r["product_id"], r["reserved_at"]) for r in pending
+        )
+        processed_products = {r["product_id"] for r in pending}
 
-            product = IncubateeProduct.query.get(product_id)
-            if not product:
-                results.append({"product_id": product_id,"status": "error","message": "Product not found"})
+        results = []
+        for reservation in created:
+            if reservation["status"] == "error":
+                results.append({"product_id": reservation["product_id"],"status": "error","message": reservation["reason"]})
                 continue
-
-            # Check if product has no stock
-            current_stock = product.stock_amount or 0
-            if current_stock <= 0:
-                reservation = Reservation(user_id=user_id,product_id=product_id,quantity=quantity,status="rejected",reserved_at=datetime.now(timezone.utc),rejected_at=datetime.now(timezone.utc),rejected_reason="Product out of stock")
-                db.session.add(reservation)
-                results.append({"product_id": product_id,"reservation_id": reservation.reservation_id,"status": "rejected","message": "Product out of stock"})
-            else:
-                # Create as pending
-                reservation = Reservation(user_id=user_id,product_id=product_id,quantity=quantity,status="pending",reserved_at=datetime.now(timezone.utc))
-                db.session.add(reservation)
-                results.append({"product_id": product_id,"reservation_id": reservation.reservation_id,"status": "pending"})
-                processed_products.add(product_id)
-
-        db.session.commit()
-
-        # Process each product's reservation queue
-        for product_id in processed_products:
-            process_product_reservations(product_id)
-
-        # Update results with final statuses
-        for result in results:
-            if "reservation_id" in result:
-                reservation = Reservation.query.get(result["reservation_id"])
-                if reservation:
-                    result["status"] = reservation.status
-                    result["message"] = f"Reservation {reservation.status}"
-                    if reservation.status == "rejected":
-                        result["reason"] = reservation.rejected_reason
+            result = {"product_id": reservation["product_id"],"reservation_id": reservation["reservation_id"],"status": reservation["status"],"message": f"Reservation {reservation['status']}"}
+            if reservation["status"] == "rejected":
+                result["reason"] = reservation["reason"]
+            results.append(result)
 
         # Invalidate caches
-        invalidate_reservation_caches(user_id=user_id)
-        for product_id in processed_products:
-            invalidate_reservation_caches(product_id=product_id)
+        invalidate_tags("reservations:global", f"user:{user_id}", *[f"product:{product_id}" for product_id in processed_products])
         
         return jsonify({"success": True, "message": "Reservations processed successfully","results": results}), 201
 
@@ -487,16 +350,20 @@ def update_reservation_status(reservation_id):
         data = request.get_json()
         new_status = data.get("status")
 
-        reservation = Reservation.query.get(reservation_id)
+        # Lock the reservation so two concurrent completions cannot both create a sale
+        reservation = StockService.lock_reservation(reservation_id)
         if not reservation:
+            db.session.rollback()
             return jsonify({"success": False, "error": "Reservation not found"}), 404
 
         # Only allow changing to 'completed' status
         if new_status != "completed":
+            db.session.rollback()
             return jsonify({"success": False, "error": "Only status change to 'completed' is allowed"}), 400
 
         # Only allow completing approved reservations
         if reservation.status != "approved":
+            db.session.rollback()
             return jsonify({"success": False, "error": "Only approved reservations can be completed"}), 400
 
         # Get product details
@@ -525,7 +392,7 @@ def update_reservation_status(reservation_id):
         # ✅ AUTO-UPDATE PRODUCT POPULARITY
         try:
             from app.services.popularity_service import ProductPopularityService
-            ProductPopularityService.update_from_reservation(reservation)
+            ProductPopularityService.update_from_reservation(reservation, sales_report)
             print(f"🎯 Auto-updated popularity for reservation {reservation_id}")
         except Exception as e:
             print(f"⚠️ Could not update popularity: {e}")
@@ -534,8 +401,7 @@ def update_reservation_status(reservation_id):
         
         # Invalidate caches
         invalidate_reservation_caches(user_id=reservation.user_id, product_id=reservation.product_id)
-        invalidate_cache("sales:*")
-        invalidate_cache("sales_summary:*")
+        invalidate_tags("sales")
         
         return jsonify({"success": True, "message": "Reservation marked as completed and sales record created","sales_id": sales_report.sales_id}), 200
 
@@ -595,7 +461,7 @@ def get_all_reservations():
             "message": "Reservations retrieved successfully"
         }
         
-        set_cached_data(cache_key_str, response_data, 300)
+        set_cached_data(cache_key_str, response_data, 300, tags=("reservations", "reservations:global"))
         return jsonify(response_data), 200
         
     except Exception as e:
@@ -607,10 +473,10 @@ def get_all_reservations():
 def process_pending_reservations():
     """Admin endpoint to force process all pending reservations"""
     try:
-        success = process_reservation_queues()
+        results = process_reservation_queues()
         
-        if success:
-            return jsonify({"success": True, "message": "All pending reservations processed successfully"})
+        if results is not None:
+            return jsonify({"success": True, "message": "All pending reservations processed successfully", "products": processing_summary(results)})
         else:
             return jsonify({"success": False, "message": "Error processing pending reservations"})
             
@@ -652,7 +518,7 @@ def get_product_reservation_queue(product_id):
             "reservation_queue": queue_data
         }
         
-        set_cached_data(cache_key_str, response_data, 120)
+        set_cached_data(cache_key_str, response_data, 120, tags=("reservations", f"product:{product_id}"))
         return jsonify(response_data)
 
     except Exception as e:
@@ -705,7 +571,7 @@ def get_user_reservations(user_id):
             })
 
         response_data = {"success": True, "reservations": reservations_list}
-        set_cached_data(cache_key_str, response_data, 120)
+        set_cached_data(cache_key_str, response_data, 120, tags=("reservations", f"user:{user_id}"))
         return jsonify(response_data), 200
 
     except Exception as e:
@@ -780,7 +646,7 @@ def get_reservations_by_status(status):
             })
 
         response_data = {"success": True, "reservations": reservations_list}
-        set_cached_data(cache_key_str, response_data, 60)
+        set_cached_data(cache_key_str, response_data, 60, tags=("reservations", f"user:{user_id}" if user_id else "reservations:global"))
         return jsonify(response_data), 200
 
     except Exception as e:
@@ -818,24 +684,32 @@ def approve_reservation(reservation_id):
         reservation = Reservation.query.get(reservation_id)
         if not reservation:
             return jsonify({"success": False, "error": "Reservation not found"})
+        if reservation.status in ("approved", "completed"):
+            return jsonify({"success": False, "error": "Reservation already approved"})
         
-        product = IncubateeProduct.query.get(reservation.product_id)
+        # Lock product then reservation (same order as the FCFS engine)
+        product = StockService.lock_product(reservation.product_id)
         if not product:
+            db.session.rollback()
             return jsonify({"success": False, "error": "Product not found"})
         
-        # Check if enough stock is available
-        if product.stock_amount < reservation.quantity:
+        reservation = StockService.lock_reservation(reservation_id)
+        if not reservation or reservation.status in ("approved", "completed"):
+            db.session.rollback()
+            return jsonify({"success": False, "error": "Reservation already approved"})
+        
+        # Deduct stock atomically - fails if not enough stock is available
+        if StockService.reserve(reservation.product_id, reservation.quantity) is None:
+            db.session.rollback()
             return jsonify({"success": False, "error": "Insufficient stock"})
         
-        # Update stock amount
-        product.stock_amount -= reservation.quantity
         reservation.status = "approved"
         
         db.session.commit()
         
         # Invalidate caches
         invalidate_reservation_caches(user_id=reservation.user_id, product_id=reservation.product_id)
-        invalidate_cache(f"product:{reservation.product_id}")
+        invalidate_tags("products")
         
         return jsonify({"success": True, "message": "Reservation approved and stock updated"})
         
@@ -888,7 +762,7 @@ def get_sales_report():
             "total_products": total_products}
         
         response_data = {"success": True,"report": report_data,"summary": summary}
-        set_cached_data(cache_key_str, response_data, 300)
+        set_cached_data(cache_key_str, response_data, 300, tags=("sales",))
         return jsonify(response_data), 200
         
     except Exception as e:
@@ -905,31 +779,26 @@ def export_sales_report():
         
         target_date = datetime.strptime(date_str, "%Y-%m-%d").date()
         
-        # Get sales data with joined reservation info
-        sales_data = (db.session.query(SalesReport, Reservation)
+        # Only the exported columns, read through a server-side cursor
+        sales_data = (db.session.query(
+                SalesReport.sales_id, SalesReport.reservation_id, SalesReport.user_id, SalesReport.product_name,
+                SalesReport.quantity, SalesReport.unit_price, SalesReport.total_price, SalesReport.sale_date,
+                Reservation.reserved_at, Reservation.completed_at, Reservation.status)
             .join(Reservation, SalesReport.reservation_id == Reservation.reservation_id)
             .filter(SalesReport.sale_date == target_date)
             .order_by(Reservation.completed_at.asc())
-            .all())
+            .yield_per(1000))
         
-        output = StringIO()
-        writer = csv.writer(output)
-        
-        # Write header - added reserved_at and status
-        writer.writerow(['Sales ID', 'Reservation ID', 'User ID', 'Product Name', 'Quantity', 'Unit Price', 'Total Price', 'Sale Date', 'Reserved Date', 'Completed Time', 'Status'])
-        
-        # Write data - FIXED: Remove peso sign, export only numbers
-        for sale_report, reservation in sales_data:
-            writer.writerow([sale_report.sales_id,sale_report.reservation_id,sale_report.user_id,sale_report.product_name,sale_report.quantity,
-                float(sale_report.unit_price),  # FIXED: No peso sign, just the number
-                float(sale_report.total_price),  # FIXED: No peso sign, just the number
-                sale_report.sale_date.strftime("%Y-%m-%d"),
-                reservation.reserved_at.strftime("%Y-%m-%d %H:%M:%S"),
-                reservation.completed_at.strftime("%Y-%m-%d %H:%M:%S") if reservation.completed_at else "N/A",
-                reservation.status])
-        response = Response(output.getvalue(),mimetype="text/csv",headers={"Content-Disposition": f"attachment;filename=sales-report-{date_str}.csv","Content-type": "text/csv"})
+        # Numbers only, no peso sign
+        rows = ([sale.sales_id, sale.reservation_id, sale.user_id, sale.product_name, sale.quantity,
+                float(sale.unit_price), float(sale.total_price),
+                sale.sale_date.strftime("%Y-%m-%d"),
+                sale.reserved_at.strftime("%Y-%m-%d %H:%M:%S"),
+                sale.completed_at.strftime("%Y-%m-%d %H:%M:%S") if sale.completed_at else "N/A",
+                sale.status] for sale in sales_data)
         
-        return response
+        header = ['Sales ID', 'Reservation ID', 'User ID', 'Product Name', 'Quantity', 'Unit Price', 'Total Price', 'Sale Date', 'Reserved Date', 'Completed Time', 'Status']
+        return csv_response(header, rows, f"sales-report-{date_str}.csv")
         
     except Exception as e:
         current_app.logger.error(f"Error exporting sales report: {e}")
@@ -937,29 +806,15 @@ def export_sales_report():
         
 # GET SALES SUMMARY (For Dashboard)
 @reservation_bp.route("/sales-summary", methods=["GET"])
+@cached("sales_summary:daily", 120, tags=("sales",), stale_seconds=60)  # Cache for 2 minutes
 def get_sales_summary():
     """Get overall sales summary for dashboard"""
     try:
-        cache_key_str = "sales_summary:daily"
-        
-        # Try cache first (2 minutes cache for sales summary)
-        cached_data, found = get_cached_data(cache_key_str, expire_seconds=120)
-        if found:
-            return jsonify(cached_data)
-        
-        # Today's sales
+        # Today's and this month's totals from the daily rollup
         today = datetime.now(timezone.utc).date()
-        today_sales = db.session.query(db.func.sum(SalesReport.total_price)).filter(SalesReport.sale_date == today).scalar() or 0
-        
-        # This month's sales
         first_day_of_month = today.replace(day=1)
-        month_sales = db.session.query(db.func.sum(SalesReport.total_price)).filter(SalesReport.sale_date >= first_day_of_month).scalar() or 0
-        
-        # Total completed orders today
-        today_orders = db.session.query(SalesReport).filter(SalesReport.sale_date == today).count()
-        
-        # Total products sold today
-        today_products = db.session.query(db.func.sum(SalesReport.quantity)).filter(SalesReport.sale_date == today).scalar() or 0
+        today_sales, today_orders, today_products = SalesRollup.totals([SalesDailyRollup.sale_date == today])
+        month_sales, _, _ = SalesRollup.totals([SalesDailyRollup.sale_date >= first_day_of_month])
         
         response_data = {
             "success": True,
@@ -971,7 +826,6 @@ def get_sales_summary():
             }
         }
         
-        set_cached_data(cache_key_str, response_data, 120)
         return jsonify(response_data), 200
         
     except Exception as e:
@@ -999,17 +853,17 @@ def get_sales_by_date_range():
         start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
         end_date = datetime.strptime(end_date_str, "%Y-%m-%d").date()
         
-        # Get daily sales for the date range
-        daily_sales = db.session.query(SalesReport.sale_date,
-            db.func.sum(SalesReport.total_price).label('daily_total'),
-            db.func.count(SalesReport.sales_id).label('order_count'),
-            db.func.sum(SalesReport.quantity).label('product_count')).filter(
-            SalesReport.sale_date >= start_date,SalesReport.sale_date <= end_date).group_by(SalesReport.sale_date).order_by(SalesReport.sale_date).all()
+        # Get daily sales for the date range from the daily rollup
+        daily_sales = db.session.query(SalesDailyRollup.sale_date,
+            db.func.sum(SalesDailyRollup.revenue).label('daily_total'),
+            db.func.sum(SalesDailyRollup.order_count).label('order_count'),
+            db.func.sum(SalesDailyRollup.quantity).label('product_count')).filter(
+            SalesDailyRollup.sale_date >= start_date,SalesDailyRollup.sale_date <= end_date).group_by(SalesDailyRollup.sale_date).order_by(SalesDailyRollup.sale_date).all()
         
         sales_data = []
         for day in daily_sales:
             sales_data.append({"date": day.sale_date.strftime("%Y-%m-%d"),"total_sales": float(day.daily_total or 0),
-                "order_count": day.order_count,"product_count": day.product_count or 0})
+                "order_count": int(day.order_count),"product_count": int(day.product_count or 0)})
         
         response_data = {
             "success": True,
@@ -1018,7 +872,7 @@ def get_sales_by_date_range():
             "end_date": end_date_str
         }
         
-        set_cached_data(cache_key_str, response_data, 300)
+        set_cached_data(cache_key_str, response_data, 300, tags=("sales",))
         return jsonify(response_data), 200
         
     except Exception as e:
@@ -1039,43 +893,40 @@ def check_overdue_reservations():
         # Calculate the cutoff time
         cutoff_time = datetime.now() - timedelta(milliseconds=timeout_ms)
         
-        # Find approved reservations older than the cutoff time
-        overdue_reservations = Reservation.query.filter(Reservation.status == "approved",Reservation.reserved_at < cutoff_time).all()
+        # Claim approved reservations older than the cutoff time; rows another
+        # worker is already rejecting are skipped so stock is restored once
+        overdue_reservations = StockService.claim_reservations(Reservation.status == "approved",Reservation.reserved_at < cutoff_time)
         
         rejected_count = 0
         affected_users = set()
-        affected_products = set()
+        restore_quantities = {}
         
         # Reject each overdue reservation
         for reservation in overdue_reservations:
-            try:
-                # Get product to restore stock
-                product = IncubateeProduct.query.get(reservation.product_id)
-                if product:
-                    # Restore stock
-                    product.stock_amount = (product.stock_amount or 0) + reservation.quantity
-                    affected_products.add(reservation.product_id)
-                
-                # Update reservation status to rejected instead of deleting
-                reservation.status = "rejected"
-                reservation.rejected_at = datetime.now()
-                reservation.rejected_reason = "Not picked up on time"
-                
-                affected_users.add(reservation.user_id)
-                rejected_count += 1
-                current_app.logger.info(f"Auto-rejected reservation {reservation.reservation_id}, restored {reservation.quantity} units to product {product.product_id}")
-                
-            except Exception as e:
-                current_app.logger.error(f"Error processing reservation {reservation.reservation_id}: {e}")
-                continue
+            # Update reservation status to rejected instead of deleting
+            reservation.status = "rejected"
+            reservation.rejected_at = datetime.now()
+            reservation.rejected_reason = "Not picked up on time"
+            
+            restore_quantities[reservation.product_id] = restore_quantities.get(reservation.product_id, 0) + reservation.quantity
+            affected_users.add(reservation.user_id)
+            rejected_count += 1
+        
+        # Restore stock with one atomic increment per product
+        affected_products = set()
+        for product_id, quantity in restore_quantities.items():
+            if StockService.release(product_id, quantity) is not None:
+                affected_products.add(product_id)
+                current_app.logger.info(f"Auto-rejected overdue reservations, restored {quantity} units to product {product_id}")
         
         db.session.commit()
         
         # Invalidate caches for affected users and products
-        for user_id in affected_users:
-            invalidate_reservation_caches(user_id=user_id)
-        for product_id in affected_products:
-            invalidate_reservation_caches(product_id=product_id)
+        invalidate_tags(
+            "reservations:global", "products",
+            *[f"user:{user_id}" for user_id in affected_users],
+            *[f"product:{product_id}" for product_id in affected_products]
+        )
         
         return jsonify({"success": True,"rejected_count": rejected_count,"message": f"Auto-rejected {rejected_count} overdue reservations","cutoff_time": cutoff_time.strftime("%Y-%m-%d %H:%M:%S"),"timeout_minutes": timeout_ms / (60 * 1000)}), 200
         
@@ -1132,12 +983,13 @@ def test_processing():
         from flask import current_app
         
         with current_app.app_context():
-            success = process_reservation_queues()
+            results = process_reservation_queues()
             
-            if success:
+            if results is not None:
                 return jsonify({
                     "success": True, 
-                    "message": "✅ Manual processing completed successfully"
+                    "message": "✅ Manual processing completed successfully",
+                    "products": processing_summary(results)
                 })
             else:
                 return jsonify({"success": False, "message": "Processing failed"}), 500
@@ -1,13 +1,15 @@
 
-from flask import Blueprint, render_template, session, redirect, url_for, jsonify, request
+from flask import Blueprint, render_template, session, redirect, url_for, jsonify, request, current_app
 from app.models.shop import Shop
 from ..models.admin import IncubateeProduct
 from ..extension import db
-import json, redis, os
+from ..services.catalog_index import catalog_index
+from ..services.product_listing import ProductListing
+from ..services.product_reads import ProductReads
+from ..cache import cache_key, cached, get_cached_data, set_cached_data, invalidate_tags
 
 shop_bp = Blueprint("shop", __name__, url_prefix="/shop")
 
-redis_client = None
 def login_required(f):
     """Decorator to check if user is logged in"""
     def decorated_function(*args, **kwargs):
@@ -17,66 +19,6 @@ def login_required(f):
     decorated_function.__name__ = f.__name__
     return decorated_function
 
-def get_redis_client():
-    """Get redis client with lazy inizialization"""
-    global redis_client
-    if redis_client is None:
-        try:
-            redis_url = os.environ.get('redis_url')
-            if redis_url:
-                redis_client = redis.from_url(redis_url)
-            else:
-                # fallback to local redis 
-                redis_client = redis.Redis(host='localhost', port=6379, db=0,decode_response=True)
-        except Exception as e:
-            print(f"Redis connection failed: {str(e)}")
-            redis_client = None
-    return redis_client
-
-def cache_key(prefix, *args):
-    """Generate cache key with prefix and arguments"""
-    key_parts = [prefix] + [str(arg) for arg in args]
-    return ":".join(key_parts)
-
-def get_cached_data(key, expire_seconds=3600):
-    """Get data from cache, return (data, found) tuple"""
-    redis_client = get_redis_client()
-    if not redis_client:
-        return None, False
-    
-    try:
-        cached = redis_client.get(key)
-        if cached:
-            return json.loads(cached), True
-        return None, False
-    except Exception as e:
-        print(f"Cache get error for key {key}: {str(e)}")
-        return None, False
-
-def set_cached_data(key, data, expire_seconds=3600):
-    """Set data in cache with expiration"""
-    redis_client = get_redis_client()
-    if not redis_client:
-        return
-    
-    try:
-        redis_client.setex(key, expire_seconds, json.dumps(data, default=str))
-    except Exception as e:
-        print(f"Cache set error for key {key}: {str(e)}")
-
-def invalidate_cache(pattern):
-    """Invalidate cache keys matching pattern"""
-    redis_client = get_redis_client()
-    if not redis_client:
-        return
-    
-    try:
-        keys = redis_client.keys(pattern)
-        if keys:
-            redis_client.delete(*keys)
-    except Exception as e:
-        print(f"Cache invalidation error for pattern {pattern}: {str(e)}")
-
 def get_availability_status(stock_count):
     """Determine availability status based on stock count."""
     if stock_count == 0:
@@ -96,16 +38,44 @@ def shop_home():
 @shop_bp.route("/search-products", methods=["GET"])
 @login_required
 def search_products():
-    """Search or list all incubatee products."""
+    """
+    Search or list all incubatee products; pass ?page= (and ?per_page=) for one page of results.
+    Served from the in-memory catalog index (matches inside words too); queries it has no hits for, and
+    every query while it is unavailable, go to the database search.
+    """
     query = request.args.get("q", "").strip()
-    cache_key_str = cache_key("shop_search", query)
+    page = request.args.get("page", type=int)
+    per_page = request.args.get("per_page", current_app.config.get("SEARCH_PAGE_SIZE", 20), type=int)
+    if page is not None:
+        page = max(page, 1)
+        per_page = min(max(per_page, 1), current_app.config.get("SEARCH_MAX_PAGE_SIZE", 100))
+
+    # Typeahead path: answered from this worker's in-memory catalog index
+    if catalog_index.ready:
+        result, total = catalog_index.search(query, page, per_page)
+        if total or not query:
+            response_data = {"success": True, "products": catalog_index.with_live_stock(result)}
+            if page is not None:
+                response_data["pagination"] = {
+                    "total": total, "page": page, "per_page": per_page,
+                    "pages": (total + per_page - 1) // per_page
+                }
+            return jsonify(response_data)
+        # No word contains the query: the database search also tolerates typos
+
+    cache_key_str = cache_key("shop_search", query, page, per_page if page else None)
 
     # Try cache first (shorter cache for searches - 5 minutes)
     cached_data, found = get_cached_data(cache_key_str, expire_seconds=300)
     if found:
         return jsonify(cached_data)
     try:
-        products = Shop.search_products(query)
+        pagination = None
+        if page is not None:
+            pagination = Shop.search_products_page(query, page, per_page)
+            products = pagination.pop("products")
+        else:
+            products = Shop.search_products(query)
         result = []
         for p in products:
             result.append({
@@ -124,8 +94,10 @@ def search_products():
                 ),"warranty": p.warranty,"added_on": p.added_on.strftime("%Y-%m-%d"),"image_path": p.image_path})
 
         response_data = {"success": True, "products": result}
-        set_cached_data(cache_key_str, response_data, 300)  # Cache for 5 minutes
-        return jsonify({"success": True, "products": result})
+        if pagination:
+            response_data["pagination"] = pagination
+        set_cached_data(cache_key_str, response_data, 300, tags=("shop", "products"))  # Cache for 5 minutes
+        return jsonify(response_data)
 
     except Exception as e:
         print("❌ Error fetching products:", e)
@@ -134,26 +106,42 @@ def search_products():
 
 @shop_bp.route("/product-availability", methods=["GET"])
 def product_availability():
-    """Get product stock availability for all products."""
-    cache_key_str = "shop_availability:all"
-    
-    # Try cache first (15 minutes cache for availability data)
-    cached_data, found = get_cached_data(cache_key_str, expire_seconds=900)
-    if found:
-        return jsonify(cached_data)
+    """
+    Get product stock availability for all products, or one keyset page of them
+    with ?limit=&cursor= (plus category/incubatee_id/stock_status filters and ?fields=).
+    """
+    try:
+        listing = ProductListing.from_request(request.args, AVAILABILITY_FIELDS)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    if listing is None:
+        return product_availability_response()
+    try:
+        response_data = listing.page_data("availability", Shop.products_query(), availability_payload)
+        response_data.update(ProductListing.stock_counts())
+        return jsonify(response_data)
+    except Exception as e:
+        print("❌ Error fetching product availability:", e)
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def availability_payload(product):
+    return {
+        "product_id": product.product_id,
+        "name": product.name,
+        "category": product.category,
+        "current_stock": product.stock_amount,
+        "availability_status": get_availability_status(product.stock_amount),
+        "price_per_stocks": float(product.price_per_stocks),
+        "updated_at": product.added_on.strftime("%Y-%m-%d %H:%M:%S")}
+
+AVAILABILITY_FIELDS = ("name", "category", "current_stock", "availability_status", "price_per_stocks", "updated_at")
+
+@cached("shop_availability:all", 900, tags=("shop", "products"), stale_seconds=300)  # Cache for 15 minutes
+def product_availability_response():
+    """Stock availability for the whole catalog."""
     try:
         products = Shop.get_all_products()
-        availability_data = []
-        
-        for product in products:
-            availability_data.append({
-                "product_id": product.product_id,
-                "name": product.name,
-                "category": product.category,
-                "current_stock": product.stock_amount,
-                "availability_status": get_availability_status(product.stock_amount),
-                "price_per_stocks": float(product.price_per_stocks),
-                "updated_at": product.added_on.strftime("%Y-%m-%d %H:%M:%S")})
+        availability_data = [availability_payload(product) for product in products]
         
         response_data = {
                     "success": True, 
@@ -163,7 +151,6 @@ def product_availability():
                     "low_stock_count": len([p for p in availability_data if 1 <= p['current_stock'] <= 5]),
                     "out_of_stock_count": len([p for p in availability_data if p['current_stock'] == 0])}
                 
-        set_cached_data(cache_key_str, response_data, 900)  # Cache for 15 minutes
         return jsonify(response_data)
     
     except Exception as e:
@@ -185,7 +172,7 @@ def get_product_stock(product_id):
         
         if not product:
             response_data = {"success": False, "error": "Product not found"}
-            set_cached_data(cache_key_str, response_data, 300)  # Cache negative result for 5 minutes
+            set_cached_data(cache_key_str, response_data, 300, tags=("shop", f"product:{product_id}"))  # Cache negative result for 5 minutes
             return jsonify(response_data), 404
         stock_info = {
             "product_id": product.product_id,
@@ -196,15 +183,36 @@ def get_product_stock(product_id):
             "last_updated": product.added_on.strftime("%Y-%m-%d %H:%M:%S")}
         
         response_data = {"success": True, "product": stock_info}
-        set_cached_data(cache_key_str, response_data, 600)  # Cache for 10 minutes
+        set_cached_data(cache_key_str, response_data, 600, tags=("shop", f"product:{product_id}"))  # Cache for 10 minutes
         return jsonify(response_data)
     except Exception as e:
         print(f"❌ Error fetching stock for product {product_id}:", e)
         return jsonify({"success": False, "error": str(e)}), 500
 
+PRODUCT_FIELDS = ('name', 'products', 'stock_amount', 'price_per_stocks', 'pricing_unit', 'pricing_description',
+                  'details', 'category', 'expiration_date', 'warranty', 'image_path', 'added_on', 'incubatee')
+
+def product_page_response(scope, query):
+    """One keyset page (?limit=&cursor=&category=&incubatee_id=&stock_status=&fields=) or None for the full list"""
+    try:
+        listing = ProductListing.from_request(request.args, PRODUCT_FIELDS)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if listing is None:
+        return None
+    try:
+        return jsonify(listing.page_data(scope, query, ProductReads.shop_payload))
+    except Exception as e:
+        print(f"❌ Error in product listing: {e}")
+        return jsonify({'success': False, 'message': f'Error fetching products: {str(e)}'}), 500
+
 @shop_bp.route('/get-products')
 def get_products():
-    """Get all products with pricing details."""
+    """Get in-stock products with pricing details; pass ?limit= or ?cursor= for keyset pages."""
+    page = product_page_response("in_stock", ProductReads.shop_products(in_stock_only=True))
+    if page is not None:
+        return page
+
     cache_key_str = "shop_products:in_stock"
     
     # Try cache first (15 minutes cache for in-stock products)
@@ -212,32 +220,12 @@ def get_products():
     if found:
         return jsonify(cached_data)
     try:
-        # Use direct query to ensure consistency
-        products = db.session.query(IncubateeProduct).join(IncubateeProduct.incubatee).filter(IncubateeProduct.stock_amount > 0 ).all()
-        
-        products_data = []
-        for product in products:
-            product_data = {'product_id': product.product_id,
-                'name': product.name,'products': product.products,
-                'stock_amount': product.stock_amount,
-                'price_per_stocks': float(product.price_per_stocks),
-                'pricing_unit': product.pricing_unit.unit_name if product.pricing_unit else 'Item',
-                'pricing_description': product.pricing_unit.unit_description if product.pricing_unit else 'Per Item',
-                'details': product.details,'category': product.category,
-                'expiration_date': product.expiration_date.strftime('%Y-%m-%d') if product.expiration_date else None,
-                'warranty': product.warranty,'image_path': product.image_path,
-                'added_on': product.added_on.strftime('%Y-%m-%d'),
-                'incubatee': {
-                    'incubatee_id': product.incubatee.incubatee_id,
-                    'company_name': product.incubatee.company_name,
-                    'contact_info': product.incubatee.contact_info,
-                    'email': product.incubatee.email,
-                    'phone_number': product.incubatee.phone_number
-                } if product.incubatee else None}
-            products_data.append(product_data)
+        # Only the serialized columns, no ORM objects
+        products = ProductReads.shop_products(in_stock_only=True).all()
+        products_data = [ProductReads.shop_payload(product) for product in products]
         
         response_data = {'success': True,'products': products_data}
-        set_cached_data(cache_key_str, response_data, 900)  # Cache for 15 minutes
+        set_cached_data(cache_key_str, response_data, 900, tags=("shop", "products"))  # Cache for 15 minutes
         return jsonify(response_data)
     
     except Exception as e:
@@ -246,7 +234,11 @@ def get_products():
 
 @shop_bp.route('/get-all-products')
 def get_all_products():
-    """Get all products including out-of-stock items."""
+    """Get all products including out-of-stock items; pass ?limit= or ?cursor= for keyset pages."""
+    page = product_page_response("all", ProductReads.shop_products())
+    if page is not None:
+        return page
+
     cache_key_str = "shop_products:all"
     
     # Try cache first (30 minutes cache for all products)
@@ -254,31 +246,11 @@ def get_all_products():
     if found:
         return jsonify(cached_data)
     try:
-        products = db.session.query(IncubateeProduct).join(IncubateeProduct.incubatee).all()
-        
-        products_data = []
-        for product in products:
-            product_data = {
-                'product_id': product.product_id,'name': product.name,
-                'products': product.products,'stock_amount': product.stock_amount,
-                'price_per_stocks': float(product.price_per_stocks),
-                'pricing_unit': product.pricing_unit.unit_name if product.pricing_unit else 'Item',
-                'pricing_description': product.pricing_unit.unit_description if product.pricing_unit else 'Per Item',
-                'details': product.details,'category': product.category,
-                'expiration_date': product.expiration_date.strftime('%Y-%m-%d') if product.expiration_date else None,
-                'warranty': product.warranty,'image_path': product.image_path,
-                'added_on': product.added_on.strftime('%Y-%m-%d'),
-                'incubatee': {
-                    'incubatee_id': product.incubatee.incubatee_id,
-                    'company_name': product.incubatee.company_name,
-                    'contact_info': product.incubatee.contact_info,
-                    'email': product.incubatee.email,
-                    'phone_number': product.incubatee.phone_number
-                } if product.incubatee else None}
-            products_data.append(product_data)
+        products = ProductReads.shop_products().all()
+        products_data = [ProductReads.shop_payload(product) for product in products]
         
         response_data = {'success': True,'products': products_data}
-        set_cached_data(cache_key_str, response_data, 1800)  # Cache for 30 minutes
+        set_cached_data(cache_key_str, response_data, 1800, tags=("shop", "products"))  # Cache for 30 minutes
         return jsonify(response_data)
     
     except Exception as e:
@@ -312,7 +284,7 @@ def debug_pricing():
                 } if product.pricing_unit else None})
         
         response_data = {'success': True,'debug_data': debug_data}
-        set_cached_data(cache_key_str, response_data, 3600)  # Cache for 1 hour
+        set_cached_data(cache_key_str, response_data, 3600, tags=("shop",))  # Cache for 1 hour
         return jsonify(response_data)
     
     except Exception as e:
@@ -334,7 +306,7 @@ def debug_product(product_id):
         
         if not product:
             response_data = {'success': False,'message': f'Product {product_id} not found'}
-            set_cached_data(cache_key_str, response_data, 600)  # Cache negative result for 10 minutes
+            set_cached_data(cache_key_str, response_data, 600, tags=("shop", f"product:{product_id}"))  # Cache negative result for 10 minutes
             return jsonify(response_data), 404
         debug_info = {
             'product_id': product.product_id,'name': product.name,'stock_amount': product.stock_amount,
@@ -344,7 +316,7 @@ def debug_product(product_id):
             'table_name': IncubateeProduct.__tablename__}
         
         response_data = {'success': True,'debug_info': debug_info}
-        set_cached_data(cache_key_str, response_data, 1800)  # Cache for 30 minutes
+        set_cached_data(cache_key_str, response_data, 1800, tags=("shop", f"product:{product_id}"))  # Cache for 30 minutes
         return jsonify(response_data)
     
     except Exception as e:
@@ -353,13 +325,11 @@ def debug_product(product_id):
 # Cache invalidation functions for shop data
 def invalidate_shop_cache():
     """Invalidate all shop-related cache"""
-    invalidate_cache("shop:*")
+    invalidate_tags("shop")
 
 def invalidate_product_cache(product_id=None):
     """Invalidate product-specific cache"""
+    tags = ["products"]
     if product_id:
-        invalidate_cache(f"shop_product_stock:{product_id}")
-        invalidate_cache(f"shop_debug_product:{product_id}")
-    invalidate_cache("shop_products:*")
-    invalidate_cache("shop_availability:*")
-    invalidate_cache("shop_search:*")
\ No newline at end of file
+        tags.append(f"product:{product_id}")
+    invalidate_tags(*tags)
\ No newline at end of file
@@ -84,7 +84,8 @@ def get_email_stats():
     """Get email statistics"""
     try:
         hours = request.args.get('hours', default=24, type=int)
-        stats = EmailSender.get_email_stats(hours)
+        bucket = request.args.get('bucket')  # 'hour' for a chart series
+        stats = EmailSender.get_email_stats(hours, bucket)
         
         return jsonify({
             "success": True,
@@ -125,12 +126,20 @@ def get_scheduler_status():
     try:
         from ..utils.auto_stock_notifier import get_auto_notifier
         
+        from ..utils.stock_scheduler import stock_scheduler
+        
+        from ..utils.email_outbox import email_outbox
+        from ..utils.scheduler_metrics import scheduler_metrics
+        
         notifier = get_auto_notifier()
         status = notifier.get_status()
         
         return jsonify({
             "success": True,
-            "status": status
+            "status": status,
+            "stock_scheduler": stock_scheduler.get_status(),
+            "email_outbox": email_outbox.status(),
+            "thread_pools": scheduler_metrics()
         })
         
     except Exception as e:
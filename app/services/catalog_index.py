@@ -0,0 +1,349 @@
+# services/catalog_index.py
+import json
+import logging
+import heapq
+import re
+import threading
+import uuid
+from datetime import datetime
+from apscheduler.triggers.interval import IntervalTrigger
+from app.extension import db
+from app.models.admin import IncubateeProduct, Incubatee, PricingUnit
+
+logger = logging.getLogger(__name__)
+
+TERM_PATTERN = re.compile(r'\w+')
+
+
+class CatalogIndex:
+    """
+    In-process inverted index over the product catalog, so typeahead
+    searches never touch the database.
+
+    Every worker keeps, per product, the payload /shop/search-products
+    returns plus a map from every substring of up to GRAM_SIZE characters of
+    each word to the ids of the products having it. A short query word is
+    looked up directly; a longer one intersects the sets of its trigrams and
+    is then checked against the candidates' words, so "cake" finds "Cupcake"
+    and "Pancake Mix" just like the database's LIKE search. A query
+    intersects the sets of its words, so "cho ca" finds "Chocolate Cake".
+    Name matches rank first: whole words, then word starts (up to
+    CATALOG_INDEX_MAX_PREFIX characters), then inside words.
+
+    A query with no hits is left to the database search, which tolerates
+    typos. Stock changes with every reservation without touching the index,
+    so with_live_stock() reads it for the returned products.
+
+    The index is built at startup and patched when admin.py adds, updates
+    or deletes a product. The worker that made the change applies it and
+    publishes the product ids on `catalog_index:sync`; the other workers
+    reload those products from the database. A full rebuild every
+    CATALOG_INDEX_REFRESH_SECONDS picks up anything a worker missed while
+    Redis was down.
+    """
+
+    CHANNEL = "catalog_index:sync"
+    JOB_ID = "catalog_index_refresh"
+    GRAM_SIZE = 3
+
+    def __init__(self):
+        self.app = None
+        self.get_redis_client = None
+        self.max_prefix = 20
+        self.ready = False
+        self.built_at = None
+        self._origin = uuid.uuid4().hex  # Skip our own sync messages
+        self._lock = threading.RLock()
+        self._docs = {}      # product_id -> response payload
+        self._tokens = {}    # product_id -> (name tokens, name prefixes, all tokens)
+        self._grams = {}     # substring of up to GRAM_SIZE characters -> {product_id}
+        self._changed_during_rebuild = None  # Ids applied while a rebuild was loading
+        self._pubsub_thread = None
+
+    def init_app(self, app, scheduler, get_redis_client):
+        self.app = app
+        self.get_redis_client = get_redis_client
+        self.max_prefix = app.config.get('CATALOG_INDEX_MAX_PREFIX', 20)
+        if not app.config.get('CATALOG_INDEX_ENABLED', True):
+            return
+
+        with app.app_context():
+            self.rebuild()
+            self._start_listener()
+
+        if scheduler is not None:
+            scheduler.add_job(
+                id=self.JOB_ID,
+                func=self._refresh,
+                trigger=IntervalTrigger(seconds=app.config.get('CATALOG_INDEX_REFRESH_SECONDS', 300)),
+                max_instances=1,
+                coalesce=True,
+                replace_existing=True
+            )
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _load(product_ids=None):
+        """(payload, text fields) for the given products, or all, in one query"""
+        query = (
+            db.session.query(
+                IncubateeProduct.product_id, IncubateeProduct.incubatee_id, IncubateeProduct.name,
+                IncubateeProduct.products, IncubateeProduct.category, IncubateeProduct.details,
+                IncubateeProduct.price_per_stocks, IncubateeProduct.stock_amount,
+                IncubateeProduct.expiration_date, IncubateeProduct.warranty,
+                IncubateeProduct.added_on, IncubateeProduct.image_path, Incubatee.company_name
+            )
+            .join(PricingUnit, IncubateeProduct.pricing_unit_id == PricingUnit.unit_id)
+            .join(Incubatee, IncubateeProduct.incubatee_id == Incubatee.incubatee_id)
+        )
+        if product_ids is not None:
+            query = query.filter(IncubateeProduct.product_id.in_(product_ids))
+
+        for row in query.yield_per(1000):
+            payload = {
+                "incubatee_id": row.incubatee_id,
+                "product_id": row.product_id,
+                "name": row.name,
+                "products": row.products,
+                "category": row.category,
+                "details": row.details,
+                "price_per_stocks": float(row.price_per_stocks),
+                "stock_amount": row.stock_amount,
+                "expiration_date": row.expiration_date.strftime("%Y-%m-%d") if row.expiration_date else "No Expiry",
+                "warranty": row.warranty,
+                "added_on": row.added_on.strftime("%Y-%m-%d"),
+                "image_path": row.image_path
+            }
+            yield payload, (row.name, row.products, row.category, row.details, row.company_name)
+
+    def _tokenize(self, fields):
+        name_tokens = set(TERM_PATTERN.findall((fields[0] or '').lower()))
+        tokens = set(name_tokens)
+        for value in fields[1:]:
+            tokens.update(TERM_PATTERN.findall((value or '').lower()))
+        return frozenset(name_tokens), frozenset(self._prefixes_of(name_tokens)), frozenset(tokens)
+
+    def _prefixes_of(self, tokens):
+        return {token[:length] for token in tokens for length in range(1, min(len(token), self.max_prefix) + 1)}
+
+    def _grams_of(self, tokens):
+        return {
+            token[start:start + length]
+            for token in tokens
+            for length in range(1, self.GRAM_SIZE + 1)
+            for start in range(len(token) - length + 1)
+        }
+
+    def _add(self, docs, token_map, grams, payload, fields):
+        product_id = payload["product_id"]
+        entry = self._tokenize(fields)
+        docs[product_id] = payload
+        token_map[product_id] = entry
+        for gram in self._grams_of(entry[2]):
+            grams.setdefault(gram, set()).add(product_id)
+
+    def _remove(self, product_id):
+        self._docs.pop(product_id, None)
+        entry = self._tokens.pop(product_id, None)
+        if entry is None:
+            return
+        for gram in self._grams_of(entry[2]):
+            ids = self._grams.get(gram)
+            if ids is not None:
+                ids.discard(product_id)
+                if not ids:
+                    del self._grams[gram]
+
+    def rebuild(self):
+        """Rebuild the whole index from the database and swap it in"""
+        docs, token_map, grams = {}, {}, {}
+        with self._lock:
+            self._changed_during_rebuild = set()
+        try:
+            for payload, fields in self._load():
+                self._add(docs, token_map, grams, payload, fields)
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"⚠️ Catalog index not built, searches use the database: {str(e)}")
+            with self._lock:
+                self._changed_during_rebuild = None
+            return False
+
+        with self._lock:
+            self._docs, self._tokens, self._grams = docs, token_map, grams
+            self.ready = True
+            self.built_at = datetime.utcnow()
+            # The snapshot may predate changes applied while it was loading
+            changed, self._changed_during_rebuild = self._changed_during_rebuild, None
+        if changed:
+            self.apply(changed)
+        db.session.remove()
+        logger.info(f"🔎 Catalog index built: {len(docs)} products, {len(grams)} grams")
+        return True
+
+    def _refresh(self):
+        with self.app.app_context():
+            self.rebuild()
+
+    def apply(self, upsert=(), delete=()):
+        """Reload `upsert` products from the database and drop `delete` ones"""
+        if not self.ready:
+            return
+        upsert = set(upsert) - set(delete)
+        loaded = list(self._load(upsert)) if upsert else []
+        with self._lock:
+            if self._changed_during_rebuild is not None:
+                self._changed_during_rebuild.update(set(delete) | upsert)
+            for product_id in set(delete) | upsert:
+                self._remove(product_id)
+            for payload, fields in loaded:
+                self._add(self._docs, self._tokens, self._grams, payload, fields)
+
+    # ------------------------------------------------------------------
+    # Cross-worker sync
+    # ------------------------------------------------------------------
+
+    def sync(self, upsert=(), delete=()):
+        """Apply committed product changes here and tell the other workers"""
+        upsert, delete = [int(i) for i in upsert], [int(i) for i in delete]
+        try:
+            self.apply(upsert, delete)
+        except Exception as e:
+            logger.warning(f"⚠️ Catalog index update failed: {str(e)}")
+
+        client = self._redis()
+        if client is None:
+            return
+        try:
+            client.publish(self.CHANNEL, json.dumps({"origin": self._origin, "upsert": upsert, "delete": delete}))
+        except Exception as e:
+            logger.warning(f"Catalog index sync publish failed: {str(e)}")
+
+    def _redis(self):
+        if self.get_redis_client is None:
+            return None
+        try:
+            return self.get_redis_client()
+        except Exception:
+            return None
+
+    def _start_listener(self):
+        client = self._redis()
+        if client is None or self._pubsub_thread is not None:
+            return
+        try:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.CHANNEL: self._on_sync})
+            self._pubsub_thread = pubsub.run_in_thread(
+                sleep_time=1.0, daemon=True, exception_handler=self._on_listener_error
+            )
+        except Exception as e:
+            # Without the listener other workers' changes arrive with the next refresh
+            logger.warning(f"Catalog index listener not started: {str(e)}")
+            self._pubsub_thread = None
+
+    def _on_sync(self, message):
+        try:
+            change = json.loads(message["data"])
+        except (TypeError, ValueError):
+            return
+        if change.get("origin") == self._origin:
+            return
+        with self.app.app_context():
+            try:
+                self.apply(change.get("upsert", []), change.get("delete", []))
+            except Exception as e:
+                logger.warning(f"⚠️ Catalog index sync failed: {str(e)}")
+            finally:
+                db.session.remove()
+
+    def _on_listener_error(self, error, pubsub, thread):
+        logger.warning(f"Catalog index listener stopped: {str(error)}")
+        thread.stop()
+        self._pubsub_thread = None
+
+    # ------------------------------------------------------------------
+    # Searching
+    # ------------------------------------------------------------------
+
+    def search(self, keyword, page=None, per_page=20):
+        """
+        Payloads of the products having a word containing each word of
+        `keyword`; name matches first, then newest. Returns (payloads, total).
+        """
+        terms = TERM_PATTERN.findall((keyword or '').lower())
+        if keyword and not terms:
+            return [], 0
+        with self._lock:
+            if not terms:
+                matches = list(self._docs)
+                scores = {}
+            else:
+                matches = None
+                for term in sorted(set(terms), key=len, reverse=True):
+                    ids = self._term_ids(term)
+                    matches = set(ids) if matches is None else matches & ids
+                    if not matches:
+                        return [], 0
+                name_terms = [term[:self.max_prefix] for term in terms]
+                scores = {
+                    product_id: sum(
+                        3 if term in self._tokens[product_id][0]
+                        else 2 if prefix in self._tokens[product_id][1]
+                        else 1 if any(term in token for token in self._tokens[product_id][0])
+                        else 0
+                        for term, prefix in zip(terms, name_terms)
+                    )
+                    for product_id in matches
+                }
+            docs = self._docs
+
+            def rank(product_id):
+                return scores.get(product_id, 0), docs[product_id]["added_on"], product_id
+
+            if page:
+                # Only the requested page needs ordering
+                ordered = heapq.nlargest(page * per_page, matches, key=rank)[(page - 1) * per_page:]
+            else:
+                ordered = sorted(matches, key=rank, reverse=True)
+            return [docs[i] for i in ordered], len(matches)
+
+    def _term_ids(self, term):
+        """Ids of the products having a word that contains `term`"""
+        if len(term) <= self.GRAM_SIZE:
+            return self._grams.get(term, set())
+        candidates = None
+        for start in range(len(term) - self.GRAM_SIZE + 1):
+            ids = self._grams.get(term[start:start + self.GRAM_SIZE], set())
+            candidates = set(ids) if candidates is None else candidates & ids
+            if not candidates:
+                return set()
+        return {i for i in candidates if any(term in token for token in self._tokens[i][2])}
+
+    @staticmethod
+    def with_live_stock(payloads):
+        """Copies of `payloads` carrying current stock_amount, read in one primary key lookup"""
+        if not payloads:
+            return payloads
+        stock = dict(
+            db.session.query(IncubateeProduct.product_id, IncubateeProduct.stock_amount)
+            .filter(IncubateeProduct.product_id.in_([payload["product_id"] for payload in payloads]))
+            .all()
+        )
+        return [dict(payload, stock_amount=stock.get(payload["product_id"], payload["stock_amount"])) for payload in payloads]
+
+    def status(self):
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "products": len(self._docs),
+                "grams": len(self._grams),
+                "built_at": self.built_at.isoformat() if self.built_at else None,
+                "listening": self._pubsub_thread is not None
+            }
+
+
+catalog_index = CatalogIndex()
@@ -1,8 +1,12 @@
 # services/popularity_service.py
 from datetime import datetime, timedelta
-from sqlalchemy import func, and_, text
+from sqlalchemy import func, and_, text, case, update
+from sqlalchemy.exc import IntegrityError
+from apscheduler.triggers.cron import CronTrigger
 from app.extension import db
 from app.models.admin import ProductPopularity
+from app.services.popularity_window import PopularityWindow
+from app.utils.scheduler_lease import get_lease
 from decimal import Decimal  # ADD THIS IMPORT
 
 class ProductPopularityService:
@@ -24,6 +28,7 @@ class ProductPopularityService:
                 )
             ).all()
             
+            week_start, month_start = ProductPopularityService._period_starts()
             for product in products_without_popularity:
                 popularity = ProductPopularity(
                     product_id=product.product_id,
@@ -37,8 +42,8 @@ class ProductPopularityService:
                     weekly_customers=0,
                     monthly_customers=0,
                     total_customers=0,
-                    week_start_date=datetime.now().date(),
-                    month_start_date=datetime.now().replace(day=1).date(),
+                    week_start_date=week_start,
+                    month_start_date=month_start,
                     last_updated=datetime.utcnow()
                 )
                 db.session.add(popularity)
@@ -59,36 +64,110 @@ class ProductPopularityService:
             print(f"❌ Error initializing popularity on startup: {str(e)}")
 
     @staticmethod
-    def update_from_reservation(reservation):
-        """Update popularity stats when a reservation is completed - FIXED DECIMAL ISSUE"""
+    def _period_starts(today=None):
+        """First day of the rolling (weekly, monthly) windows"""
+        return PopularityWindow.starts(today)
+
+    @staticmethod
+    def update_from_reservation(reservation, sales_report=None):
+        """
+        Add a completed reservation's sale to its product's popularity counters and
+        refresh the rankings it can affect. Runs in the caller's transaction
+        (the caller commits).
+
+        The sale goes into its day bucket (services/popularity_window.py), then
+        one UPDATE adds it to the totals and re-reads the weekly/monthly values
+        from the rolling windows. Whether the buyer is a new customer comes from
+        one indexed lookup of their previous purchase, and only ranking rows
+        whose flags change are written.
+        """
         try:
-            from app.models.admin import ProductPopularity, IncubateeProduct, SalesReport
+            from app.models.admin import SalesReport
             
             if reservation.status != 'completed':
                 return False
             
             # Get the sales report
-            sales_report = SalesReport.query.filter_by(
-                reservation_id=reservation.reservation_id
-            ).first()
+            if sales_report is None:
+                sales_report = SalesReport.query.filter_by(
+                    reservation_id=reservation.reservation_id
+                ).first()
             
             if not sales_report:
                 print(f"⚠️ No sales report found for reservation {reservation.reservation_id}")
                 return False
             
-            product = IncubateeProduct.query.get(reservation.product_id)
-            if not product:
-                return False
+            week_start, month_start = ProductPopularityService._period_starts()
+            product_id = reservation.product_id
             
-            # Get or create popularity record
-            popularity = ProductPopularity.query.filter_by(
-                product_id=reservation.product_id
-            ).first()
+            # Savepoint: a failure here must not undo the caller's reservation update
+            with db.session.begin_nested():
+                if not ProductPopularityService._apply_sale(product_id, sales_report, week_start, month_start):
+                    return False
             
-            if not popularity:
-                popularity = ProductPopularity(
-                    product_id=reservation.product_id,
-                    incubatee_id=product.incubatee_id,
+            print(f"📈 Updated popularity for product {product_id}: "
+                f"+{sales_report.quantity} units, +₱{sales_report.total_price}")
+            return True
+            
+        except Exception as e:
+            print(f"❌ Error updating popularity from reservation: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+    @staticmethod
+    def _apply_sale(product_id, sales_report, week_start, month_start):
+        """Counter UPDATE and ranking refresh for one sale"""
+        from app.models.admin import ProductPopularity, SalesReport
+        
+        if not ProductPopularityService._ensure_popularity_row(product_id, week_start, month_start):
+            return False
+            
+        # Previous purchase of this product by the same customer
+        previous_sale = db.session.query(func.max(SalesReport.sale_date)).filter(
+            SalesReport.product_id == product_id,
+            SalesReport.user_id == sales_report.user_id,
+            SalesReport.sales_id != sales_report.sales_id
+        ).scalar()
+        
+        revenue = Decimal(str(sales_report.total_price)) if sales_report.total_price else Decimal('0.00')
+        new_customer = previous_sale is None
+        PopularityWindow.record_sale(sales_report)
+        
+        # Totals grow with the sale; weekly/monthly values are re-read from the windows
+        table = ProductPopularity.__table__
+        db.session.execute(
+            update(table)
+            .where(table.c.product_id == product_id)
+            .values(
+                total_sold=func.coalesce(table.c.total_sold, 0) + sales_report.quantity,
+                total_revenue=func.coalesce(table.c.total_revenue, 0) + revenue,
+                total_customers=func.coalesce(table.c.total_customers, 0) + int(new_customer),
+                last_updated=datetime.utcnow(),
+                **PopularityWindow.values_for(table.c.product_id, week_start, month_start)
+            )
+        )
+        
+        # Update rankings
+        ProductPopularityService._apply_rankings(week_start, month_start)
+        return True
+
+    @staticmethod
+    def _ensure_popularity_row(product_id, week_start, month_start):
+        """Create the product's popularity row on its first sale; False if the product is gone"""
+        from app.models.admin import ProductPopularity, IncubateeProduct
+        
+        if db.session.query(ProductPopularity.popularity_id).filter_by(product_id=product_id).first():
+            return True
+        incubatee_id = db.session.query(IncubateeProduct.incubatee_id).filter_by(product_id=product_id).scalar()
+        if incubatee_id is None:
+            return False
+        try:
+            # Savepoint: a concurrent first sale may create the row first
+            with db.session.begin_nested():
+                db.session.add(ProductPopularity(
+                    product_id=product_id,
+                    incubatee_id=incubatee_id,
                     weekly_sold=0,
                     monthly_sold=0,
                     total_sold=0,
@@ -98,54 +177,13 @@ class ProductPopularityService:
                     weekly_customers=0,
                     monthly_customers=0,
                     total_customers=0,
-                    week_start_date=datetime.now().date(),
-                    month_start_date=datetime.now().replace(day=1).date(),
+                    week_start_date=week_start,
+                    month_start_date=month_start,
                     last_updated=datetime.utcnow()
-                )
-                db.session.add(popularity)
-                db.session.commit()
-            
-            # Get current period dates
-            current_date = datetime.now().date()
-            current_week_start = current_date - timedelta(days=current_date.weekday())
-            current_month_start = current_date.replace(day=1)
-            
-            # Convert to Decimal to avoid type errors
-            total_price_decimal = Decimal(str(sales_report.total_price)) if sales_report.total_price else Decimal('0.00')
-            
-            # Update stats - FIXED: Using Decimal for revenue fields
-            if sales_report.sale_date >= current_week_start:
-                popularity.weekly_sold += sales_report.quantity
-                popularity.weekly_revenue += total_price_decimal
-            
-            if sales_report.sale_date >= current_month_start:
-                popularity.monthly_sold += sales_report.quantity
-                popularity.monthly_revenue += total_price_decimal
-            
-            popularity.total_sold += sales_report.quantity
-            popularity.total_revenue += total_price_decimal
-            
-            # Update customer counts
-            ProductPopularityService._update_customer_counts_simple(reservation.product_id)
-            
-            popularity.last_updated = datetime.utcnow()
-            
-            db.session.commit()
-            
-            print(f"📈 Updated popularity for product {reservation.product_id}: "
-                f"+{sales_report.quantity} units, +₱{sales_report.total_price}")
-            
-            # Update rankings
-            ProductPopularityService.update_product_rankings()
-            
-            return True
-            
-        except Exception as e:
-            db.session.rollback()
-            print(f"❌ Error updating popularity from reservation: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return False
+                ))
+        except IntegrityError:
+            pass
+        return True
 
     @staticmethod
     def update_product_popularity(reservation):
@@ -153,131 +191,127 @@ class ProductPopularityService:
         return ProductPopularityService.update_from_reservation(reservation)
 
     @staticmethod
-    def _update_customer_counts_simple(product_id):
-        """Update customer counts for a product - SIMPLE VERSION"""
-        from app.models.admin import SalesReport
+    def update_product_rankings():
+        """Roll every product's weekly/monthly windows forward, recompute the flags and commit"""
+        try:
+            print("🏆 Updating product rankings...")
+            week_start, month_start = ProductPopularityService._period_starts()
+            table = ProductPopularity.__table__
+            # Days that left the windows drop out of the weekly/monthly values
+            db.session.execute(
+                update(table).values(**PopularityWindow.values_for(table.c.product_id, week_start, month_start))
+            )
+            pruned_buckets, pruned_customers = PopularityWindow.prune()
+            changed = ProductPopularityService._apply_rankings(week_start, month_start)
+            db.session.commit()
+            print(f"✅ Rankings updated successfully! ({changed} rows changed, "
+                f"{pruned_buckets} old buckets and {pruned_customers} customer records pruned)")
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error updating rankings: {str(e)}")
+
+    @staticmethod
+    def init_app(app, scheduler):
+        """Roll the popularity windows over daily and add `flask backfill-popularity-windows`"""
         
-        current_date = datetime.now().date()
-        current_week_start = current_date - timedelta(days=current_date.weekday())
-        current_month_start = current_date.replace(day=1)
+        @app.cli.command('backfill-popularity-windows')
+        def backfill_popularity_windows():
+            """Rebuild the daily sales buckets from sales_reports (run once after deploying the tables)"""
+            buckets, customers = PopularityWindow.backfill()
+            db.session.commit()
+            ProductPopularityService.update_product_rankings()
+            print(f"✅ Backfilled {buckets} sales buckets and {customers} customer records")
         
-        # Get popularity record
-        popularity = ProductPopularity.query.filter_by(product_id=product_id).first()
-        if not popularity:
+        if scheduler is None:
             return
         
-        # Update customer counts with simple queries
-        weekly_customers = db.session.query(
-            func.count(db.distinct(SalesReport.user_id))
-        ).filter(
-            SalesReport.product_id == product_id,
-            SalesReport.sale_date >= current_week_start
-        ).scalar() or 0
-        
-        monthly_customers = db.session.query(
-            func.count(db.distinct(SalesReport.user_id))
-        ).filter(
-            SalesReport.product_id == product_id,
-            SalesReport.sale_date >= current_month_start
-        ).scalar() or 0
-        
-        total_customers = db.session.query(
-            func.count(db.distinct(SalesReport.user_id))
-        ).filter(
-            SalesReport.product_id == product_id
-        ).scalar() or 0
+        def rollover():
+            with app.app_context():
+                # One worker per day is enough; the others skip
+                if not rollover_lease.acquire():
+                    return
+                ProductPopularityService.update_product_rankings()
         
-        popularity.weekly_customers = weekly_customers
-        popularity.monthly_customers = monthly_customers
-        popularity.total_customers = total_customers
+        rollover_lease = get_lease("popularity_rollover", 3600)
+        scheduler.add_job(
+            id='popularity_rollover',
+            func=rollover,
+            trigger=CronTrigger(hour=0, minute=5, timezone='UTC'),
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
 
-    # services/popularity_service.py - Update the update_product_rankings method
     @staticmethod
-    def update_product_rankings():
-        """Update product rankings - SIMPLIFIED VERSION"""
-        try:
-            from app.models.admin import ProductPopularity
-            
-            print("🏆 Updating product rankings...")
-            
-            # Get current period dates
-            current_date = datetime.now().date()
-            current_week_start = current_date - timedelta(days=current_date.weekday())
-            current_month_start = current_date.replace(day=1)
-            
-            # Reset all flags first
-            db.session.query(ProductPopularity).update({
-                'is_best_seller': False,
-                'is_known_product': False,
-                'weekly_rank': 0,
-                'monthly_rank': 0
-            })
-            db.session.commit()
-            
-            print("📊 Finding best sellers and known products...")
-            
-            # 1. BEST SELLERS: Top products by WEEKLY sales (current week only)
-            # Get products with sales in the current week
-            weekly_best_sellers = ProductPopularity.query.filter(
-                ProductPopularity.weekly_sold > 0,
-                ProductPopularity.week_start_date >= current_week_start
-            ).order_by(
-                ProductPopularity.weekly_sold.desc(),
-                ProductPopularity.weekly_revenue.desc()
-            ).limit(8).all()  # Get up to 8 for carousel
-            
-            print(f"🔥 Found {len(weekly_best_sellers)} weekly best sellers")
-            for rank, product in enumerate(weekly_best_sellers, 1):
-                product.is_best_seller = True
-                product.weekly_rank = rank
-                print(f"   - Weekly Best Seller #{rank}: Product {product.product_id} ({product.weekly_sold} sold this week)")
-            
-            # 2. KNOWN PRODUCTS: Top products by MONTHLY customers (current month only)
-            # If we don't have enough weekly best sellers, fill with monthly performers
-            if len(weekly_best_sellers) < 5:
-                print("📅 Not enough weekly best sellers, adding monthly performers...")
-                
-                # Get products with sales in the current month (but not already marked as best sellers)
-                monthly_performers = ProductPopularity.query.filter(
-                    ProductPopularity.monthly_sold > 0,
-                    ProductPopularity.month_start_date >= current_month_start,
-                    ProductPopularity.is_best_seller == False
-                ).order_by(
-                    ProductPopularity.monthly_sold.desc(),
-                    ProductPopularity.monthly_revenue.desc()
-                ).limit(5 - len(weekly_best_sellers)).all()
-                
-                for product in monthly_performers:
-                    product.is_best_seller = True
-                    product.weekly_rank = 999  # Special rank for monthly fillers
-                    print(f"   - Monthly Filler: Product {product.product_id} ({product.monthly_sold} sold this month)")
-            
-            # 3. KNOWN PRODUCTS: Based on MONTHLY customer reach
-            # Get products with customers in the current month
-            known_products = ProductPopularity.query.filter(
-                ProductPopularity.monthly_customers > 0,
-                ProductPopularity.month_start_date >= current_month_start
+    def _apply_rankings(week_start, month_start):
+        """
+        Set the best seller / known product flags from three top-N queries and
+        write only the rows whose flags change. Returns the number of rows changed.
+
+        - Best sellers: top 8 by weekly sales (rolling week), ranked 1..8
+        - Fewer than 5 weekly best sellers: top monthly sellers fill up to 5 with rank 999
+        - Known products: top 10 by monthly customers (rolling month)
+        """
+        from app.models.admin import ProductPopularity
+        
+        # 1. BEST SELLERS: Top products by WEEKLY sales (rolling week only)
+        weekly_best_sellers = ProductPopularity.query.filter(
+            ProductPopularity.weekly_sold > 0,
+            ProductPopularity.week_start_date >= week_start
+        ).order_by(
+            ProductPopularity.weekly_sold.desc(),
+            ProductPopularity.weekly_revenue.desc()
+        ).limit(8).all()  # Get up to 8 for carousel
+        
+        wanted = {}  # product popularity row -> (is_best_seller, weekly_rank, is_known_product)
+        for rank, popularity in enumerate(weekly_best_sellers, 1):
+            wanted[popularity] = [True, rank, False]
+        
+        # 2. If we don't have enough weekly best sellers, fill with monthly performers
+        if len(weekly_best_sellers) < 5:
+            monthly_performers = ProductPopularity.query.filter(
+                ProductPopularity.monthly_sold > 0,
+                ProductPopularity.month_start_date >= month_start,
+                ~ProductPopularity.product_id.in_([p.product_id for p in weekly_best_sellers] or [-1])
             ).order_by(
-                ProductPopularity.monthly_customers.desc(),
-                ProductPopularity.monthly_sold.desc()
-            ).limit(10).all()
-            
-            print(f"👥 Found {len(known_products)} known products")
-            for product in known_products:
-                product.is_known_product = True
-                print(f"   - Known Product: Product {product.product_id} ({product.monthly_customers} customers this month)")
-            
-            db.session.commit()
-            print("✅ Rankings updated successfully!")
+                ProductPopularity.monthly_sold.desc(),
+                ProductPopularity.monthly_revenue.desc()
+            ).limit(5 - len(weekly_best_sellers)).all()
             
-            # Debug info
-            best_count = ProductPopularity.query.filter_by(is_best_seller=True).count()
-            known_count = ProductPopularity.query.filter_by(is_known_product=True).count()
-            print(f"📈 Final counts - Best Sellers: {best_count}, Known Products: {known_count}")
-            
-        except Exception as e:
-            db.session.rollback()
-            print(f"❌ Error updating rankings: {str(e)}")
+            for popularity in monthly_performers:
+                wanted[popularity] = [True, 999, False]  # Special rank for monthly fillers
+        
+        # 3. KNOWN PRODUCTS: Based on MONTHLY customer reach
+        known_products = ProductPopularity.query.filter(
+            ProductPopularity.monthly_customers > 0,
+            ProductPopularity.month_start_date >= month_start
+        ).order_by(
+            ProductPopularity.monthly_customers.desc(),
+            ProductPopularity.monthly_sold.desc()
+        ).limit(10).all()
+        
+        for popularity in known_products:
+            wanted.setdefault(popularity, [False, 0, False])[2] = True
+        
+        # Rows flagged now but no longer ranked go back to the defaults
+        flagged = ProductPopularity.query.filter(
+            (ProductPopularity.is_best_seller == True) |
+            (ProductPopularity.is_known_product == True) |
+            (ProductPopularity.weekly_rank != 0)
+        ).all()
+        for popularity in flagged:
+            wanted.setdefault(popularity, [False, 0, False])
+        
+        changed = 0
+        for popularity, (is_best_seller, weekly_rank, is_known_product) in wanted.items():
+            if (bool(popularity.is_best_seller), popularity.weekly_rank or 0, bool(popularity.is_known_product)) != \
+                    (is_best_seller, weekly_rank, is_known_product):
+                popularity.is_best_seller = is_best_seller
+                popularity.weekly_rank = weekly_rank
+                popularity.is_known_product = is_known_product
+                changed += 1
+        return changed
         
     @staticmethod
     def force_update_flags():
@@ -0,0 +1,170 @@
+# services/popularity_window.py
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import case, delete, func, select
+from app.extension import db
+from app.models.admin import ProductSalesBucket, ProductCustomerActivity, SalesReport
+
+
+class PopularityWindow:
+    """
+    Rolling 7-day / 30-day sales windows over per-product daily buckets.
+
+    Every completed sale adds to its product's bucket for the sale day
+    (product_sales_buckets) and moves the customer's last purchase date of
+    that product forward (product_customer_activity). A window total is then
+    a range read of at most POPULARITY_MONTH_DAYS buckets on the primary key,
+    and the distinct customers of a window are the customers whose last
+    purchase falls inside it - exact, with nothing to reset: a day leaves the
+    window when `today` moves past it. Buckets older than
+    POPULARITY_BUCKET_RETENTION_DAYS are pruned by the daily rollover.
+    """
+
+    @staticmethod
+    def today():
+        # Sales reports are dated in UTC (routes/reservation.py)
+        return datetime.now(timezone.utc).date()
+
+    @staticmethod
+    def starts(today=None):
+        """First day of the (weekly, monthly) windows ending `today`"""
+        today = today or PopularityWindow.today()
+        week_days = current_app.config.get('POPULARITY_WEEK_DAYS', 7)
+        month_days = current_app.config.get('POPULARITY_MONTH_DAYS', 30)
+        return today - timedelta(days=week_days - 1), today - timedelta(days=month_days - 1)
+
+    @staticmethod
+    def record_sale(sales_report):
+        """Add one sale to its day bucket and to the customer's activity, in the caller's transaction"""
+        revenue = Decimal(str(sales_report.total_price)) if sales_report.total_price else Decimal('0.00')
+        bucket = {
+            'product_id': sales_report.product_id,
+            'bucket_date': sales_report.sale_date,
+            'quantity': sales_report.quantity,
+            'revenue': revenue,
+            'orders': 1
+        }
+        activity = {
+            'product_id': sales_report.product_id,
+            'user_id': sales_report.user_id,
+            'last_purchase_date': sales_report.sale_date
+        }
+
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        elif dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        else:
+            row = db.session.get(ProductSalesBucket, (bucket['product_id'], bucket['bucket_date']))
+            if row:
+                row.quantity += bucket['quantity']
+                row.revenue += bucket['revenue']
+                row.orders += 1
+            else:
+                db.session.add(ProductSalesBucket(**bucket))
+            row = db.session.get(ProductCustomerActivity, (activity['product_id'], activity['user_id']))
+            if row:
+                row.last_purchase_date = max(row.last_purchase_date, activity['last_purchase_date'])
+            else:
+                db.session.add(ProductCustomerActivity(**activity))
+            db.session.flush()
+            return
+
+        statement = upsert(ProductSalesBucket).values(bucket)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=['product_id', 'bucket_date'],
+            set_={
+                'quantity': ProductSalesBucket.quantity + statement.excluded.quantity,
+                'revenue': ProductSalesBucket.revenue + statement.excluded.revenue,
+                'orders': ProductSalesBucket.orders + statement.excluded.orders
+            }
+        ))
+        statement = upsert(ProductCustomerActivity).values(activity)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=['product_id', 'user_id'],
+            set_={'last_purchase_date': case(
+                (statement.excluded.last_purchase_date > ProductCustomerActivity.last_purchase_date,
+                 statement.excluded.last_purchase_date),
+                else_=ProductCustomerActivity.last_purchase_date
+            )}
+        ))
+
+    @staticmethod
+    def values_for(product_id_column, week_start, month_start):
+        """
+        UPDATE values setting a product_popularity row's weekly/monthly columns
+        from its windows (correlated subqueries on `product_id_column`)
+        """
+        def bucket_sum(column, since):
+            return select(func.coalesce(func.sum(column), 0)).where(
+                ProductSalesBucket.product_id == product_id_column,
+                ProductSalesBucket.bucket_date >= since
+            ).scalar_subquery()
+
+        def customers(since):
+            return select(func.count()).select_from(ProductCustomerActivity).where(
+                ProductCustomerActivity.product_id == product_id_column,
+                ProductCustomerActivity.last_purchase_date >= since
+            ).scalar_subquery()
+
+        return {
+            'weekly_sold': bucket_sum(ProductSalesBucket.quantity, week_start),
+            'weekly_revenue': bucket_sum(ProductSalesBucket.revenue, week_start),
+            'weekly_customers': customers(week_start),
+            'monthly_sold': bucket_sum(ProductSalesBucket.quantity, month_start),
+            'monthly_revenue': bucket_sum(ProductSalesBucket.revenue, month_start),
+            'monthly_customers': customers(month_start),
+            'week_start_date': week_start,
+            'month_start_date': month_start
+        }
+
+    @staticmethod
+    def _retention_days():
+        return max(
+            current_app.config.get('POPULARITY_BUCKET_RETENTION_DAYS', 90),
+            current_app.config.get('POPULARITY_MONTH_DAYS', 30)
+        )
+
+    @staticmethod
+    def prune(today=None):
+        """Drop buckets past the retention period and activity older than the monthly window"""
+        today = today or PopularityWindow.today()
+        _, month_start = PopularityWindow.starts(today)
+        retention_days = PopularityWindow._retention_days()
+        buckets = db.session.execute(delete(ProductSalesBucket).where(
+            ProductSalesBucket.bucket_date < today - timedelta(days=retention_days - 1)
+        )).rowcount
+        activity = db.session.execute(delete(ProductCustomerActivity).where(
+            ProductCustomerActivity.last_purchase_date < month_start
+        )).rowcount
+        return buckets, activity
+
+    @staticmethod
+    def backfill(today=None):
+        """Rebuild buckets and customer activity from sales_reports for the retention period"""
+        today = today or PopularityWindow.today()
+        _, month_start = PopularityWindow.starts(today)
+        retention_days = PopularityWindow._retention_days()
+        since = today - timedelta(days=retention_days - 1)
+
+        db.session.execute(delete(ProductSalesBucket))
+        db.session.execute(delete(ProductCustomerActivity))
+        db.session.execute(ProductSalesBucket.__table__.insert().from_select(
+            ['product_id', 'bucket_date', 'quantity', 'revenue', 'orders'],
+            select(
+                SalesReport.product_id, SalesReport.sale_date,
+                func.sum(SalesReport.quantity), func.coalesce(func.sum(SalesReport.total_price), 0), func.count()
+            ).where(SalesReport.sale_date >= since).group_by(SalesReport.product_id, SalesReport.sale_date)
+        ))
+        db.session.execute(ProductCustomerActivity.__table__.insert().from_select(
+            ['product_id', 'user_id', 'last_purchase_date'],
+            select(SalesReport.product_id, SalesReport.user_id, func.max(SalesReport.sale_date))
+            .where(SalesReport.sale_date >= month_start)
+            .group_by(SalesReport.product_id, SalesReport.user_id)
+        ))
+        return (
+            db.session.query(func.count()).select_from(ProductSalesBucket).scalar(),
+            db.session.query(func.count()).select_from(ProductCustomerActivity).scalar()
+        )
@@ -0,0 +1,170 @@
+# services/product_listing.py
+import base64
+import json
+from datetime import date
+from sqlalchemy import and_, case, func, or_
+from app.extension import db
+from app.models.admin import IncubateeProduct
+from app.cache import cache_key, get_or_set
+
+# Stock status thresholds, matching get_availability_status in routes/shop.py
+STOCK_STATUS_FILTERS = {
+    "out_of_stock": lambda stock: stock == 0,
+    "low_stock": lambda stock: stock.between(1, 5),
+    "in_stock": lambda stock: stock.between(6, 20),
+    "high_stock": lambda stock: stock > 20,
+    "available": lambda stock: stock > 0,
+}
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+COUNT_CACHE_SECONDS = 300
+
+
+class ProductListing:
+    """
+    Keyset pagination over incubatee_products, newest first.
+
+    Pages are ordered by (added_on, product_id) descending and the cursor is
+    the key of the last row served, so page N costs the same as page 1 (an
+    index range scan, no OFFSET). Totals come from a cached count per filter
+    combination, invalidated with the "products" tag.
+    """
+
+    def __init__(self, limit, cursor=None, category=None, incubatee_id=None, stock_status=None, fields=None):
+        self.limit = limit
+        self.cursor = cursor
+        self.category = category
+        self.incubatee_id = incubatee_id
+        self.stock_status = stock_status
+        self.fields = fields
+
+    @classmethod
+    def from_request(cls, args, allowed_fields=()):
+        """
+        Build a listing from ?limit=&cursor=&category=&incubatee_id=&stock_status=&fields=,
+        or return None when the request asks for none of them (the full list).
+        Raises ValueError for invalid parameters.
+        """
+        names = ("limit", "cursor", "category", "incubatee_id", "stock_status", "fields")
+        if not any(name in args for name in names):
+            return None
+
+        limit = args.get("limit", DEFAULT_PAGE_SIZE, type=int)
+        if limit is None or limit < 1:
+            raise ValueError("limit must be a positive integer")
+        incubatee_id = args.get("incubatee_id", type=int)
+        if "incubatee_id" in args and incubatee_id is None:
+            raise ValueError("incubatee_id must be an integer")
+        stock_status = args.get("stock_status") or None
+        if stock_status and stock_status not in STOCK_STATUS_FILTERS:
+            raise ValueError(f"stock_status must be one of: {', '.join(STOCK_STATUS_FILTERS)}")
+
+        fields = None
+        if args.get("fields"):
+            fields = [name.strip() for name in args["fields"].split(",") if name.strip()]
+            unknown = [name for name in fields if name not in allowed_fields]
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+        return cls(
+            limit=min(limit, MAX_PAGE_SIZE),
+            cursor=cls.decode_cursor(args["cursor"]) if args.get("cursor") else None,
+            category=args.get("category") or None,
+            incubatee_id=incubatee_id,
+            stock_status=stock_status,
+            fields=fields
+        )
+
+    @staticmethod
+    def encode_cursor(product):
+        key = [product.added_on.isoformat(), product.product_id]
+        return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            added_on, product_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            return date.fromisoformat(added_on), int(product_id)
+        except (ValueError, TypeError):
+            raise ValueError("Invalid cursor")
+
+    def filter(self, query):
+        """Apply the category/incubatee/stock status filters"""
+        if self.category:
+            query = query.filter(IncubateeProduct.category == self.category)
+        if self.incubatee_id is not None:
+            query = query.filter(IncubateeProduct.incubatee_id == self.incubatee_id)
+        if self.stock_status:
+            query = query.filter(STOCK_STATUS_FILTERS[self.stock_status](IncubateeProduct.stock_amount))
+        return query
+
+    def page(self, query):
+        """One page of `query` (filters applied) and the cursor of the next page, or None"""
+        query = self.filter(query)
+        if self.cursor:
+            added_on, product_id = self.cursor
+            query = query.filter(or_(
+                IncubateeProduct.added_on < added_on,
+                and_(IncubateeProduct.added_on == added_on, IncubateeProduct.product_id < product_id)
+            ))
+        products = (
+            query.order_by(IncubateeProduct.added_on.desc(), IncubateeProduct.product_id.desc())
+            .limit(self.limit + 1)
+            .all()
+        )
+        has_more = len(products) > self.limit
+        products = products[:self.limit]
+        return products, self.encode_cursor(products[-1]) if has_more else None
+
+    def total(self, scope, query):
+        """Cached count of `query` with the filters applied; `scope` names the base query"""
+        key = cache_key("product_count", scope, self.category, self.incubatee_id, self.stock_status)
+        return get_or_set(
+            key,
+            lambda: self.filter(query).enable_eagerloads(False).order_by(None).count(),
+            COUNT_CACHE_SECONDS,
+            tags=("products",)
+        )
+
+    def pagination(self, scope, query, next_cursor):
+        return {
+            "limit": self.limit,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None,
+            "total": self.total(scope, query)
+        }
+
+    def page_data(self, scope, query, serialize):
+        """Response body for one page: serialized (sparse) products and the pagination block"""
+        products, next_cursor = self.page(query)
+        return {
+            "success": True,
+            "products": [self.select_fields(serialize(product)) for product in products],
+            "pagination": self.pagination(scope, query, next_cursor)
+        }
+
+    def select_fields(self, payload):
+        """Sparse fieldset: keep the requested fields (product_id is always kept)"""
+        if not self.fields:
+            return payload
+        return {name: payload[name] for name in ["product_id", *self.fields] if name in payload}
+
+    @staticmethod
+    def stock_counts():
+        """Catalog totals per stock status in one query, cached like the page totals"""
+        def build():
+            stock = IncubateeProduct.stock_amount
+            row = db.session.query(
+                func.count(IncubateeProduct.product_id),
+                func.sum(case((stock > 0, 1), else_=0)),
+                func.sum(case((stock.between(1, 5), 1), else_=0)),
+                func.sum(case((stock == 0, 1), else_=0))
+            ).one()
+            return {
+                "total_products": row[0],
+                "in_stock_count": int(row[1] or 0),
+                "low_stock_count": int(row[2] or 0),
+                "out_of_stock_count": int(row[3] or 0)
+            }
+        return get_or_set(cache_key("product_count", "stock_status"), build, COUNT_CACHE_SECONDS, tags=("products",))
@@ -0,0 +1,214 @@
+# services/product_reads.py
+from datetime import date, datetime
+from decimal import Decimal
+from typing import NamedTuple, Optional
+from app.extension import db
+from app.models.admin import IncubateeProduct, Incubatee, PricingUnit
+from app.models.cart import Cart
+from app.models.favorites import Favorite
+
+
+def project(dto, columns):
+    """
+    Query selecting, for each field of the NamedTuple `dto`, the column of the
+    same name in `columns`. Rows are SQLAlchemy Row tuples whose attributes
+    are exactly the dto's fields; dto._make(row) gives the typed tuple.
+    """
+    return db.session.query(*(columns[name].label(name) for name in dto._fields))
+
+
+class ShopProduct(NamedTuple):
+    product_id: int
+    name: str
+    products: str
+    stock_amount: int
+    price_per_stocks: Decimal
+    pricing_unit: Optional[str]
+    pricing_description: Optional[str]
+    details: str
+    category: Optional[str]
+    expiration_date: Optional[date]
+    warranty: Optional[str]
+    image_path: Optional[str]
+    added_on: date
+    incubatee_id: int
+    company_name: Optional[str]
+    contact_info: Optional[str]
+    email: Optional[str]
+    phone_number: Optional[str]
+
+
+class AdminProduct(NamedTuple):
+    product_id: int
+    incubatee_id: int
+    name: str
+    stock_no: str
+    products: str
+    stock_amount: int
+    price_per_stocks: Decimal
+    new_price_per_stocks: Optional[Decimal]
+    pricing_unit: Optional[str]
+    pricing_unit_id: int
+    details: str
+    category: Optional[str]
+    expiration_date: Optional[date]
+    warranty: Optional[str]
+    added_on: date
+    image_path: Optional[str]
+    first_name: Optional[str]
+    last_name: Optional[str]
+
+
+class FavoriteItem(NamedTuple):
+    favorite_id: int
+    product_id: int
+    name: str
+    image_path: Optional[str]
+    price_per_stocks: Decimal
+    category: Optional[str]
+    details: str
+    added_at: Optional[datetime]
+
+
+class CartItem(NamedTuple):
+    cart_id: int
+    product_id: int
+    name: str
+    image_path: Optional[str]
+    price_per_stocks: Decimal
+    new_price_per_stocks: Optional[Decimal]
+    stock_amount: int
+    quantity: int
+    added_at: datetime
+
+
+_PRODUCT = {column.key: column for column in IncubateeProduct.__table__.columns}
+
+
+class ProductReads:
+    """
+    Read models for the listing endpoints.
+
+    Each query selects only the columns its endpoint serializes, joined in
+    SQL, as plain row tuples shaped like the NamedTuples above, so listing N
+    products no longer builds N IncubateeProduct objects plus their
+    Incubatee/PricingUnit objects in the identity map. The queries keep
+    IncubateeProduct filterable and sortable, so ProductListing can page them.
+    """
+
+    @staticmethod
+    def shop_products(in_stock_only=False):
+        query = (
+            project(ShopProduct, {
+                **_PRODUCT,
+                "pricing_unit": PricingUnit.unit_name,
+                "pricing_description": PricingUnit.unit_description,
+                "incubatee_id": Incubatee.incubatee_id,
+                "company_name": Incubatee.company_name,
+                "contact_info": Incubatee.contact_info,
+                "email": Incubatee.email,
+                "phone_number": Incubatee.phone_number,
+            })
+            .select_from(IncubateeProduct)
+            .join(Incubatee, IncubateeProduct.incubatee_id == Incubatee.incubatee_id)
+            .outerjoin(PricingUnit, IncubateeProduct.pricing_unit_id == PricingUnit.unit_id)
+        )
+        if in_stock_only:
+            query = query.filter(IncubateeProduct.stock_amount > 0)
+        return query
+
+    @staticmethod
+    def admin_products():
+        return (
+            project(AdminProduct, {
+                **_PRODUCT,
+                "pricing_unit": PricingUnit.unit_name,
+                "first_name": Incubatee.first_name,
+                "last_name": Incubatee.last_name,
+            })
+            .select_from(IncubateeProduct)
+            .outerjoin(Incubatee, IncubateeProduct.incubatee_id == Incubatee.incubatee_id)
+            .outerjoin(PricingUnit, IncubateeProduct.pricing_unit_id == PricingUnit.unit_id)
+        )
+
+    @staticmethod
+    def favorites(user_id):
+        return (
+            project(FavoriteItem, {
+                **_PRODUCT,
+                "favorite_id": Favorite.favorite_id,
+                "added_at": Favorite.added_at,
+            })
+            .select_from(Favorite)
+            .join(IncubateeProduct, Favorite.product_id == IncubateeProduct.product_id)
+            .filter(Favorite.user_id == user_id)
+            .all()
+        )
+
+    @staticmethod
+    def cart_items(user_id):
+        return (
+            project(CartItem, {
+                **_PRODUCT,
+                "cart_id": Cart.cart_id,
+                "quantity": Cart.quantity,
+                "added_at": Cart.added_at,
+            })
+            .select_from(Cart)
+            .join(IncubateeProduct, Cart.product_id == IncubateeProduct.product_id)
+            .filter(Cart.user_id == user_id)
+            .all()
+        )
+
+    # ------------------------------------------------------------------
+    # Response payloads (date.isoformat() is the "%Y-%m-%d" of the old
+    # payloads without strftime's cost)
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def shop_payload(product: ShopProduct):
+        return {
+            'product_id': product.product_id,
+            'name': product.name, 'products': product.products,
+            'stock_amount': product.stock_amount,
+            'price_per_stocks': float(product.price_per_stocks),
+            'pricing_unit': product.pricing_unit or 'Item',
+            'pricing_description': product.pricing_description or 'Per Item',
+            'details': product.details, 'category': product.category,
+            'expiration_date': product.expiration_date.isoformat() if product.expiration_date else None,
+            'warranty': product.warranty, 'image_path': product.image_path,
+            'added_on': product.added_on.isoformat(),
+            'incubatee': {
+                'incubatee_id': product.incubatee_id,
+                'company_name': product.company_name,
+                'contact_info': product.contact_info,
+                'email': product.email,
+                'phone_number': product.phone_number
+            }
+        }
+
+    @staticmethod
+    def admin_payload(product: AdminProduct):
+        # Use new_price_per_stocks if available, otherwise use price_per_stocks
+        display_price = float(product.new_price_per_stocks) if product.new_price_per_stocks else float(product.price_per_stocks)
+        return {
+            "product_id": product.product_id,
+            "incubatee_id": product.incubatee_id,
+            "name": product.name,
+            "stock_no": product.stock_no,
+            "products": product.products,
+            "stock_amount": product.stock_amount,
+            "price_per_stocks": float(product.price_per_stocks),  # Original price
+            "new_price_per_stocks": float(product.new_price_per_stocks) if product.new_price_per_stocks else None,  # New price
+            "display_price": display_price,  # Price to display (uses new price if available)
+            "pricing_unit": product.pricing_unit or "N/A",
+            "pricing_unit_id": product.pricing_unit_id,
+            "details": product.details,
+            "category": product.category,
+            "expiration_date": product.expiration_date.isoformat() if product.expiration_date else "N/A",
+            "warranty": product.warranty,
+            "added_on": product.added_on.isoformat() if product.added_on else "N/A",
+            "image_path": product.image_path,
+            "image_paths": product.image_path.split(',') if product.image_path else [],
+            "incubatee_name": f"{product.first_name} {product.last_name}" if product.first_name is not None else "Unknown"
+        }
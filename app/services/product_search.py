@@ -0,0 +1,221 @@
+# services/product_search.py
+import logging
+import re
+from datetime import datetime
+import click
+from flask import current_app
+from sqlalchemy import and_, case, cast, delete, event, func, inspect, literal, literal_column, null, or_, select, text, true
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.extension import db
+from app.models.admin import IncubateeProduct, Incubatee, PricingUnit
+from app.models.product_search import ProductSearchDocument
+
+logger = logging.getLogger(__name__)
+
+TERM_PATTERN = re.compile(r'\w+')
+
+# Changes to these attributes re-index the product
+PRODUCT_FIELDS = ('name', 'products', 'category', 'details', 'incubatee_id')
+INCUBATEE_FIELDS = ('company_name',)
+
+
+def _changed(obj, fields):
+    state = inspect(obj)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+
+class ProductSearch:
+    """
+    Product search over `product_search_documents`.
+
+    On PostgreSQL every product has a weighted tsvector (name > products,
+    category, company name > details) behind a GIN index, matched with prefix
+    tsqueries, plus a pg_trgm index on the raw text so misspelt keywords still
+    find the product; results are ranked by ts_rank_cd + word_similarity.
+    On SQLite (tests, local runs) the same API falls back to LIKE over the
+    stored document.
+
+    Documents are rewritten in the same transaction whenever a product's
+    searchable fields or its incubatee's company name change.
+    """
+
+    @staticmethod
+    def init_app(app):
+        if not event.contains(Session, 'after_flush', ProductSearch._after_flush):
+            event.listen(Session, 'after_flush', ProductSearch._after_flush)
+
+        @app.cli.command('rebuild-search-index')
+        def rebuild_search_index():
+            """Rebuild product_search_documents for every product (run once after deploying the table)"""
+            indexed = ProductSearch.rebuild()
+            print(f"✅ Indexed {indexed} products for search")
+
+    # ------------------------------------------------------------------
+    # Indexing
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _text_config():
+        return cast(literal(current_app.config.get('SEARCH_TEXT_CONFIG', 'simple')), REGCONFIG)
+
+    @staticmethod
+    def _index_statement(dialect, condition):
+        """INSERT ... SELECT that (re)builds the documents of the products matching `condition`"""
+        def text_of(column):
+            return func.coalesce(column, '')
+
+        document = func.lower(
+            text_of(IncubateeProduct.name) + ' ' + text_of(IncubateeProduct.products) + ' ' +
+            text_of(IncubateeProduct.category) + ' ' + text_of(Incubatee.company_name) + ' ' +
+            text_of(IncubateeProduct.details)
+        )
+        if dialect == 'postgresql':
+            text_config = ProductSearch._text_config()
+
+            def weighted(column, weight):
+                return func.setweight(func.to_tsvector(text_config, text_of(column)), literal_column(f"'{weight}'"))
+
+            search_vector = (
+                weighted(IncubateeProduct.name, 'A')
+                .op('||')(weighted(IncubateeProduct.products, 'B'))
+                .op('||')(weighted(IncubateeProduct.category, 'B'))
+                .op('||')(weighted(Incubatee.company_name, 'B'))
+                .op('||')(weighted(IncubateeProduct.details, 'C'))
+            )
+        else:
+            search_vector = null()
+
+        source = (
+            select(IncubateeProduct.product_id, document, search_vector, literal(datetime.utcnow()))
+            .select_from(IncubateeProduct)
+            .outerjoin(Incubatee, IncubateeProduct.incubatee_id == Incubatee.incubatee_id)
+            .where(condition)
+        )
+        columns = ['product_id', 'document', 'search_vector', 'updated_at']
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        elif dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        else:
+            return [
+                delete(ProductSearchDocument).where(
+                    ProductSearchDocument.product_id.in_(select(IncubateeProduct.product_id).where(condition))
+                ),
+                ProductSearchDocument.__table__.insert().from_select(columns, source)
+            ]
+
+        statement = upsert(ProductSearchDocument.__table__).from_select(columns, source)
+        return [statement.on_conflict_do_update(
+            index_elements=['product_id'],
+            set_={column: statement.excluded[column] for column in columns[1:]}
+        )]
+
+    @staticmethod
+    def reindex(connection, product_ids=(), incubatee_ids=()):
+        """Rebuild the documents of the given products and of every product of the given incubatees"""
+        conditions = []
+        if product_ids:
+            conditions.append(IncubateeProduct.product_id.in_(sorted(product_ids)))
+        if incubatee_ids:
+            conditions.append(IncubateeProduct.incubatee_id.in_(sorted(incubatee_ids)))
+        if not conditions:
+            return
+        for statement in ProductSearch._index_statement(connection.dialect.name, or_(*conditions)):
+            connection.execute(statement)
+
+    @staticmethod
+    def _after_flush(session, flush_context):
+        product_ids, incubatee_ids, removed = set(), set(), set()
+        for obj in session.new:
+            if isinstance(obj, IncubateeProduct):
+                product_ids.add(obj.product_id)
+        for obj in session.dirty:
+            if isinstance(obj, IncubateeProduct) and _changed(obj, PRODUCT_FIELDS):
+                product_ids.add(obj.product_id)
+            elif isinstance(obj, Incubatee) and _changed(obj, INCUBATEE_FIELDS):
+                incubatee_ids.add(obj.incubatee_id)
+        for obj in session.deleted:
+            if isinstance(obj, IncubateeProduct):
+                removed.add(obj.product_id)
+        product_ids -= removed
+        if not (product_ids or incubatee_ids or removed):
+            return
+
+        connection = session.connection()
+        try:
+            # A savepoint keeps the product change alive if indexing fails
+            # (e.g. before the search table has been migrated)
+            with connection.begin_nested():
+                if removed:
+                    connection.execute(delete(ProductSearchDocument).where(ProductSearchDocument.product_id.in_(removed)))
+                ProductSearch.reindex(connection, product_ids, incubatee_ids)
+        except SQLAlchemyError as e:
+            logger.warning(f"⚠️ Could not update search index for products {sorted(product_ids)}: {e}")
+
+    @staticmethod
+    def rebuild() -> int:
+        """Rebuild every search document; on PostgreSQL also make sure pg_trgm is installed"""
+        connection = db.session.connection()
+        if connection.dialect.name == 'postgresql':
+            connection.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        connection.execute(delete(ProductSearchDocument).where(
+            ~ProductSearchDocument.product_id.in_(select(IncubateeProduct.product_id))
+        ))
+        for statement in ProductSearch._index_statement(connection.dialect.name, true()):
+            connection.execute(statement)
+        db.session.commit()
+        return db.session.query(func.count(ProductSearchDocument.product_id)).scalar()
+
+    # ------------------------------------------------------------------
+    # Searching
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def search(keyword, page=None, per_page=None):
+        """
+        Products matching every word of `keyword` (each word also matches as a
+        prefix), best match first. Returns (products, total); without `page`
+        all matches are returned.
+        """
+        terms = TERM_PATTERN.findall((keyword or '').lower())
+        if not terms:
+            return [], 0
+
+        query = (
+            IncubateeProduct.query
+            .join(ProductSearchDocument, ProductSearchDocument.product_id == IncubateeProduct.product_id)
+            .join(PricingUnit)
+            .join(Incubatee)
+            .options(db.joinedload(IncubateeProduct.pricing_unit))
+            .options(db.joinedload(IncubateeProduct.incubatee))
+        )
+
+        if db.session.get_bind().dialect.name == 'postgresql':
+            tsquery = func.to_tsquery(ProductSearch._text_config(), ' & '.join(f"{term}:*" for term in terms))
+            phrase = ' '.join(terms)
+            match = or_(
+                ProductSearchDocument.search_vector.op('@@')(tsquery),
+                # pg_trgm: tolerates typos; uses the trigram index
+                literal(phrase).op('<%')(ProductSearchDocument.document)
+            )
+            rank = (
+                func.coalesce(func.ts_rank_cd(ProductSearchDocument.search_vector, tsquery), 0) +
+                func.word_similarity(phrase, ProductSearchDocument.document)
+            )
+        else:
+            match = and_(*(ProductSearchDocument.document.contains(term, autoescape=True) for term in terms))
+            rank = sum(
+                case((func.lower(IncubateeProduct.name).contains(term, autoescape=True), 1), else_=0)
+                for term in terms
+            )
+
+        query = query.filter(match)
+        total = query.count() if page else None
+        query = query.order_by(rank.desc(), IncubateeProduct.added_on.desc(), IncubateeProduct.product_id.desc())
+        if page:
+            query = query.limit(per_page).offset((page - 1) * per_page)
+
+        products = query.all()
+        return products, len(products) if total is None else total
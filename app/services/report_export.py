@@ -0,0 +1,254 @@
+# services/report_export.py
+import json
+import logging
+import os
+import secrets
+import tempfile
+import threading
+import time
+from datetime import datetime
+from apscheduler.triggers.interval import IntervalTrigger
+from app.extension import db
+from app.services.sales_summary import SalesSummary, EXPORT_HEADER
+from app.utils.csv_stream import csv_chunks
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional: without it Parquet exports are unavailable
+    pyarrow = None
+
+try:
+    import openpyxl
+except ImportError:  # optional: without it XLSX exports are unavailable
+    openpyxl = None
+
+logger = logging.getLogger(__name__)
+
+# format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', '.csv'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', '.xlsx'),
+    'parquet': ('application/vnd.apache.parquet', '.parquet'),
+}
+XLSX_MAX_ROWS = 1048575  # Excel's sheet limit, less the header row
+PARQUET_ROW_GROUP_SIZE = 50000
+PROGRESS_EVERY = 5000  # Rows between progress updates
+
+
+class ReportExports:
+    """
+    Sales exports generated in the background and downloaded by token.
+
+    /admin/reports/export?format=xlsx|parquet (or csv&background=1) starts a
+    job on the scheduler's thread pool and answers 202 with a token; the job
+    reads the sales through the same filtered server-side cursor as the
+    streamed CSV export (SalesSummary.export_rows), writes the file into
+    REPORT_EXPORT_DIR and records its progress. Job state lives in Redis so
+    any worker can answer the status poll and serve the download (the
+    workers share the export directory); without Redis it stays in this
+    process. Files and state expire after REPORT_EXPORT_TTL_SECONDS.
+    """
+
+    KEY_PREFIX = "report_export:"
+    CLEANUP_JOB_ID = "report_export_cleanup"
+
+    def __init__(self):
+        self.app = None
+        self.scheduler = None
+        self.get_redis_client = None
+        self.directory = None
+        self.ttl_seconds = 3600
+        self._local = {}  # token -> state, when Redis is unavailable
+        self._lock = threading.Lock()
+
+    def init_app(self, app, scheduler, get_redis_client):
+        self.app = app
+        self.scheduler = scheduler
+        self.get_redis_client = get_redis_client
+        self.ttl_seconds = app.config.get('REPORT_EXPORT_TTL_SECONDS', 3600)
+        self.directory = app.config.get('REPORT_EXPORT_DIR') or os.path.join(tempfile.gettempdir(), 'report_exports')
+        os.makedirs(self.directory, exist_ok=True)
+
+        if scheduler is not None:
+            scheduler.add_job(
+                id=self.CLEANUP_JOB_ID,
+                func=self.cleanup,
+                trigger=IntervalTrigger(seconds=max(self.ttl_seconds // 4, 60)),
+                max_instances=1,
+                coalesce=True,
+                replace_existing=True
+            )
+
+    @staticmethod
+    def available_formats():
+        formats = ['csv']
+        if openpyxl is not None:
+            formats.append('xlsx')
+        if pyarrow is not None:
+            formats.append('parquet')
+        return formats
+
+    # ------------------------------------------------------------------
+    # Job state
+    # ------------------------------------------------------------------
+
+    def _redis(self):
+        if self.get_redis_client is None:
+            return None
+        try:
+            return self.get_redis_client()
+        except Exception:
+            return None
+
+    def _save(self, state):
+        with self._lock:
+            self._local[state['token']] = state
+        client = self._redis()
+        if client is None:
+            return
+        try:
+            client.set(self.KEY_PREFIX + state['token'], json.dumps(state), ex=self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Report export state not shared: {str(e)}")
+
+    def _update(self, token, **changes):
+        state = self.status(token) or {'token': token}
+        state.update(changes)
+        self._save(state)
+        return state
+
+    def status(self, token):
+        """Job state for `token`, or None when it is unknown or expired"""
+        client = self._redis()
+        if client is not None:
+            try:
+                value = client.get(self.KEY_PREFIX + token)
+                if value is not None:
+                    return json.loads(value)
+            except Exception:
+                pass
+        with self._lock:
+            return self._local.get(token)
+
+    def file_path(self, state):
+        return os.path.join(self.directory, state['token'] + EXPORT_FORMATS[state['format']][1])
+
+    # ------------------------------------------------------------------
+    # Jobs
+    # ------------------------------------------------------------------
+
+    def start(self, export_format, filters, filename_stem):
+        """Queue an export of the sales matching `filters`; returns its state"""
+        token = secrets.token_urlsafe(16)
+        state = self._update(
+            token,
+            format=export_format,
+            status='queued',
+            rows=0,
+            total=None,
+            filename=filename_stem + EXPORT_FORMATS[export_format][1],
+            created_at=datetime.utcnow().isoformat(),
+            error=None
+        )
+        if self.scheduler is not None:
+            self.scheduler.add_job(
+                id=self.KEY_PREFIX + token,
+                func=self._run,
+                args=[token, export_format, filters],
+                misfire_grace_time=None
+            )
+        else:
+            threading.Thread(target=self._run, args=(token, export_format, filters), daemon=True).start()
+        return state
+
+    def _run(self, token, export_format, filters):
+        with self.app.app_context():
+            state = self.status(token) or {'token': token, 'format': export_format}
+            path = self.file_path(state)
+            partial = path + '.part'
+            try:
+                total = SalesSummary.line_count(filters)  # Same query as the rows, so progress ends at 100%
+                self._update(token, status='running', total=total)
+                if export_format == 'xlsx' and total > XLSX_MAX_ROWS:
+                    raise ValueError(f"{total} rows exceed Excel's {XLSX_MAX_ROWS} row limit; export CSV or Parquet instead")
+
+                written = [0]
+                rows = self._counted(token, SalesSummary.export_rows(filters), written)
+                getattr(self, f'_write_{export_format}')(partial, rows)
+                os.replace(partial, path)
+                self._update(token, status='done', rows=written[0], size=os.path.getsize(path))
+                logger.info(f"📦 Report export {token} ready: {written[0]} rows as {export_format}")
+            except Exception as e:
+                logger.error(f"❌ Report export {token} failed: {str(e)}")
+                self._update(token, status='failed', error=str(e))
+                if os.path.exists(partial):
+                    os.remove(partial)
+            finally:
+                db.session.remove()
+
+    def _counted(self, token, rows, written):
+        """Pass `rows` through, counting them into written[0] and publishing progress"""
+        for count, row in enumerate(rows, 1):
+            if count % PROGRESS_EVERY == 0:
+                self._update(token, rows=count)
+            written[0] = count
+            yield row
+
+    @staticmethod
+    def _write_csv(path, rows):
+        with open(path, 'wb') as output:
+            for chunk in csv_chunks(EXPORT_HEADER, rows):
+                output.write(chunk)
+
+    @staticmethod
+    def _write_xlsx(path, rows):
+        workbook = openpyxl.Workbook(write_only=True)  # Rows go straight to the file
+        sheet = workbook.create_sheet("Sales")
+        sheet.append(EXPORT_HEADER)
+        for row in rows:
+            sheet.append(row)
+        workbook.save(path)
+
+    @staticmethod
+    def _write_parquet(path, rows):
+        schema = pyarrow.schema([
+            ('date', pyarrow.date32()),
+            ('order_id', pyarrow.int64()),
+            ('incubatee', pyarrow.string()),
+            ('product', pyarrow.string()),
+            ('customer', pyarrow.string()),
+            ('quantity', pyarrow.int64()),
+            ('unit_price', pyarrow.float64()),
+            ('total', pyarrow.float64()),
+            ('status', pyarrow.string()),
+        ])
+        with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+            columns = [[] for _ in schema.names]
+            for row in rows:
+                for column, value in zip(columns, row):
+                    column.append(value)
+                if len(columns[0]) >= PARQUET_ROW_GROUP_SIZE:
+                    writer.write_table(pyarrow.table(columns, schema=schema))
+                    columns = [[] for _ in schema.names]
+            if columns[0]:
+                writer.write_table(pyarrow.table(columns, schema=schema))
+
+    def cleanup(self):
+        """Delete export files and local job state older than the TTL"""
+        cutoff = time.time() - self.ttl_seconds
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+        with self._lock:
+            for token, state in list(self._local.items()):
+                created_at = datetime.fromisoformat(state.get('created_at', datetime.utcnow().isoformat()))
+                if (datetime.utcnow() - created_at).total_seconds() > self.ttl_seconds:
+                    del self._local[token]
+
+
+report_exports = ReportExports()
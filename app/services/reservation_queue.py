@@ -0,0 +1,275 @@
+# services/reservation_queue.py
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime, timezone, timedelta
+from apscheduler.triggers.date import DateTrigger
+from app.extension import db
+from app.models.reservation import Reservation
+from app.services.reservation_service import APPROVAL_DELAY_MINUTES
+
+logger = logging.getLogger(__name__)
+
+
+class ReservationDueQueue:
+    """
+    Due-time queue that wakes the reservation processor exactly when the next
+    pending reservation becomes eligible (reserved_at + APPROVAL_DELAY_MINUTES).
+
+    With Redis the queue is the sorted set `due_queue:reservations` (member
+    "<product_id>:<reservation_id>", score = due unix time) shared by all
+    workers; a publish on `due_queue:reservations:wakeup` tells every worker to arm
+    its timer, and ZREM decides which worker claims each entry. Without Redis
+    each worker keeps a local min-heap of the reservations it created.
+
+    The timer is a one-off APScheduler date job re-armed for the next due
+    entry after every run, so nothing is polled while the queue is empty.
+    """
+
+    ZSET_KEY = "due_queue:reservations"
+    CHANNEL = "due_queue:reservations:wakeup"
+    JOB_ID = "reservation_due_processor"
+    RETRY_SECONDS = 30
+
+    def __init__(self):
+        self.app = None
+        self.scheduler = None
+        self.processor = None
+        self.get_redis_client = None
+        self._heap = []
+        self._lock = threading.Lock()
+        self._pubsub_thread = None
+
+    def init_app(self, app, scheduler, processor, get_redis_client):
+        """
+        processor(product_ids) decides the queues of the given products;
+        get_redis_client() returns a Redis client or None.
+        """
+        self.app = app
+        self.scheduler = scheduler
+        self.processor = processor
+        self.get_redis_client = get_redis_client
+        with app.app_context():
+            self._start_listener()
+
+    def _redis(self):
+        if self.get_redis_client is None:
+            return None
+        try:
+            return self.get_redis_client()
+        except Exception:
+            return None
+
+    def _start_listener(self):
+        """Re-arm this worker's timer when another worker queues an earlier reservation"""
+        client = self._redis()
+        if client is None or self._pubsub_thread is not None:
+            return
+        try:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.CHANNEL: self._on_wakeup})
+            self._pubsub_thread = pubsub.run_in_thread(
+                sleep_time=1.0, daemon=True, exception_handler=self._on_listener_error
+            )
+        except Exception as e:
+            logger.warning(f"Due queue listener not started, using local queue: {str(e)}")
+            self._pubsub_thread = None
+
+    def _on_wakeup(self, message):
+        try:
+            self._arm(float(message["data"]))
+        except (TypeError, ValueError):
+            pass
+
+    def _on_listener_error(self, error, pubsub, thread):
+        logger.warning(f"Due queue listener stopped: {str(error)}")
+        thread.stop()
+        self._pubsub_thread = None
+
+    @staticmethod
+    def due_time(reserved_at):
+        if reserved_at.tzinfo is None:
+            reserved_at = reserved_at.replace(tzinfo=timezone.utc)
+        return (reserved_at + timedelta(minutes=APPROVAL_DELAY_MINUTES)).timestamp()
+
+    def schedule(self, reservation_id, product_id, reserved_at):
+        """Queue a pending reservation and make sure a worker wakes when it is due"""
+        self.schedule_many([(reservation_id, product_id, reserved_at)])
+
+    def schedule_many(self, reservations):
+        """Queue (reservation_id, product_id, reserved_at) tuples in one round trip"""
+        entries = {
+            f"{product_id}:{reservation_id}": self.due_time(reserved_at)
+            for reservation_id, product_id, reserved_at in reservations
+        }
+        if not entries:
+            return
+        earliest = min(entries.values())
+
+        client = self._redis()
+        if client is not None:
+            try:
+                pipe = client.pipeline()
+                pipe.zadd(self.ZSET_KEY, entries)
+                pipe.publish(self.CHANNEL, earliest)
+                pipe.execute()
+                self._arm(earliest)
+                return
+            except Exception as e:
+                logger.warning(f"Due queue Redis error, queueing locally: {str(e)}")
+
+        with self._lock:
+            for member, due in entries.items():
+                heapq.heappush(self._heap, (due, member))
+        self._arm(earliest)
+
+    def _arm(self, due):
+        """Wake at `due` unless an earlier wake-up is already set"""
+        if self.scheduler is None or not self.scheduler.running:
+            return
+        run_at = datetime.fromtimestamp(max(due, time.time()), timezone.utc)
+        job = self.scheduler.get_job(self.JOB_ID)
+        if job is not None and job.next_run_time is not None and job.next_run_time <= run_at:
+            return
+        self.scheduler.add_job(
+            id=self.JOB_ID,
+            func=self._run_due,
+            trigger=DateTrigger(run_date=run_at),
+            misfire_grace_time=None,
+            replace_existing=True
+        )
+
+    @staticmethod
+    def _product_id(member):
+        return int(member.split(":")[0])
+
+    @staticmethod
+    def _reservation_id(member):
+        """Reservation id of a "<product_id>:<reservation_id>" entry; None for retry entries"""
+        reservation_id = member.split(":")[1]
+        return int(reservation_id) if reservation_id.isdigit() else None
+
+    def _claim_due(self):
+        """Remove every due entry this worker wins and return their members by product id"""
+        now = time.time()
+        claimed = {}
+
+        client = self._redis()
+        if client is not None:
+            try:
+                members = client.zrangebyscore(self.ZSET_KEY, "-inf", now)
+                if members:
+                    pipe = client.pipeline()
+                    for member in members:
+                        pipe.zrem(self.ZSET_KEY, member)
+                    for member, removed in zip(members, pipe.execute()):
+                        if removed:
+                            if isinstance(member, bytes):
+                                member = member.decode()
+                            claimed.setdefault(self._product_id(member), set()).add(member)
+            except Exception as e:
+                logger.warning(f"Due queue Redis claim failed: {str(e)}")
+
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, member = heapq.heappop(self._heap)
+                claimed.setdefault(self._product_id(member), set()).add(member)
+
+        return claimed
+
+    def next_due(self):
+        """Unix time of the earliest queued reservation, or None if the queue is empty"""
+        candidates = []
+        client = self._redis()
+        if client is not None:
+            try:
+                first = client.zrange(self.ZSET_KEY, 0, 0, withscores=True)
+                if first:
+                    candidates.append(first[0][1])
+            except Exception:
+                pass
+        with self._lock:
+            if self._heap:
+                candidates.append(self._heap[0][0])
+        return min(candidates) if candidates else None
+
+    def size(self):
+        count = len(self._heap)
+        client = self._redis()
+        if client is not None:
+            try:
+                count += client.zcard(self.ZSET_KEY)
+            except Exception:
+                pass
+        return count
+
+    def _retry(self, members):
+        """Put claimed entries back on the queue, due again in RETRY_SECONDS"""
+        if not members:
+            return
+        due = time.time() + self.RETRY_SECONDS
+        client = self._redis()
+        if client is not None:
+            try:
+                client.zadd(self.ZSET_KEY, {member: due for member in members})
+                return
+            except Exception:
+                pass
+        with self._lock:
+            for member in members:
+                heapq.heappush(self._heap, (due, member))
+
+    def _undecided(self, claimed):
+        """
+        Claimed entries whose reservation is still pending: products another
+        worker had locked (SKIP LOCKED) are absent from the processor's results
+        and keep their reservations pending. "<product_id>:retry" entries
+        stand for every pending reservation of their product.
+        """
+        members = [member for product_members in claimed.values() for member in product_members]
+        reservation_ids = {self._reservation_id(member) for member in members} - {None}
+        retry_products = {self._product_id(member) for member in members if self._reservation_id(member) is None}
+
+        pending_reservations = set()
+        if reservation_ids:
+            pending_reservations = {row.reservation_id for row in db.session.query(Reservation.reservation_id).filter(
+                Reservation.reservation_id.in_(reservation_ids),
+                Reservation.status == "pending"
+            )}
+        pending_products = set()
+        if retry_products:
+            pending_products = {row.product_id for row in db.session.query(Reservation.product_id).filter(
+                Reservation.product_id.in_(retry_products),
+                Reservation.status == "pending"
+            ).distinct()}
+        db.session.commit()
+
+        return [
+            member for member in members
+            if self._reservation_id(member) in pending_reservations
+            or (self._reservation_id(member) is None and self._product_id(member) in pending_products)
+        ]
+
+    def _run_due(self):
+        with self.app.app_context():
+            claimed = {}
+            try:
+                claimed = self._claim_due()
+                if claimed:
+                    logger.info(f"⏰ {len(claimed)} product queue(s) due - processing reservations")
+                    if self.processor(sorted(claimed)) is None:
+                        self._retry([member for members in claimed.values() for member in members])
+                    else:
+                        self._retry(self._undecided(claimed))
+            except Exception as e:
+                logger.error(f"❌ Due reservation processing error: {str(e)}")
+                db.session.rollback()
+                self._retry([member for members in claimed.values() for member in members])
+            finally:
+                next_due = self.next_due()
+                if next_due is not None:
+                    self._arm(next_due)
+
+
+reservation_due_queue = ReservationDueQueue()
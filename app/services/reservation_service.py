@@ -0,0 +1,201 @@
+# services/reservation_service.py
+from datetime import datetime, timezone, timedelta
+from sqlalchemy import update, insert, select
+from flask import current_app
+from app.extension import db
+from app.models.reservation import Reservation
+from app.models.admin import IncubateeProduct
+from app.services.stock_service import StockService
+
+# Reservations stay pending for this long before the FCFS engine decides them
+APPROVAL_DELAY_MINUTES = 2
+INSUFFICIENT_STOCK_REASON = "Insufficient stock - product out of stock"
+OUT_OF_STOCK_REASON = "Product out of stock"
+
+
+class ReservationService:
+    """Batched FCFS allocation of pending reservations against product stock"""
+
+    @staticmethod
+    def allocate_pending(product_ids=None, commit=True):
+        """
+        Decide every pending reservation that has waited APPROVAL_DELAY_MINUTES.
+
+        Locks the products that have a queue (FOR UPDATE SKIP LOCKED, so other
+        workers take the remaining products), loads their pending reservations,
+        walks each product's queue oldest-first in memory (approve while stock
+        lasts, reject otherwise) and writes all status changes and stock
+        decrements in one transaction. With commit=False the row locks are
+        held until the caller commits.
+
+        Returns {product_id: {"incubatee_id", "approved", "rejected",
+        "still_pending", "remaining_stock", "decisions"}} where decisions maps
+        reservation_id -> (status, rejected_reason).
+        """
+        current_time = datetime.now(timezone.utc)
+        cutoff = current_time - timedelta(minutes=APPROVAL_DELAY_MINUTES)
+
+        # 1. Lock the products that have a queue; products another worker is
+        #    already processing are skipped and left to that worker
+        products = {row.product_id: row for row in StockService.claim_products_with_queue(product_ids)}
+        if not products:
+            return {}
+
+        # 2. Their pending reservations in FCFS order, locked for this transaction
+        pending = db.session.query(
+            Reservation.reservation_id,
+            Reservation.product_id,
+            Reservation.quantity,
+            Reservation.reserved_at
+        ).filter(
+            Reservation.status == "pending",
+            Reservation.product_id.in_(products.keys())
+        ).order_by(
+            Reservation.product_id, Reservation.reserved_at.asc(), Reservation.reservation_id.asc()
+        ).with_for_update(of=Reservation).all()
+
+        results = {}
+        approvals = []
+        rejections = []
+        stock_updates = []
+
+        for row in pending:
+            product = products.get(row.product_id)
+            if product is None:
+                continue
+
+            result = results.get(row.product_id)
+            if result is None:
+                result = results[row.product_id] = {
+                    "incubatee_id": product.incubatee_id,
+                    "approved": 0,
+                    "rejected": 0,
+                    "still_pending": 0,
+                    "remaining_stock": product.stock_amount or 0,
+                    "initial_stock": product.stock_amount or 0,
+                    "decisions": {}
+                }
+
+            reserved_at = row.reserved_at
+            if reserved_at.tzinfo is None:
+                reserved_at = reserved_at.replace(tzinfo=timezone.utc)
+
+            if reserved_at > cutoff:
+                # Still inside the waiting period
+                result["still_pending"] += 1
+                continue
+
+            if result["remaining_stock"] >= row.quantity:
+                result["remaining_stock"] -= row.quantity
+                result["approved"] += 1
+                result["decisions"][row.reservation_id] = ("approved", None)
+                approvals.append({
+                    "reservation_id": row.reservation_id,
+                    "status": "approved",
+                    "approved_at": current_time
+                })
+            else:
+                result["rejected"] += 1
+                result["decisions"][row.reservation_id] = ("rejected", INSUFFICIENT_STOCK_REASON)
+                rejections.append({
+                    "reservation_id": row.reservation_id,
+                    "status": "rejected",
+                    "rejected_at": current_time,
+                    "rejected_reason": INSUFFICIENT_STOCK_REASON
+                })
+
+        for product_id, result in results.items():
+            if result["remaining_stock"] != result.pop("initial_stock"):
+                stock_updates.append({
+                    "product_id": product_id,
+                    "stock_amount": result["remaining_stock"]
+                })
+
+        # 3. One transaction for every decision and stock change
+        if approvals:
+            db.session.execute(update(Reservation), approvals)
+        if rejections:
+            db.session.execute(update(Reservation), rejections)
+        if stock_updates:
+            db.session.execute(update(IncubateeProduct), stock_updates)
+
+        if commit:
+            db.session.commit()
+
+        for product_id, result in results.items():
+            if result["approved"] or result["rejected"]:
+                current_app.logger.info(
+                    f"📊 Processing complete for product {product_id}: "
+                    f"{result['approved']} approved, {result['rejected']} rejected, "
+                    f"{result['still_pending']} still pending, stock left {result['remaining_stock']}"
+                )
+
+        return results
+
+    @staticmethod
+    def create_bulk(user_id, items, commit=True):
+        """
+        Create reservations for a list of {product_id, quantity} items.
+
+        Loads every requested product in one IN query, decides each item
+        against that stock snapshot in memory (out of stock -> rejected,
+        otherwise pending until the FCFS engine runs) and inserts all rows
+        with one multi-row INSERT ... RETURNING.
+
+        Returns a list with one result per item, in request order:
+        {"product_id", "reservation_id", "status", "reason", "reserved_at"};
+        unknown products get status "error" and no reservation_id.
+        """
+        current_time = datetime.now(timezone.utc)
+
+        requested = []
+        for item in items:
+            product_id = item.get("product_id")
+            quantity = item.get("quantity")
+            if not product_id or not quantity or quantity <= 0:
+                continue
+            requested.append((product_id, quantity))
+
+        product_ids = {product_id for product_id, _ in requested}
+        stock = dict(db.session.execute(
+            select(IncubateeProduct.product_id, IncubateeProduct.stock_amount)
+            .where(IncubateeProduct.product_id.in_(product_ids))
+        ).all()) if product_ids else {}
+
+        results = []
+        rows = []
+        for product_id, quantity in requested:
+            if product_id not in stock:
+                results.append({"product_id": product_id, "status": "error", "reason": "Product not found"})
+                continue
+
+            if (stock[product_id] or 0) <= 0:
+                row = {"status": "rejected", "rejected_at": current_time, "rejected_reason": OUT_OF_STOCK_REASON}
+            else:
+                row = {"status": "pending", "rejected_at": None, "rejected_reason": None}
+            row.update(user_id=user_id, product_id=product_id, quantity=quantity, reserved_at=current_time)
+            rows.append(row)
+            results.append(row)
+
+        if rows:
+            inserted = db.session.execute(
+                insert(Reservation)
+                .returning(Reservation.reservation_id, sort_by_parameter_order=True),
+                rows
+            ).scalars().all()
+            for row, reservation_id in zip(rows, inserted):
+                row["reservation_id"] = reservation_id
+
+        if commit:
+            db.session.commit()
+
+        return [
+            {
+                "product_id": result["product_id"],
+                "reservation_id": result.get("reservation_id"),
+                "status": result["status"],
+                "reason": result.get("rejected_reason", result.get("reason")),
+                "reserved_at": result.get("reserved_at")
+            }
+            for result in results
+        ]
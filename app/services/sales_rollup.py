@@ -0,0 +1,181 @@
+# services/sales_rollup.py
+import logging
+from sqlalchemy import and_, delete, event, func, inspect, or_, select, true
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.extension import db
+from app.models.admin import SalesReport, SalesDailyRollup, IncubateeProduct
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLUMNS = ['sale_date', 'incubatee_id', 'product_id', 'category', 'quantity', 'revenue', 'order_count']
+
+
+class SalesRollup:
+    """
+    `sales_daily_rollup`: one row per (sale day, incubatee, product, category)
+    holding quantity, revenue and order count, so range reports sum a few
+    hundred rollup rows instead of scanning sales_reports.
+
+    Kept current from a Session after_flush listener, in the transaction that
+    writes the sales: new SalesReport rows are added to their rollup row with
+    an upsert, and the (day, product) rows of deleted sales are recomputed
+    from sales_reports. The incubatee is the sale's own or its product's, and
+    the category is the product's; when a product's category or incubatee
+    changes through the ORM its rows are rebuilt, so rollup figures keep
+    matching the line items read from sales_reports.
+    `flask backfill-sales-rollup` rebuilds the table.
+    """
+
+    @staticmethod
+    def init_app(app):
+        if not event.contains(Session, 'after_flush', SalesRollup._after_flush):
+            event.listen(Session, 'after_flush', SalesRollup._after_flush)
+
+        @app.cli.command('backfill-sales-rollup')
+        def backfill_sales_rollup():
+            """Rebuild sales_daily_rollup from sales_reports (run once after deploying the table)"""
+            rows = SalesRollup.rebuild()
+            print(f"✅ Rolled sales up into {rows} daily rows")
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _source(condition):
+        """SELECT of the rollup rows of the sales matching `condition`"""
+        incubatee_id = func.coalesce(SalesReport.incubatee_id, IncubateeProduct.incubatee_id)
+        category = func.coalesce(IncubateeProduct.category, '')
+        return (
+            select(
+                SalesReport.sale_date, incubatee_id, SalesReport.product_id, category,
+                func.sum(SalesReport.quantity), func.coalesce(func.sum(SalesReport.total_price), 0), func.count()
+            )
+            .select_from(SalesReport)
+            .join(IncubateeProduct, SalesReport.product_id == IncubateeProduct.product_id)
+            .where(condition)
+            .group_by(SalesReport.sale_date, incubatee_id, SalesReport.product_id, category)
+        )
+
+    @staticmethod
+    def _day_products(pairs):
+        """Builder of a condition matching the (sale_date, product_id) pairs on given columns"""
+        def condition(sale_date, product_id):
+            return or_(*(and_(sale_date == day, product_id == product) for day, product in sorted(pairs)))
+        return condition
+
+    @staticmethod
+    def add(connection, sales_ids):
+        """Add the given (new) sales to their rollup rows"""
+        source = SalesRollup._source(SalesReport.sales_id.in_(sorted(sales_ids)))
+        dialect = connection.dialect.name
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        elif dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        else:
+            pairs = {tuple(row) for row in connection.execute(
+                select(SalesReport.sale_date, SalesReport.product_id).where(SalesReport.sales_id.in_(sorted(sales_ids)))
+            )}
+            SalesRollup.recompute(connection, pairs)
+            return
+
+        statement = upsert(SalesDailyRollup.__table__).from_select(ROLLUP_COLUMNS, source)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=['sale_date', 'incubatee_id', 'product_id', 'category'],
+            set_={
+                'quantity': SalesDailyRollup.quantity + statement.excluded.quantity,
+                'revenue': SalesDailyRollup.revenue + statement.excluded.revenue,
+                'order_count': SalesDailyRollup.order_count + statement.excluded.order_count
+            }
+        ))
+
+    @staticmethod
+    def recompute(connection, pairs):
+        """Rebuild the rollup rows of the given (sale_date, product_id) pairs from sales_reports"""
+        if not pairs:
+            return
+        condition = SalesRollup._day_products(pairs)
+        connection.execute(delete(SalesDailyRollup).where(
+            condition(SalesDailyRollup.sale_date, SalesDailyRollup.product_id)
+        ))
+        connection.execute(SalesDailyRollup.__table__.insert().from_select(
+            ROLLUP_COLUMNS, SalesRollup._source(condition(SalesReport.sale_date, SalesReport.product_id))
+        ))
+
+    @staticmethod
+    def recompute_products(connection, product_ids):
+        """Rebuild every rollup row of the given products (after a category or incubatee change)"""
+        if not product_ids:
+            return
+        product_ids = sorted(product_ids)
+        connection.execute(delete(SalesDailyRollup).where(SalesDailyRollup.product_id.in_(product_ids)))
+        connection.execute(SalesDailyRollup.__table__.insert().from_select(
+            ROLLUP_COLUMNS, SalesRollup._source(SalesReport.product_id.in_(product_ids))
+        ))
+
+    @staticmethod
+    def _regrouped(product):
+        """True if a flushed product change moves its sales to another category or incubatee"""
+        state = inspect(product)
+        return state.attrs.category.history.has_changes() or state.attrs.incubatee_id.history.has_changes()
+
+    @staticmethod
+    def _after_flush(session, flush_context):
+        added = [obj.sales_id for obj in session.new if isinstance(obj, SalesReport)]
+        removed = {(obj.sale_date, obj.product_id) for obj in session.deleted if isinstance(obj, SalesReport)}
+        regrouped = {
+            obj.product_id for obj in session.dirty
+            if isinstance(obj, IncubateeProduct) and SalesRollup._regrouped(obj)
+        }
+        if not (added or removed or regrouped):
+            return
+
+        connection = session.connection()
+        try:
+            # A savepoint keeps the sale alive if the rollup fails
+            # (e.g. before the table has been migrated); a backfill repairs it
+            with connection.begin_nested():
+                if added:
+                    SalesRollup.add(connection, added)
+                SalesRollup.recompute(connection, removed)
+                SalesRollup.recompute_products(connection, regrouped)
+        except SQLAlchemyError as e:
+            logger.warning(f"⚠️ Could not update sales rollup for sales {sorted(added)} / products {sorted(regrouped)}: {e}")
+
+    @staticmethod
+    def rebuild() -> int:
+        connection = db.session.connection()
+        connection.execute(delete(SalesDailyRollup))
+        connection.execute(SalesDailyRollup.__table__.insert().from_select(ROLLUP_COLUMNS, SalesRollup._source(true())))
+        db.session.commit()
+        return db.session.query(func.count()).select_from(SalesDailyRollup).scalar()
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def conditions(filters):
+        """WHERE clauses on sales_daily_rollup for SalesSummary.filters() output"""
+        conditions = []
+        if filters.get('start_date'):
+            conditions.append(SalesDailyRollup.sale_date >= filters['start_date'])
+        if filters.get('end_date'):
+            conditions.append(SalesDailyRollup.sale_date <= filters['end_date'])
+        if filters.get('incubatee_id') is not None:
+            conditions.append(SalesDailyRollup.incubatee_id == filters['incubatee_id'])
+        if filters.get('category'):
+            conditions.append(SalesDailyRollup.category == filters['category'])
+        return conditions
+
+    @staticmethod
+    def totals(conditions):
+        """(revenue, orders, quantity) of the rollup rows matching `conditions`"""
+        row = db.session.query(
+            func.coalesce(func.sum(SalesDailyRollup.revenue), 0),
+            func.coalesce(func.sum(SalesDailyRollup.order_count), 0),
+            func.coalesce(func.sum(SalesDailyRollup.quantity), 0)
+        ).filter(*conditions).one()
+        return row[0], int(row[1]), int(row[2])
@@ -0,0 +1,271 @@
+# services/sales_summary.py
+from datetime import datetime
+from sqlalchemy import func
+from app.extension import db
+from app.models.admin import SalesReport, SalesDailyRollup, Incubatee, IncubateeProduct
+from app.models.user import User
+from app.services.sales_rollup import SalesRollup
+
+CHART_SLICES = 8  # Doughnut chart: top incubatees, the rest grouped as "Others"
+TOP_INCUBATEES = 5  # Bar chart
+DEFAULT_LINE_ITEMS_PAGE_SIZE = 50
+MAX_LINE_ITEMS_PAGE_SIZE = 500
+EXPORT_BATCH_SIZE = 1000  # Rows per fetch from the server-side cursor
+EXPORT_HEADER = ['Date', 'Order ID', 'Incubatee', 'Product', 'Customer', 'Quantity', 'Unit Price', 'Total', 'Status']
+
+# The sale's own incubatee, or its product's for older sales without one
+SALE_INCUBATEE_ID = func.coalesce(SalesReport.incubatee_id, IncubateeProduct.incubatee_id)
+
+
+def _incubatee_name(first_name, last_name):
+    return f"{first_name} {last_name}" if first_name is not None else "Unknown"
+
+
+class SalesSummary:
+    """
+    The /admin/reports/sales-summary numbers, aggregated in the database.
+
+    Totals, per-incubatee figures and charts come from sales_daily_rollup
+    (services/sales_rollup.py): one GROUP BY (incubatee, product) query with
+    window functions yields a row per incubatee carrying its revenue,
+    orders, distinct products and best-selling product, and the summary and
+    both charts are folded from those few rows. Line items are a separate,
+    paginated query on sales_reports, so neither call loads every sale in
+    the range.
+
+    filters()/conditions() are the one filter implementation behind the
+    summary, line item, preview and export endpoints; the statements differ
+    only in bound parameters, so SQLAlchemy compiles each shape once.
+    """
+
+    @staticmethod
+    def filters(args):
+        """
+        Normalized ?start_date=&end_date=&filter=&incubatee_id=&category=.
+        Raises ValueError for malformed dates or incubatee ids.
+        """
+        filters = {'start_date': None, 'end_date': None, 'incubatee_id': None, 'category': None}
+        start_date, end_date = args.get('start_date'), args.get('end_date')
+        if start_date and end_date:
+            filters['start_date'] = datetime.strptime(start_date, '%Y-%m-%d').date()
+            filters['end_date'] = datetime.strptime(end_date, '%Y-%m-%d').date()
+
+        filter_type = args.get('filter', 'all')
+        if filter_type == 'incubatee' and args.get('incubatee_id'):
+            filters['incubatee_id'] = int(args.get('incubatee_id'))
+        elif filter_type == 'category' and args.get('category'):
+            filters['category'] = args.get('category')
+        return filters
+
+    @staticmethod
+    def cache_parts(filters):
+        """Cache key parts of `filters`: equal filters give equal keys whatever the query string"""
+        return [f"{name}={'' if filters[name] is None else filters[name]}" for name in sorted(filters)]
+
+    @staticmethod
+    def data_version():
+        """
+        Watermark of sales_reports (its highest sales_id, an index lookup):
+        part of every report cache key, so a new sale moves reads to fresh
+        entries at once. Deleted sales still rely on the "sales" tag.
+        """
+        return f"v{db.session.query(func.max(SalesReport.sales_id)).scalar() or 0}"
+
+    @staticmethod
+    def conditions(filters):
+        """WHERE clauses on sales_reports (joined to its product) for `filters`"""
+        conditions = []
+        if filters['start_date'] and filters['end_date']:
+            conditions.append(SalesReport.sale_date.between(filters['start_date'], filters['end_date']))
+        if filters['incubatee_id'] is not None:
+            conditions.append(SALE_INCUBATEE_ID == filters['incubatee_id'])
+        if filters['category']:
+            conditions.append(IncubateeProduct.category == filters['category'])
+        return conditions
+
+    @staticmethod
+    def _sales(*columns):
+        return (
+            db.session.query(*columns)
+            .select_from(SalesReport)
+            .outerjoin(IncubateeProduct, SalesReport.product_id == IncubateeProduct.product_id)
+        )
+
+    @staticmethod
+    def incubatee_rows(filters):
+        """(incubatee_id, first_name, last_name, revenue, orders, product_count, top_product) per incubatee"""
+        R = SalesDailyRollup
+        revenue = func.coalesce(func.sum(R.revenue), 0)
+        per_product = (
+            db.session.query(
+                R.incubatee_id,
+                R.product_id,
+                func.sum(revenue).over(partition_by=R.incubatee_id).label('revenue'),
+                func.sum(func.sum(R.order_count)).over(partition_by=R.incubatee_id).label('orders'),
+                func.count().over(partition_by=R.incubatee_id).label('product_count'),
+                func.row_number().over(
+                    partition_by=R.incubatee_id,
+                    order_by=(revenue.desc(), R.product_id)
+                ).label('product_rank')
+            )
+            .filter(*SalesRollup.conditions(filters))
+            .group_by(R.incubatee_id, R.product_id)
+            .subquery()
+        )
+        return (
+            db.session.query(
+                per_product.c.incubatee_id, Incubatee.first_name, Incubatee.last_name,
+                per_product.c.revenue, per_product.c.orders, per_product.c.product_count,
+                IncubateeProduct.name.label('top_product')
+            )
+            .select_from(per_product)
+            .outerjoin(Incubatee, Incubatee.incubatee_id == per_product.c.incubatee_id)
+            .outerjoin(IncubateeProduct, IncubateeProduct.product_id == per_product.c.product_id)
+            .filter(per_product.c.product_rank == 1)
+            .order_by(per_product.c.revenue.desc())
+            .all()
+        )
+
+    @staticmethod
+    def build(filters):
+        """Summary totals, incubatee performance and chart series"""
+        incubatee_performance = []
+        chart = {}
+        active_incubatees = 0
+        for row in SalesSummary.incubatee_rows(filters):
+            name = _incubatee_name(row.first_name, row.last_name)
+            revenue = float(row.revenue or 0)
+            incubatee_performance.append({
+                'name': name,
+                'revenue': revenue,
+                'order_count': int(row.orders),
+                'product_count': int(row.product_count),
+                'completion_rate': 100.0,  # Sales reports are completed reservations
+                'top_product': row.top_product or 'N/A'
+            })
+            chart[name] = chart.get(name, 0) + revenue
+            if row.incubatee_id is not None:
+                active_incubatees += 1
+
+        total_orders = sum(incubatee['order_count'] for incubatee in incubatee_performance)
+        sorted_chart = sorted(chart.items(), key=lambda item: item[1], reverse=True)
+        chart_labels = [name for name, _ in sorted_chart[:CHART_SLICES]]
+        chart_data = [revenue for _, revenue in sorted_chart[:CHART_SLICES]]
+        others_total = sum(revenue for _, revenue in sorted_chart[CHART_SLICES:])
+        if others_total > 0:
+            chart_labels.append("Others")
+            chart_data.append(others_total)
+
+        return {
+            "summary": {
+                "total_revenue": sum(incubatee['revenue'] for incubatee in incubatee_performance),
+                "total_orders": total_orders,
+                "completed_orders": total_orders,
+                "completion_rate": 100.0 if total_orders > 0 else 0,
+                "active_incubatees": active_incubatees
+            },
+            "incubatee_performance": incubatee_performance,
+            "charts": {
+                "incubatee_sales": {
+                    "labels": chart_labels,
+                    "data": chart_data
+                },
+                "top_incubatees": {
+                    "labels": [incubatee['name'] for incubatee in incubatee_performance[:TOP_INCUBATEES]],
+                    "data": [incubatee['revenue'] for incubatee in incubatee_performance[:TOP_INCUBATEES]]
+                }
+            }
+        }
+
+    @staticmethod
+    def count(filters):
+        """Number of sales matching `filters`, from the rollup"""
+        return SalesRollup.totals(SalesRollup.conditions(filters))[1]
+
+    @staticmethod
+    def line_count(filters):
+        """Number of rows lines(filters) yields, counted on sales_reports itself"""
+        return SalesSummary._sales(func.count()).filter(*SalesSummary.conditions(filters)).scalar()
+
+    @staticmethod
+    def lines(filters):
+        """Query of the line item columns of the sales matching `filters` (unordered)"""
+        return (
+            SalesSummary._sales(
+                SalesReport.sale_date, SalesReport.reservation_id, SalesReport.product_name,
+                SalesReport.quantity, SalesReport.unit_price, SalesReport.total_price,
+                User.username, Incubatee.first_name, Incubatee.last_name
+            )
+            .outerjoin(Incubatee, Incubatee.incubatee_id == SALE_INCUBATEE_ID)
+            .outerjoin(User, User.id_no == SalesReport.user_id)
+            .filter(*SalesSummary.conditions(filters))
+        )
+
+    @staticmethod
+    def line_items(filters, page=1, per_page=DEFAULT_LINE_ITEMS_PAGE_SIZE):
+        """One page of sales, newest first, as the summary's sales_data entries"""
+        rows = (
+            SalesSummary.lines(filters)
+            .order_by(SalesReport.sale_date.desc(), SalesReport.sales_id.desc())
+            .limit(per_page)
+            .offset((page - 1) * per_page)
+            .all()
+        )
+        return [{
+            "sale_date": row.sale_date.isoformat() if row.sale_date else None,
+            "reservation_id": row.reservation_id,
+            "incubatee_name": _incubatee_name(row.first_name, row.last_name),
+            "product_name": row.product_name,
+            "customer_name": row.username or "Unknown",
+            "quantity": row.quantity,
+            "unit_price": float(row.unit_price) if row.unit_price else 0,
+            "total_price": float(row.total_price) if row.total_price else 0,
+            "status": "completed"
+        } for row in rows]
+
+    @staticmethod
+    def preview_rows(filters, limit):
+        """The first `limit` sales matching `filters`, oldest first, as preview_data entries"""
+        rows = SalesSummary.lines(filters).order_by(SalesReport.sale_date, SalesReport.sales_id).limit(limit).all()
+        return [{
+            "date": row.sale_date.strftime("%Y-%m-%d") if row.sale_date else "",
+            "order_id": row.reservation_id,
+            "incubatee": _incubatee_name(row.first_name, row.last_name),
+            "product": row.product_name,
+            "customer": row.username or "Unknown",
+            "quantity": row.quantity,
+            "unit_price": float(row.unit_price) if row.unit_price else 0,
+            "total": float(row.total_price) if row.total_price else 0
+        } for row in rows]
+
+    @staticmethod
+    def export_rows(filters, batch_size=EXPORT_BATCH_SIZE):
+        """
+        Export rows (EXPORT_HEADER order) of the sales matching `filters`, oldest
+        first, read through a server-side cursor `batch_size` rows at a time.
+        Dates stay date objects: csv writes them as ISO dates, XLSX and
+        Parquet keep them typed.
+        """
+        query = SalesSummary.lines(filters).order_by(SalesReport.sale_date, SalesReport.sales_id)
+        for row in query.yield_per(batch_size):
+            yield (
+                row.sale_date,
+                row.reservation_id,
+                _incubatee_name(row.first_name, row.last_name),
+                row.product_name,
+                row.username or "Unknown",
+                row.quantity,
+                float(row.unit_price) if row.unit_price else 0,
+                float(row.total_price) if row.total_price else 0,
+                'completed'
+            )
+
+    @staticmethod
+    def pagination(page, per_page, total):
+        return {
+            "page": page,
+            "per_page": per_page,
+            "total": total,
+            "pages": (total + per_page - 1) // per_page,
+            "has_more": page * per_page < total
+        }
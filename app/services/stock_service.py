@@ -0,0 +1,111 @@
+# services/stock_service.py
+from sqlalchemy import update, select
+from app.extension import db
+from app.models.reservation import Reservation
+from app.models.admin import IncubateeProduct
+
+
+class StockService:
+    """
+    Concurrency-safe stock mutations.
+
+    Every change to incubatee_products.stock_amount goes through a single
+    UPDATE statement (the database does the arithmetic while holding the row
+    lock) or happens while the product row is locked with SELECT ... FOR UPDATE.
+    SKIP LOCKED lets several workers claim different product queues in parallel
+    instead of waiting on each other. Locks are always taken product first,
+    then reservation, so the paths below cannot deadlock each other.
+    On SQLite the lock clauses are ignored.
+    """
+
+    @staticmethod
+    def reserve(product_id, quantity):
+        """
+        Atomically take `quantity` units from a product.
+        Returns the remaining stock, or None if there was not enough stock.
+        """
+        remaining = db.session.execute(
+            update(IncubateeProduct)
+            .where(
+                IncubateeProduct.product_id == product_id,
+                IncubateeProduct.stock_amount >= quantity
+            )
+            .values(stock_amount=IncubateeProduct.stock_amount - quantity)
+            .returning(IncubateeProduct.stock_amount)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        return remaining
+
+    @staticmethod
+    def release(product_id, quantity):
+        """
+        Atomically return `quantity` units to a product.
+        Returns the new stock, or None if the product no longer exists.
+        """
+        return db.session.execute(
+            update(IncubateeProduct)
+            .where(IncubateeProduct.product_id == product_id)
+            .values(stock_amount=db.func.coalesce(IncubateeProduct.stock_amount, 0) + quantity)
+            .returning(IncubateeProduct.stock_amount)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+
+    @staticmethod
+    def claim_products_with_queue(product_ids=None):
+        """
+        Lock the product rows that have pending reservations, skipping rows
+        another worker already holds. The locks last until the caller commits
+        or rolls back, so the caller owns those queues for the transaction.
+        Returns rows of (product_id, incubatee_id, stock_amount).
+        """
+        queued = select(Reservation.product_id).where(Reservation.status == "pending")
+        if product_ids is not None:
+            queued = queued.where(Reservation.product_id.in_(product_ids))
+
+        return db.session.execute(
+            select(
+                IncubateeProduct.product_id,
+                IncubateeProduct.incubatee_id,
+                IncubateeProduct.stock_amount
+            )
+            .where(IncubateeProduct.product_id.in_(queued))
+            .order_by(IncubateeProduct.product_id)
+            .with_for_update(skip_locked=True, of=IncubateeProduct)
+        ).all()
+
+    @staticmethod
+    def lock_product(product_id):
+        """Load a product with a row lock (waits for other holders)"""
+        return db.session.execute(
+            select(IncubateeProduct)
+            .where(IncubateeProduct.product_id == product_id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        ).scalar_one_or_none()
+
+    @staticmethod
+    def lock_reservation(reservation_id):
+        """Load a reservation with a row lock so status changes cannot race"""
+        return db.session.execute(
+            select(Reservation)
+            .where(Reservation.reservation_id == reservation_id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        ).scalar_one_or_none()
+
+    @staticmethod
+    def claim_reservations(*criteria, limit=None):
+        """
+        Lock reservations matching `criteria` for this transaction, skipping
+        any that another worker is already handling.
+        """
+        query = (
+            select(Reservation)
+            .where(*criteria)
+            .order_by(Reservation.reservation_id)
+            .with_for_update(skip_locked=True)
+            .execution_options(populate_existing=True)
+        )
+        if limit:
+            query = query.limit(limit)
+        return db.session.execute(query).scalars().all()
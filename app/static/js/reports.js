@@ -1,6 +1,7 @@
 // reports.js - Dedicated JavaScript for Incubatee Reports
 let currentView = 'table';
 let currentReportData = null;
+let currentReportQuery = '';
 let charts = {};
 let currentFilterType = 'all';
 let currentFilterValue = '';
@@ -242,6 +243,7 @@ async function generateReport() {
             url += `&category=${encodeURIComponent(filterValue)}`;
         }
         
+        currentReportQuery = url.split('?')[1];
         const response = await fetch(url);
         const data = await response.json();
         
@@ -326,7 +328,13 @@ function displayTableData(data) {
                 </span>
             </td>
         </tr>
-    `).join('');
+    `).join('') + (hasMoreSales(data) ? `
+        <tr>
+            <td colspan="9" class="load-more">
+                <button class="btn btn-secondary" onclick="loadMoreSales()">Load more (${data.sales_data.length} of ${data.sales_data_pagination.total})</button>
+            </td>
+        </tr>
+    ` : '');
 }
 
 function displayCardData(data) {
@@ -366,7 +374,37 @@ function displayCardData(data) {
                 </span>
             </div>
         </div>
-    `).join('');
+    `).join('') + (hasMoreSales(data) ? `
+        <div class="load-more">
+            <button class="btn btn-secondary" onclick="loadMoreSales()">Load more (${data.sales_data.length} of ${data.sales_data_pagination.total})</button>
+        </div>
+    ` : '');
+}
+
+function hasMoreSales(data) {
+    return Boolean(data.sales_data_pagination && data.sales_data.length < data.sales_data_pagination.total);
+}
+
+// The summary carries the first page of line items; fetch the next one
+async function loadMoreSales() {
+    if (!currentReportData || !hasMoreSales(currentReportData)) return;
+    
+    const pagination = currentReportData.sales_data_pagination;
+    const nextPage = Math.floor(currentReportData.sales_data.length / pagination.per_page) + 1;
+    try {
+        const response = await fetch(`/admin/reports/sales-lines?${currentReportQuery}&page=${nextPage}&per_page=${pagination.per_page}`);
+        const data = await response.json();
+        if (!data.success) {
+            throw new Error(data.error || 'Failed to load sales');
+        }
+        currentReportData.sales_data = currentReportData.sales_data.concat(data.sales_data);
+        currentReportData.sales_data_pagination = data.pagination;
+        displayTableData(currentReportData);
+        displayCardData(currentReportData);
+    } catch (error) {
+        console.error('Error loading more sales:', error);
+        showNotification('Failed to load more sales: ' + error.message, 'error');
+    }
 }
 
 function displayIncubateePerformance(data) {
@@ -559,6 +597,12 @@ async function exportReport() {
             url += `&category=${encodeURIComponent(filterValue)}`;
         }
         
+        const exportFormat = document.getElementById('exportFormat')?.value || 'csv';
+        if (exportFormat !== 'csv') {
+            await exportInBackground(`${url}&format=${exportFormat}`);
+            return;
+        }
+        
         const response = await fetch(url);
         const blob = await response.blob();
         
@@ -578,6 +622,31 @@ async function exportReport() {
     }
 }
 
+// XLSX/Parquet exports are built by a background job: poll it, then download
+async function exportInBackground(url) {
+    const response = await fetch(url);
+    let job = await response.json();
+    if (!response.ok || !job.success) {
+        throw new Error(job.error || 'Export failed');
+    }
+    
+    showNotification('⏳ Preparing export...', 'info');
+    while (job.status === 'queued' || job.status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, 1500));
+        const statusResponse = await fetch(job.status_url);
+        job = await statusResponse.json();
+        if (job.status === 'running' && job.progress.total) {
+            showNotification(`⏳ Exporting... ${job.progress.percent}%`, 'info');
+        }
+    }
+    
+    if (job.status !== 'done') {
+        throw new Error(job.error || 'Export failed');
+    }
+    window.location.href = job.download_url;
+    showNotification('✅ Report exported successfully!', 'success');
+}
+
 // Utility functions for reports
 function escapeHtml(unsafe) {
     if (!unsafe) return '';
@@ -1,13 +1,15 @@
 
 import logging
 import atexit
-from datetime import datetime
+from datetime import datetime, timedelta
 from flask import current_app
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from app import db
 from .stock_monitor import StockMonitor
 from .email_sender import EmailSender
+from .scheduler_lease import get_lease, interval_lease_ttl
+from .scheduler_metrics import track_scheduler, scheduler_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +24,7 @@ class AutoStockNotifier:
             cls._instance.scheduler = None
             cls._instance.scheduler_running = False
             cls._instance.app = None
+            cls._instance.lease = None
         return cls._instance
     
     def init_scheduler(self, app):
@@ -36,14 +39,24 @@ class AutoStockNotifier:
             
             # Create scheduler
             self.scheduler = BackgroundScheduler(daemon=True)
+            track_scheduler(self.scheduler, 'auto_stock_notifier')
             
             # Get interval from config (default: 5 minutes for thesis demo)
             check_interval_minutes = app.config.get('STOCK_CHECK_INTERVAL_MINUTES', 5)
             
+            # One worker across the cluster sends the batches
+            self.lease = get_lease('auto_stock_notifier', interval_lease_ttl(check_interval_minutes * 60))
+            
+            # Offset each batch's first run so they land at their minute of the cycle
+            cycle_start = datetime.now()
+            first_minute = app.config.get('FIRST_NOTIFICATION_MINUTE', 1)
+            second_minute = app.config.get('SECOND_NOTIFICATION_MINUTE', 4)
+            
             # Schedule both jobs using lambda functions that include app context
             self.scheduler.add_job(
                 func=self._send_batch_with_context,
-                trigger=IntervalTrigger(minutes=check_interval_minutes),
+                trigger=IntervalTrigger(minutes=check_interval_minutes,
+                                        start_date=cycle_start + timedelta(minutes=first_minute)),
                 args=[app, 1],  # Pass app and batch number
                 id='first_notification_batch',
                 name='First notification batch',
@@ -52,7 +65,8 @@ class AutoStockNotifier:
             
             self.scheduler.add_job(
                 func=self._send_batch_with_context,
-                trigger=IntervalTrigger(minutes=check_interval_minutes),
+                trigger=IntervalTrigger(minutes=check_interval_minutes,
+                                        start_date=cycle_start + timedelta(minutes=second_minute)),
                 args=[app, 2],  # Pass app and batch number
                 id='second_notification_batch',
                 name='Second notification batch',
@@ -64,7 +78,7 @@ class AutoStockNotifier:
             self.scheduler_running = True
             
             logger.info(f"✅ Dual notification scheduler started ({check_interval_minutes}-minute interval)")
-            logger.info("📧 First notification at minute 1, second at minute 4 of each interval")
+            logger.info(f"📧 First notification at minute {first_minute}, second at minute {second_minute} of each interval")
             
             # Register shutdown
             atexit.register(self.shutdown)
@@ -75,6 +89,9 @@ class AutoStockNotifier:
     def _send_batch_with_context(self, app, batch_number):
         """Send notification batch with proper Flask context"""
         with app.app_context():
+            if self.lease and not self.lease.acquire():
+                logger.debug(f"⏭️ Batch {batch_number}: another worker holds the notifier lease")
+                return {'success': True, 'skipped': True, 'message': 'Not the leader worker', 'batch': batch_number}
             try:
                 if batch_number == 1:
                     return self._send_notification_batch(batch_number=1)
@@ -101,8 +118,8 @@ class AutoStockNotifier:
             
             logger.info(f"🔍 Batch {batch_number}: Checking for low stock products...")
             
-            # Get all low stock products
-            low_stock_products = StockMonitor.check_low_stock_products()
+            # Low stock products with their sold quantities, in one query
+            low_stock_products = StockMonitor.low_stock_sweep()
             
             if not low_stock_products:
                 logger.info(f"✅ Batch {batch_number}: No low stock products found")
@@ -119,44 +136,22 @@ class AutoStockNotifier:
             demo_mode = current_app.config.get('DEMO_MODE', False)
             max_notifications = current_app.config.get('DEMO_NOTIFICATIONS_PER_BATCH', 2)
             
-            notifications_sent = 0
-            failed_notifications = 0
-            sent_to_incubatees = []
-            
-            for index, product in enumerate(low_stock_products):
-                # Limit notifications in demo mode
-                if demo_mode and notifications_sent >= max_notifications:
-                    logger.info(f"📊 Demo mode: Sent {max_notifications} emails, stopping for batch {batch_number}")
-                    break
-                
-                product_id = product['product_id']
-                
-                # Check if we should send based on interval (using EmailSender's logic)
-                should_send = EmailSender.should_send_email(
-                    product.get('incubatee_id'),
-                    product_id,
-                    interval_minutes=current_app.config.get('EMAIL_INTERVAL_MINUTES', 5)
-                )
-                
-                if not should_send:
-                    logger.debug(f"Batch {batch_number}: Skipping product {product_id} - within interval")
-                    continue
-                
-                # Send notification to incubatee
-                if product.get('email'):
-                    logger.info(f"📧 Batch {batch_number}: Sending notification to {product['email']}")
-                    
-                    success = EmailSender.send_low_stock_notification(product)
-                    
-                    if success:
-                        notifications_sent += 1
-                        sent_to_incubatees.append(product['incubatee_name'])
-                        logger.info(f"✅ Batch {batch_number}: Notification sent for product {product_id}")
-                    else:
-                        failed_notifications += 1
-                        logger.error(f"❌ Batch {batch_number}: Failed to send notification for product {product_id}")
-                else:
-                    logger.warning(f"Batch {batch_number}: No email for {product['incubatee_name']}")
+            # One digest email per incubatee; cooldown check, log writes and
+            # queueing happen once for the whole batch
+            queued = EmailSender.queue_low_stock_notifications(
+                low_stock_products,
+                limit=max_notifications if demo_mode else None,
+                log_skipped=False
+            )
+            notifications_sent = queued['emails']
+            failed_notifications = len(queued['failed'])
+            
+            if demo_mode and notifications_sent >= max_notifications:
+                logger.info(f"📊 Demo mode: Queued {max_notifications} emails for batch {batch_number}")
+            if queued['skipped']:
+                logger.debug(f"Batch {batch_number}: Skipped {len(queued['skipped'])} products within interval")
+            for product in queued['no_email']:
+                logger.warning(f"Batch {batch_number}: No email for {product['incubatee_name']}")
             
             # Send admin summary if notifications were sent
             admin_notified = False
@@ -204,7 +199,9 @@ class AutoStockNotifier:
                 'check_interval_minutes': current_app.config.get('STOCK_CHECK_INTERVAL_MINUTES', 5),
                 'email_interval_minutes': current_app.config.get('EMAIL_INTERVAL_MINUTES', 5),
                 'low_stock_threshold': current_app.config.get('LOW_STOCK_THRESHOLD', 10),
-                'demo_mode': current_app.config.get('DEMO_MODE', False)
+                'demo_mode': current_app.config.get('DEMO_MODE', False),
+                'lease': self.lease.status() if self.lease else None,
+                'thread_pool': scheduler_metrics('auto_stock_notifier')
             }
 
 def get_auto_notifier():
@@ -0,0 +1,46 @@
+# app/utils/csv_stream.py
+import csv
+import zlib
+from io import StringIO
+from flask import Response, current_app, request, stream_with_context
+
+CHUNK_SIZE = 64 * 1024  # Bytes of CSV per chunk sent to the client
+
+
+def csv_chunks(header, rows, chunk_size=CHUNK_SIZE):
+    """Encode `header` and the `rows` iterable as CSV, yielding ~chunk_size byte chunks"""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def csv_response(header, rows, filename):
+    """
+    Streaming CSV download: rows are written and sent chunk by chunk, so
+    memory stays flat however many rows `rows` yields (pass a query iterated
+    with yield_per). Gzipped when the client accepts it and EXPORT_GZIP is on.
+    """
+    chunks = csv_chunks(header, rows)
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+    if current_app.config.get('EXPORT_GZIP', True) and request.accept_encodings['gzip']:
+        chunks = _gzipped(chunks)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return Response(stream_with_context(chunks), mimetype="text/csv", headers=headers)
@@ -1,66 +1,34 @@
 # app/utils/email.py
 from flask import render_template, current_app
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import threading
+from app import db
+from .email_outbox import email_outbox
 
 def send_inventory_alert_email(recipients, subject, product, alert, current_stock, alert_level=None, is_test=False):
-    """Send inventory alert email using SMTP"""
+    """Queue inventory alert email; returns the outbox ids, one per recipient"""
     try:
-        # Get email configuration from app config
-        smtp_server = current_app.config.get('MAIL_SERVER', 'smtp.gmail.com')
-        smtp_port = current_app.config.get('MAIL_PORT', 587)
-        mail_username = current_app.config.get('MAIL_USERNAME', '')
-        mail_password = current_app.config.get('MAIL_PASSWORD', '')
-        mail_from = current_app.config.get('MAIL_DEFAULT_SENDER', 'inventory@example.com')
-        
         # Create email body
         html_body = render_inventory_alert_html(product=product, alert=alert, current_stock=current_stock, alert_level=alert_level, is_test=is_test)
         
-        # Create message
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = mail_from
-        
         # Handle recipients (can be string or list)
         if isinstance(recipients, str):
             recipients = [email.strip() for email in recipients.split(',')]
-        msg['To'] = ', '.join(recipients)
-        
-        # Attach HTML content
-        html_part = MIMEText(html_body, 'html')
-        msg.attach(html_part)
         
-        # Send email in background thread
-        thread = threading.Thread(
-            target=send_email_thread,
-            args=(smtp_server, smtp_port, mail_username, mail_password, mail_from, recipients, msg)
-        )
-        thread.start()
-        
-        return thread
+        # One outbox row per recipient; the email workers send them in the background
+        return email_outbox.enqueue_many([{
+            'email_type': 'inventory_alert',
+            'recipient_email': recipient,
+            'subject': subject,
+            'html_content': html_body,
+            'product_id': product.product_id,
+            'stock_amount': current_stock,
+            'interval_minutes': 0
+        } for recipient in recipients if recipient])
         
     except Exception as e:
+        db.session.rollback()
         current_app.logger.error(f"Failed to send inventory alert: {e}")
         return None
 
-def send_email_thread(smtp_server, smtp_port, username, password, mail_from, recipients, msg):
-    """Send email in a separate thread"""
-    try:
-        # Connect to SMTP server
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            if username and password:
-                server.login(username, password)
-            
-            # Send email
-            server.sendmail(mail_from, recipients, msg.as_string())
-            
-        print(f"✅ Email sent successfully to {recipients}")
-    except Exception as e:
-        print(f"❌ Failed to send email: {e}")
-
 def render_inventory_alert_html(product, alert, current_stock, alert_level=None, is_test=False):
     """Render HTML email template"""
     return f"""
@@ -0,0 +1,376 @@
+# app/utils/email_outbox.py
+import atexit
+import logging
+import random
+import smtplib
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from sqlalchemy import and_, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from app.extension import db
+from app.models.email_outbox import OutboundEmail
+from .email_sender import EmailSender
+from .smtp_pool import get_app_smtp_pool
+
+logger = logging.getLogger(__name__)
+
+# Columns a caller may set when queueing an email
+_EMAIL_FIELDS = (
+    'idempotency_key', 'email_type', 'recipient_email', 'recipient_name', 'subject',
+    'html_content', 'text_content', 'product_id', 'incubatee_id', 'stock_amount',
+    'threshold', 'interval_minutes'
+)
+
+
+class EmailOutbox:
+    """
+    Durable outbound email queue backed by the `email_outbox` table.
+
+    Callers insert rows and return immediately; a dispatcher job in every
+    worker claims due rows with SELECT ... FOR UPDATE SKIP LOCKED and hands
+    them to a bounded thread pool that sends over the pooled SMTP
+    connections. Failed sends are retried with exponential backoff, each
+    recipient gets at most EMAIL_RECIPIENT_RATE_LIMIT emails per window, and
+    an idempotency key makes queueing the same email twice a no-op.
+
+    EmailLog rows are written once per email (when it is sent or gives up),
+    in one bulk insert per dispatched batch.
+    """
+
+    JOB_ID = "email_outbox_dispatcher"
+    WAKE_JOB_ID = "email_outbox_wakeup"
+
+    def __init__(self):
+        self.app = None
+        self.scheduler = None
+        self.executor = None
+        self._drain_lock = threading.Lock()
+        self._rerun = False
+        self.stats = {"queued": 0, "duplicates": 0, "sent": 0, "retried": 0, "failed": 0, "rate_limited": 0}
+
+    def init_app(self, app, scheduler):
+        """Start this worker's dispatcher on the given APScheduler"""
+        self.app = app
+        self.scheduler = scheduler
+        self.executor = ThreadPoolExecutor(
+            max_workers=app.config.get('EMAIL_OUTBOX_WORKERS', 2),
+            thread_name_prefix='email-outbox'
+        )
+        atexit.register(self.executor.shutdown, wait=False)
+        if scheduler is None:
+            app.logger.warning("⚠️ No scheduler - queued emails will not be delivered by this worker")
+            return
+        # Polling picks up emails queued by other workers and retries that fall due
+        scheduler.add_job(
+            id=self.JOB_ID,
+            func=self.drain,
+            trigger=IntervalTrigger(seconds=app.config.get('EMAIL_OUTBOX_POLL_SECONDS', 15)),
+            next_run_time=datetime.now(timezone.utc),
+            max_instances=1,
+            replace_existing=True
+        )
+
+    # ---- Queueing ---------------------------------------------------------
+
+    def enqueue(self, to_email, subject, html_content, text_content=None, email_type='general',
+                recipient_name=None, product_id=None, incubatee_id=None, stock_amount=None,
+                threshold=None, interval_minutes=5, idempotency_key=None, commit=True):
+        """Queue one email; returns its outbox id (the existing one for a duplicate key)"""
+        return self.enqueue_many([{
+            'idempotency_key': idempotency_key,
+            'email_type': email_type,
+            'recipient_email': to_email,
+            'recipient_name': recipient_name,
+            'subject': subject,
+            'html_content': html_content,
+            'text_content': text_content,
+            'product_id': product_id,
+            'incubatee_id': incubatee_id,
+            'stock_amount': stock_amount,
+            'threshold': threshold,
+            'interval_minutes': interval_minutes
+        }], commit=commit)[0]
+
+    def enqueue_many(self, emails, commit=True):
+        """
+        Queue several emails with one INSERT. `emails` are dicts keyed like
+        the OutboundEmail columns (recipient_email, subject, html_content, ...).
+        Returns the outbox ids in input order. With commit=False the caller
+        commits and then calls wake().
+        """
+        now = datetime.utcnow()
+        rows = []
+        for email in emails:
+            row = {name: email.get(name) for name in _EMAIL_FIELDS}
+            row['idempotency_key'] = row['idempotency_key'] or uuid.uuid4().hex
+            row['email_type'] = row['email_type'] or 'general'
+            if row['interval_minutes'] is None:
+                row['interval_minutes'] = 5
+            row.update(status='pending', attempts=0, created_at=now, next_attempt_at=now)
+            rows.append(row)
+        if not rows:
+            return []
+
+        keys = [row['idempotency_key'] for row in rows]
+        ids = self._existing_ids(keys)
+        new_rows = {}
+        for row in rows:
+            if row['idempotency_key'] not in ids:
+                new_rows.setdefault(row['idempotency_key'], row)
+
+        if new_rows:
+            try:
+                with db.session.begin_nested():
+                    inserted = db.session.execute(
+                        insert(OutboundEmail).returning(OutboundEmail.idempotency_key, OutboundEmail.outbox_id),
+                        list(new_rows.values())
+                    ).all()
+                ids.update(inserted)
+                self.stats["queued"] += len(inserted)
+            except IntegrityError:
+                # Another request queued one of these keys first; queue the rest row by row
+                for key, row in new_rows.items():
+                    try:
+                        with db.session.begin_nested():
+                            ids[key] = db.session.execute(
+                                insert(OutboundEmail).returning(OutboundEmail.outbox_id), row
+                            ).scalar()
+                        self.stats["queued"] += 1
+                    except IntegrityError:
+                        ids.update(self._existing_ids([key]))
+        self.stats["duplicates"] += len(rows) - len(new_rows)
+
+        if commit:
+            db.session.commit()
+            self.wake()
+        return [ids.get(key) for key in keys]
+
+    @staticmethod
+    def _existing_ids(keys):
+        return dict(
+            db.session.query(OutboundEmail.idempotency_key, OutboundEmail.outbox_id)
+            .filter(OutboundEmail.idempotency_key.in_(keys))
+            .all()
+        )
+
+    def wake(self):
+        """Run this worker's dispatcher now instead of at the next poll"""
+        if self.scheduler is None:
+            return
+        if self._drain_lock.locked():
+            # The running dispatcher loops once more instead
+            self._rerun = True
+            return
+        try:
+            self.scheduler.add_job(
+                id=self.WAKE_JOB_ID,
+                func=self.drain,
+                trigger=DateTrigger(run_date=datetime.now(timezone.utc)),
+                replace_existing=True,
+                misfire_grace_time=None
+            )
+        except Exception as e:
+            logger.warning(f"Could not wake email dispatcher: {str(e)}")
+
+    # ---- Dispatching ------------------------------------------------------
+
+    def drain(self):
+        """Deliver due emails until none are left; concurrent calls fold into the running one"""
+        if self.app is None:
+            return
+        if not self._drain_lock.acquire(blocking=False):
+            self._rerun = True
+            return
+        try:
+            with self.app.app_context():
+                try:
+                    batch_size = self.app.config.get('EMAIL_OUTBOX_BATCH_SIZE', 20)
+                    while True:
+                        self._rerun = False
+                        claimed = self._dispatch_batch(batch_size)
+                        if claimed < batch_size and not self._rerun:
+                            break
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"❌ Email outbox dispatch failed: {str(e)}")
+        finally:
+            self._drain_lock.release()
+
+    def _dispatch_batch(self, limit):
+        payloads, claimed = self._claim(limit)
+        if not payloads:
+            return claimed
+
+        config = self.app.config
+        from_email = config.get('FROM_EMAIL', config.get('SMTP_USERNAME'))
+        configured = all([config.get('SMTP_USERNAME'), config.get('SMTP_PASSWORD'), from_email])
+        pool = get_app_smtp_pool(self.app) if configured else None
+
+        if pool is None:
+            results = [(payload, 'Email configuration missing', True) for payload in payloads]
+        else:
+            results = list(self.executor.map(lambda payload: self._deliver(pool, from_email, payload), payloads))
+        self._record(results)
+        return claimed
+
+    def _claim(self, limit):
+        """
+        Lock up to `limit` due emails (plus any left in 'sending' by a worker
+        that died) and mark them as sending. Emails whose recipient is over
+        the rate limit are pushed back instead. Returns plain dicts so the
+        send threads never touch the session.
+        """
+        config = self.app.config
+        now = datetime.utcnow()
+        stuck_before = now - timedelta(seconds=config.get('EMAIL_OUTBOX_LOCK_TIMEOUT_SECONDS', 600))
+        rows = db.session.execute(
+            select(OutboundEmail)
+            .where(or_(
+                and_(OutboundEmail.status == 'pending', OutboundEmail.next_attempt_at <= now),
+                and_(OutboundEmail.status == 'sending', OutboundEmail.locked_at <= stuck_before)
+            ))
+            .order_by(OutboundEmail.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .execution_options(populate_existing=True)
+        ).scalars().all()
+        if not rows:
+            db.session.commit()
+            return [], 0
+
+        budget, window_start = self._rate_budget({row.recipient_email for row in rows}, now)
+        window = timedelta(seconds=config.get('EMAIL_RECIPIENT_RATE_WINDOW_SECONDS', 3600))
+
+        payloads = []
+        for row in rows:
+            if budget is not None:
+                remaining, oldest = budget.get(row.recipient_email, (config.get('EMAIL_RECIPIENT_RATE_LIMIT'), None))
+                if remaining <= 0:
+                    # Retry once the oldest email in the window ages out
+                    row.status = 'pending'
+                    row.locked_at = None
+                    row.next_attempt_at = (oldest or window_start) + window
+                    self.stats["rate_limited"] += 1
+                    continue
+                budget[row.recipient_email] = (remaining - 1, oldest)
+
+            row.status = 'sending'
+            row.locked_at = now
+            payloads.append({
+                'outbox_id': row.outbox_id,
+                'attempts': row.attempts,
+                **{name: getattr(row, name) for name in _EMAIL_FIELDS}
+            })
+        db.session.commit()
+        return payloads, len(rows)
+
+    def _rate_budget(self, recipients, now):
+        """Emails each recipient may still receive in the current window, with the oldest send in it"""
+        limit = self.app.config.get('EMAIL_RECIPIENT_RATE_LIMIT')
+        window_start = now - timedelta(seconds=self.app.config.get('EMAIL_RECIPIENT_RATE_WINDOW_SECONDS', 3600))
+        if not limit:
+            return None, window_start
+        recent = db.session.query(
+            OutboundEmail.recipient_email,
+            func.count(OutboundEmail.outbox_id),
+            func.min(OutboundEmail.sent_at)
+        ).filter(
+            OutboundEmail.recipient_email.in_(recipients),
+            OutboundEmail.status == 'sent',
+            OutboundEmail.sent_at >= window_start
+        ).group_by(OutboundEmail.recipient_email).all()
+        return {email: (limit - count, oldest) for email, count, oldest in recent}, window_start
+
+    @staticmethod
+    def _deliver(pool, from_email, payload):
+        """Send one email; returns (payload, error, permanent)"""
+        try:
+            msg = EmailSender.build_message(
+                payload['recipient_email'], payload['subject'],
+                payload['html_content'], payload['text_content'], from_email
+            )
+            pool.send_message(msg)
+            logger.info(f"✅ Email sent successfully to {payload['recipient_email']}")
+            return payload, None, False
+        except smtplib.SMTPRecipientsRefused as e:
+            return payload, str(e), True
+        except smtplib.SMTPResponseException as e:
+            # 5xx replies will not succeed on a retry
+            return payload, str(e), 500 <= e.smtp_code < 600
+        except Exception as e:
+            return payload, str(e), False
+
+    def _record(self, results):
+        """Write the outcome of a batch: one bulk UPDATE of the outbox and one bulk INSERT of EmailLog rows"""
+        config = self.app.config
+        max_attempts = config.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 6)
+        now = datetime.utcnow()
+        updates = []
+        logs = []
+        for payload, error, permanent in results:
+            attempts = payload['attempts'] + 1
+            change = {'outbox_id': payload['outbox_id'], 'attempts': attempts, 'locked_at': None, 'last_error': error}
+            if error is None:
+                change.update(status='sent', sent_at=now)
+                logs.append(self._log_row(payload, 'sent', None, now))
+                self.stats["sent"] += 1
+            elif permanent or attempts >= max_attempts:
+                change.update(status='failed')
+                logs.append(self._log_row(payload, 'failed', error, now))
+                self.stats["failed"] += 1
+                logger.error(f"❌ Giving up on email to {payload['recipient_email']} after {attempts} attempts: {error}")
+            else:
+                change.update(status='pending', next_attempt_at=now + self._backoff(attempts))
+                self.stats["retried"] += 1
+                logger.warning(f"⚠️ Email to {payload['recipient_email']} failed (attempt {attempts}), will retry: {error}")
+            updates.append(change)
+
+        db.session.execute(update(OutboundEmail), updates)
+        EmailSender.log_emails(logs, commit=False)
+        db.session.commit()
+
+    def _backoff(self, attempts):
+        """Exponential backoff with jitter: base * 2^(attempts-1), capped"""
+        base = self.app.config.get('EMAIL_OUTBOX_BACKOFF_BASE_SECONDS', 30)
+        cap = self.app.config.get('EMAIL_OUTBOX_BACKOFF_MAX_SECONDS', 3600)
+        delay = min(base * 2 ** (attempts - 1), cap)
+        return timedelta(seconds=random.uniform(delay / 2, delay))
+
+    @staticmethod
+    def _log_row(payload, status, error, now):
+        return EmailSender.log_row(
+            payload['email_type'], payload['recipient_email'], payload['recipient_name'], payload['subject'],
+            product_id=payload['product_id'],
+            incubatee_id=payload['incubatee_id'],
+            stock_amount=payload['stock_amount'],
+            threshold=payload['threshold'],
+            status=status,
+            error_message=error,
+            interval_minutes=payload['interval_minutes'],
+            sent_at=now
+        )
+
+    def status(self):
+        """Outbox depth by status plus this worker's counters"""
+        counts = dict(
+            db.session.query(OutboundEmail.status, func.count(OutboundEmail.outbox_id))
+            .group_by(OutboundEmail.status)
+            .all()
+        )
+        next_attempt = db.session.query(func.min(OutboundEmail.next_attempt_at)).filter(
+            OutboundEmail.status == 'pending'
+        ).scalar()
+        return {
+            'counts': counts,
+            'next_attempt_at': next_attempt.isoformat() if next_attempt else None,
+            'workers': self.app.config.get('EMAIL_OUTBOX_WORKERS', 2) if self.app else 0,
+            'dispatcher_running': bool(self.scheduler and self.scheduler.get_job(self.JOB_ID)),
+            'stats': dict(self.stats)
+        }
+
+
+email_outbox = EmailOutbox()
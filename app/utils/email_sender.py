@@ -1,19 +1,45 @@
 # File: app/utils/email_sender.py
 import logging
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import List, Dict, Any
 from datetime import datetime, timedelta
 from flask import current_app
+from sqlalchemy import func, insert, tuple_
 from app import db
 from app.models.email_log import EmailLog
+from app.utils.email_stats import EmailStats
+from app.utils.smtp_pool import get_app_smtp_pool
 
 logger = logging.getLogger(__name__)
 
 class EmailSender:
     """Send email notifications with logging"""
     
+    @staticmethod
+    def log_row(email_type: str, recipient_email: str, recipient_name: str,
+                subject: str, product_id: int = None, incubatee_id: int = None,
+                stock_amount: int = None, threshold: int = None,
+                status: str = 'sent', error_message: str = None,
+                interval_minutes: int = 5, sent_at: datetime = None) -> Dict[str, Any]:
+        """Column values for one EmailLog row"""
+        sent_at = sent_at or datetime.utcnow()
+        return {
+            'email_type': email_type,
+            'recipient_email': recipient_email,
+            'recipient_name': recipient_name,
+            'subject': subject,
+            'product_id': product_id,
+            'incubatee_id': incubatee_id,
+            'stock_amount': stock_amount,
+            'threshold': threshold,
+            'status': status,
+            'error_message': error_message,
+            'sent_at': sent_at,
+            'interval_minutes': interval_minutes,
+            'next_scheduled': sent_at + timedelta(minutes=interval_minutes or 0) if status == 'sent' else None
+        }
+    
     @classmethod
     def log_email(cls, email_type: str, recipient_email: str, recipient_name: str, 
                   subject: str, product_id: int = None, incubatee_id: int = None,
@@ -22,21 +48,19 @@ class EmailSender:
                   interval_minutes: int = 5) -> EmailLog:
         """Log email sending attempt"""
         try:
-            log = EmailLog(
-                email_type=email_type,
-                recipient_email=recipient_email,
-                recipient_name=recipient_name,
-                subject=subject,
+            row = cls.log_row(
+                email_type, recipient_email, recipient_name, subject,
                 product_id=product_id,
                 incubatee_id=incubatee_id,
                 stock_amount=stock_amount,
                 threshold=threshold,
                 status=status,
                 error_message=error_message,
-                interval_minutes=interval_minutes,
-                next_scheduled=datetime.utcnow() + timedelta(minutes=interval_minutes) if status == 'sent' else None
+                interval_minutes=interval_minutes
             )
+            log = EmailLog(**row)
             db.session.add(log)
+            EmailStats.record([row])
             db.session.commit()
             return log
         except Exception as e:
@@ -44,23 +68,47 @@ class EmailSender:
             logger.error(f"Failed to log email: {str(e)}")
             return None
     
+    @classmethod
+    def log_emails(cls, rows: List[Dict[str, Any]], commit: bool = True) -> int:
+        """Write many log_row() dicts with a single INSERT"""
+        if not rows:
+            return 0
+        db.session.execute(insert(EmailLog), rows)
+        EmailStats.record(rows)
+        if commit:
+            db.session.commit()
+        return len(rows)
+    
+    @classmethod
+    def last_sent_times(cls, pairs) -> Dict[tuple, datetime]:
+        """
+        Last successful send for each (incubatee_id, product_id) pair, fetched
+        with one grouped query on the (incubatee_id, product_id, sent_at) index
+        """
+        pairs = {(incubatee_id, product_id) for incubatee_id, product_id in pairs if incubatee_id and product_id}
+        if not pairs:
+            return {}
+        rows = db.session.query(
+            EmailLog.incubatee_id,
+            EmailLog.product_id,
+            func.max(EmailLog.sent_at)
+        ).filter(
+            tuple_(EmailLog.incubatee_id, EmailLog.product_id).in_(pairs),
+            EmailLog.status == 'sent'
+        ).group_by(EmailLog.incubatee_id, EmailLog.product_id).all()
+        return {(incubatee_id, product_id): sent_at for incubatee_id, product_id, sent_at in rows}
+    
     @classmethod
     def should_send_email(cls, incubatee_id: int, product_id: int, interval_minutes: int = 5) -> bool:
         """Check if we should send email based on interval"""
         try:
-            # Check last sent email for this incubatee and product
-            last_email = EmailLog.query.filter_by(
-                incubatee_id=incubatee_id,
-                product_id=product_id,
-                status='sent'
-            ).order_by(EmailLog.sent_at.desc()).first()
+            last_sent = cls.last_sent_times([(incubatee_id, product_id)]).get((incubatee_id, product_id))
             
-            if not last_email:
+            if not last_sent:
                 return True  # No previous email, send it
             
             # Check if enough time has passed
-            time_since = datetime.utcnow() - last_email.sent_at
-            minutes_since = time_since.total_seconds() / 60
+            minutes_since = (datetime.utcnow() - last_sent).total_seconds() / 60
             
             return minutes_since >= interval_minutes
             
@@ -68,6 +116,83 @@ class EmailSender:
             logger.error(f"Error checking email interval: {str(e)}")
             return True  # Default to sending if error
     
+    @staticmethod
+    def build_message(to_email: str, subject: str, html_content: str,
+                      text_content: str = None, from_email: str = None) -> MIMEMultipart:
+        """Build the multipart message sent for an email"""
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = subject
+        msg['From'] = from_email
+        msg['To'] = to_email
+        
+        # Attach both HTML and plain text versions
+        if text_content:
+            part1 = MIMEText(text_content, 'plain')
+            msg.attach(part1)
+        
+        part2 = MIMEText(html_content, 'html')
+        msg.attach(part2)
+        return msg
+    
+    @classmethod
+    def queue_email(cls, to_email: str, subject: str, html_content: str,
+                    text_content: str = None, email_type: str = 'general',
+                    recipient_name: str = None, product_id: int = None,
+                    incubatee_id: int = None, stock_amount: int = None,
+                    threshold: int = None, interval_minutes: int = 5,
+                    idempotency_key: str = None, commit: bool = True) -> bool:
+        """
+        Queue an email in the outbox and return without waiting for SMTP.
+        Same arguments as send_email; queueing the same idempotency_key
+        twice sends one email.
+        """
+        from .email_outbox import email_outbox
+        
+        # Check if we should send based on interval
+        if product_id and incubatee_id:
+            if not cls.should_send_email(incubatee_id, product_id, interval_minutes):
+                logger.info(f"Skipping email to {to_email} - within interval period")
+                cls.log_email(
+                    email_type=email_type,
+                    recipient_email=to_email,
+                    recipient_name=recipient_name,
+                    subject=subject,
+                    product_id=product_id,
+                    incubatee_id=incubatee_id,
+                    stock_amount=stock_amount,
+                    threshold=threshold,
+                    status='skipped',
+                    error_message='Within interval period',
+                    interval_minutes=interval_minutes
+                )
+                return False
+        
+        try:
+            email_outbox.enqueue(
+                to_email, subject, html_content, text_content,
+                email_type=email_type,
+                recipient_name=recipient_name,
+                product_id=product_id,
+                incubatee_id=incubatee_id,
+                stock_amount=stock_amount,
+                threshold=threshold,
+                interval_minutes=interval_minutes,
+                idempotency_key=idempotency_key,
+                commit=commit
+            )
+            logger.info(f"📥 Email to {to_email} queued")
+            return True
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"❌ Failed to queue email to {to_email}: {str(e)}")
+            return False
+    
+    @staticmethod
+    def cooldown_key(email_type: str, incubatee_id: int, product_id: int, interval_minutes: int) -> str:
+        """Idempotency key shared by every email for one product (or an incubatee's digest) within one interval"""
+        bucket = int(datetime.utcnow().timestamp() // (max(interval_minutes, 1) * 60))
+        return f"{email_type}:{incubatee_id}:{product_id}:{bucket}"
+    
     @classmethod
     def send_email(cls, to_email: str, subject: str, html_content: str, 
                    text_content: str = None, email_type: str = 'general',
@@ -98,8 +223,6 @@ class EmailSender:
         
         try:
             # Get email configuration from app config
-            smtp_host = current_app.config.get('SMTP_HOST', 'smtp.gmail.com')
-            smtp_port = current_app.config.get('SMTP_PORT', 587)
             smtp_username = current_app.config.get('SMTP_USERNAME')
             smtp_password = current_app.config.get('SMTP_PASSWORD')
             from_email = current_app.config.get('FROM_EMAIL', smtp_username)
@@ -122,25 +245,10 @@ class EmailSender:
                 )
                 return False
             
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = from_email
-            msg['To'] = to_email
-            
-            # Attach both HTML and plain text versions
-            if text_content:
-                part1 = MIMEText(text_content, 'plain')
-                msg.attach(part1)
-            
-            part2 = MIMEText(html_content, 'html')
-            msg.attach(part2)
+            msg = cls.build_message(to_email, subject, html_content, text_content, from_email)
             
-            # Send email
-            with smtplib.SMTP(smtp_host, smtp_port) as server:
-                server.starttls()
-                server.login(smtp_username, smtp_password)
-                server.send_message(msg)
+            # Send email over a pooled, already authenticated connection
+            get_app_smtp_pool(current_app).send_message(msg)
             
             logger.info(f"✅ Email sent successfully to {to_email}")
             
@@ -180,7 +288,7 @@ class EmailSender:
     
     @classmethod
     def send_low_stock_notification(cls, product_data: Dict[str, Any]) -> bool:
-        """Send low stock notification to incubatee"""
+        """Queue low stock notification to incubatee"""
         from .email_templates import EmailTemplates
         
         if not product_data.get('email'):
@@ -188,8 +296,9 @@ class EmailSender:
             return False
         
         subject, html_content, text_content = EmailTemplates.low_stock_notification(product_data)
+        interval_minutes = current_app.config.get('EMAIL_INTERVAL_MINUTES', 5)
         
-        return cls.send_email(
+        return cls.queue_email(
             to_email=product_data['email'],
             subject=subject,
             html_content=html_content,
@@ -200,12 +309,122 @@ class EmailSender:
             incubatee_id=product_data.get('incubatee_id'),
             stock_amount=product_data.get('current_stock'),
             threshold=product_data.get('threshold', 10),
-            interval_minutes=current_app.config.get('EMAIL_INTERVAL_MINUTES', 5)
+            interval_minutes=interval_minutes,
+            idempotency_key=cls.cooldown_key(
+                'low_stock', product_data.get('incubatee_id'), product_data.get('product_id'), interval_minutes
+            )
         )
     
+    @classmethod
+    def last_digest_times(cls, incubatee_ids) -> Dict[int, datetime]:
+        """Last successful low stock email (single or digest) per incubatee, in one grouped query"""
+        incubatee_ids = {incubatee_id for incubatee_id in incubatee_ids if incubatee_id}
+        if not incubatee_ids:
+            return {}
+        rows = db.session.query(
+            EmailLog.incubatee_id,
+            func.max(EmailLog.sent_at)
+        ).filter(
+            EmailLog.incubatee_id.in_(incubatee_ids),
+            EmailLog.email_type == 'low_stock',
+            EmailLog.status == 'sent'
+        ).group_by(EmailLog.incubatee_id).all()
+        return dict(rows)
+    
+    @classmethod
+    def queue_low_stock_notifications(cls, products: List[Dict[str, Any]], limit: int = None,
+                                      log_skipped: bool = True) -> Dict[str, Any]:
+        """
+        Queue one low stock digest per incubatee for a whole sweep: one
+        cooldown query, one INSERT for the skipped log rows, one INSERT into
+        the outbox and one commit. An incubatee who got a low stock email
+        within EMAIL_INTERVAL_MINUTES is skipped. At most `limit` emails are
+        queued. Products should come from StockMonitor.low_stock_sweep so the
+        templates do not query sold quantities again.
+        Returns the products split into queued / skipped / no_email / failed,
+        plus the number of emails queued.
+        """
+        from .email_templates import EmailTemplates
+        from .email_outbox import email_outbox
+        
+        interval_minutes = current_app.config.get('EMAIL_INTERVAL_MINUTES', 5)
+        cutoff = datetime.utcnow() - timedelta(minutes=interval_minutes)
+        result = {'queued': [], 'skipped': [], 'no_email': [], 'failed': [], 'emails': 0}
+        
+        by_incubatee = {}
+        for product in products:
+            if not product.get('email'):
+                logger.warning(f"No email found for incubatee {product.get('incubatee_name')}")
+                result['no_email'].append(product)
+                continue
+            by_incubatee.setdefault(product.get('incubatee_id'), []).append(product)
+        
+        try:
+            last_sent = cls.last_digest_times(by_incubatee)
+        except Exception as e:
+            logger.error(f"Error checking email interval: {str(e)}")
+            last_sent = {}  # Default to sending if error
+        
+        emails = []
+        skipped_logs = []
+        for incubatee_id, incubatee_products in by_incubatee.items():
+            first = incubatee_products[0]
+            single = incubatee_products[0] if len(incubatee_products) == 1 else {}
+            last = last_sent.get(incubatee_id)
+            if last and last > cutoff:
+                result['skipped'].extend(incubatee_products)
+                if log_skipped:
+                    skipped_logs.append(cls.log_row(
+                        'low_stock', first['email'], first['incubatee_name'],
+                        f"Low stock digest ({len(incubatee_products)} products)",
+                        product_id=single.get('product_id'),
+                        incubatee_id=incubatee_id,
+                        stock_amount=single.get('current_stock'),
+                        threshold=first.get('threshold', 10),
+                        status='skipped',
+                        error_message='Within interval period',
+                        interval_minutes=interval_minutes
+                    ))
+                continue
+            
+            if limit is not None and len(emails) >= limit:
+                continue
+            
+            subject, html_content, text_content = EmailTemplates.low_stock_digest(incubatee_products)
+            emails.append({
+                'idempotency_key': cls.cooldown_key('low_stock', incubatee_id, 'digest', interval_minutes),
+                'email_type': 'low_stock',
+                'recipient_email': first['email'],
+                'recipient_name': first['incubatee_name'],
+                'subject': subject,
+                'html_content': html_content,
+                'text_content': text_content,
+                'product_id': single.get('product_id'),
+                'incubatee_id': incubatee_id,
+                'stock_amount': single.get('current_stock'),
+                'threshold': first.get('threshold', 10),
+                'interval_minutes': interval_minutes
+            })
+            result['queued'].extend(incubatee_products)
+        
+        try:
+            cls.log_emails(skipped_logs, commit=False)
+            if emails:
+                email_outbox.enqueue_many(emails, commit=False)
+            db.session.commit()
+            if emails:
+                email_outbox.wake()
+            result['emails'] = len(emails)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"❌ Failed to queue low stock notifications: {str(e)}")
+            result['failed'], result['queued'] = result['queued'], []
+        
+        return result
+    
     @classmethod
     def send_admin_notification(cls, products_data: List[Dict[str, Any]]) -> bool:
-        """Send notification to admin about multiple low stock products"""
+        """Queue notification to admin about multiple low stock products"""
         from .email_templates import EmailTemplates
         
         admin_email = current_app.config.get('ADMIN_EMAIL')
@@ -215,7 +434,7 @@ class EmailSender:
         
         subject, html_content, text_content = EmailTemplates.bulk_low_stock_notification(products_data)
         
-        return cls.send_email(
+        return cls.queue_email(
             to_email=admin_email,
             subject=subject,
             html_content=html_content,
@@ -226,45 +445,11 @@ class EmailSender:
         )
     
     @classmethod
-    def get_email_stats(cls, hours: int = 24) -> Dict[str, Any]:
-        """Get email statistics for the last N hours"""
+    def get_email_stats(cls, hours: int = 24, bucket: str = None) -> Dict[str, Any]:
+        """Get email statistics for the last N hours (bucket='hour' adds an hourly series)"""
         try:
-            since = datetime.utcnow() - timedelta(hours=hours)
-            
-            # Total emails
-            total_emails = EmailLog.query.filter(EmailLog.sent_at >= since).count()
-            
-            # By status
-            sent_emails = EmailLog.query.filter(
-                EmailLog.sent_at >= since,
-                EmailLog.status == 'sent'
-            ).count()
-            
-            failed_emails = EmailLog.query.filter(
-                EmailLog.sent_at >= since,
-                EmailLog.status == 'failed'
-            ).count()
-            
-            skipped_emails = EmailLog.query.filter(
-                EmailLog.sent_at >= since,
-                EmailLog.status == 'skipped'
-            ).count()
-            
-            # By type
-            low_stock_emails = EmailLog.query.filter(
-                EmailLog.sent_at >= since,
-                EmailLog.email_type == 'low_stock'
-            ).count()
-            
-            return {
-                'total': total_emails,
-                'sent': sent_emails,
-                'failed': failed_emails,
-                'skipped': skipped_emails,
-                'low_stock_emails': low_stock_emails,
-                'period_hours': hours
-            }
+            return EmailStats.summary(hours, bucket)
             
         except Exception as e:
             logger.error(f"Error getting email stats: {str(e)}")
-            return {'error': str(e)}
\ No newline at end of file
+            return {'error': str(e)}
@@ -0,0 +1,148 @@
+# app/utils/email_stats.py
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable
+import click
+from sqlalchemy import func
+from app.extension import db
+from app.models.email_log import EmailLog, EmailLogCounter
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ('sent', 'failed', 'skipped')
+
+
+def _hour(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+class EmailStats:
+    """
+    Email statistics from the hourly `email_log_counters` table.
+
+    EmailSender bumps the counters in the same transaction that inserts the
+    log rows, so a window costs one grouped query over its hour buckets plus
+    one over the raw logs of the partial first hour, whatever the log volume.
+    """
+
+    @staticmethod
+    def record(rows: Iterable[Dict[str, Any]]):
+        """Add log_row() dicts to their hourly counters with one upsert; the caller commits"""
+        counts = Counter(
+            (_hour(row.get('sent_at') or datetime.utcnow()), row['status'], row['email_type'])
+            for row in rows
+        )
+        if counts:
+            EmailStats._upsert(counts)
+
+    @staticmethod
+    def _upsert(counts: Counter):
+        # Sorted so concurrent upserts lock counter rows in the same order
+        values = [
+            {'bucket_start': bucket, 'status': status, 'email_type': email_type, 'email_count': count}
+            for (bucket, status, email_type), count in sorted(counts.items())
+        ]
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        elif dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        else:
+            for value in values:
+                counter = db.session.get(EmailLogCounter, (value['bucket_start'], value['status'], value['email_type']))
+                if counter:
+                    counter.email_count += value['email_count']
+                else:
+                    db.session.add(EmailLogCounter(**value))
+            return
+
+        statement = upsert(EmailLogCounter).values(values)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=['bucket_start', 'status', 'email_type'],
+            set_={'email_count': EmailLogCounter.email_count + statement.excluded.email_count}
+        ))
+
+    @staticmethod
+    def summary(hours: int = 24, bucket: str = None) -> Dict[str, Any]:
+        """
+        Totals per status and per type for the last `hours` hours.
+        With bucket='hour' the result also has an hourly series for charts.
+        """
+        now = datetime.utcnow()
+        since = now - timedelta(hours=hours)
+        first_full_hour = _hour(since) + timedelta(hours=1) if since != _hour(since) else since
+
+        # Whole hours come from the counters, the partial first hour from the raw logs
+        counted = db.session.query(
+            EmailLogCounter.bucket_start,
+            EmailLogCounter.status,
+            EmailLogCounter.email_type,
+            EmailLogCounter.email_count
+        ).filter(EmailLogCounter.bucket_start >= first_full_hour).all()
+
+        partial = db.session.query(
+            EmailLog.status,
+            EmailLog.email_type,
+            func.count(EmailLog.log_id)
+        ).filter(
+            EmailLog.sent_at >= since,
+            EmailLog.sent_at < first_full_hour
+        ).group_by(EmailLog.status, EmailLog.email_type).all()
+
+        by_status = Counter()
+        by_type = {}
+        series = {}
+        for bucket_start, status, email_type, count in counted:
+            by_status[status] += count
+            by_type.setdefault(email_type, Counter())[status] += count
+            series.setdefault(bucket_start, Counter())[status] += count
+        for status, email_type, count in partial:
+            by_status[status] += count
+            by_type.setdefault(email_type, Counter())[status] += count
+            series.setdefault(_hour(since), Counter())[status] += count
+
+        stats = {
+            'total': sum(by_status.values()),
+            **{status: by_status.get(status, 0) for status in STATUSES},
+            'low_stock_emails': sum(by_type.get('low_stock', Counter()).values()),
+            'by_type': {email_type: dict(counts) for email_type, counts in by_type.items()},
+            'period_hours': hours
+        }
+        if bucket == 'hour':
+            stats['buckets'] = [
+                {'bucket': bucket_start.isoformat(), 'total': sum(counts.values()),
+                 **{status: counts.get(status, 0) for status in STATUSES}}
+                for bucket_start, counts in sorted(series.items())
+            ]
+        return stats
+
+    @staticmethod
+    def rebuild(since: datetime = None) -> int:
+        """Recount the hourly counters from email_logs (from `since`, or everything)"""
+        start = _hour(since) if since else None
+        counters = db.session.query(EmailLogCounter)
+        logs = db.session.query(EmailLog.sent_at, EmailLog.status, EmailLog.email_type)
+        if start:
+            counters = counters.filter(EmailLogCounter.bucket_start >= start)
+            logs = logs.filter(EmailLog.sent_at >= start)
+        counters.delete(synchronize_session=False)
+
+        counts = Counter(
+            (_hour(sent_at), status, email_type)
+            for sent_at, status, email_type in logs.yield_per(5000)
+        )
+        if counts:
+            EmailStats._upsert(counts)
+        db.session.commit()
+        return sum(counts.values())
+
+
+def init_app(app):
+    @app.cli.command('rebuild-email-stats')
+    @click.option('--days', type=int, default=None, help='Only recount the last N days')
+    def rebuild_email_stats(days):
+        """Recount email_log_counters from email_logs (run once after deploying the table)"""
+        since = datetime.utcnow() - timedelta(days=days) if days else None
+        counted = EmailStats.rebuild(since)
+        print(f"✅ Recounted {counted} email log rows into hourly counters")
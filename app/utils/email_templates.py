@@ -63,6 +63,11 @@ class EmailTemplates:
                 'trend': 'unknown'
             }
     
+    @staticmethod
+    def sold_info_for(product_data: Dict[str, Any]) -> dict:
+        """Sold quantities already loaded by StockMonitor.low_stock_sweep, else queried"""
+        return product_data.get('sold_info') or EmailTemplates.get_sold_quantities(product_data['product_id'])
+    
     @staticmethod
     def low_stock_notification(product_data: Dict[str, Any]) -> tuple:
         """
@@ -70,7 +75,7 @@ class EmailTemplates:
         Returns (subject, html_content, text_content)
         """
         # Get sold quantities
-        sold_info = EmailTemplates.get_sold_quantities(product_data['product_id'])
+        sold_info = EmailTemplates.sold_info_for(product_data)
         
         # Calculate effective available stock (current stock minus pending sold)
         current_stock = product_data.get('current_stock', 0)
@@ -286,7 +291,7 @@ class EmailTemplates:
         # Get sold quantities for all products
         products_with_sales = []
         for product in products_data:
-            sold_info = EmailTemplates.get_sold_quantities(product['product_id'])
+            sold_info = EmailTemplates.sold_info_for(product)
             product['sold_info'] = sold_info
             # Calculate effective stock
             product['effective_stock'] = max(0, product['current_stock'] - sold_info['pending_sold'])
@@ -436,4 +441,131 @@ Please check the web interface for detailed product information.
 Report generated: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')}
 """
         
-        return subject, html_content, text_content
\ No newline at end of file
+        return subject, html_content, text_content
+    
+    @staticmethod
+    def low_stock_digest(products_data: List[Dict[str, Any]]) -> tuple:
+        """
+        One low stock email for all of an incubatee's low stock products.
+        A single product gets the regular low_stock_notification.
+        Returns (subject, html_content, text_content)
+        """
+        if len(products_data) == 1:
+            return EmailTemplates.low_stock_notification(products_data[0])
+        
+        rows = []
+        for product in products_data:
+            sold_info = EmailTemplates.sold_info_for(product)
+            effective_stock = max(0, product.get('current_stock', 0) - sold_info['pending_sold'])
+            rows.append((product, sold_info, effective_stock))
+        rows.sort(key=lambda row: row[2])
+        
+        incubatee_name = products_data[0]['incubatee_name']
+        critical_count = sum(1 for _, _, effective_stock in rows if effective_stock <= 3)
+        subject = f"⚠️ Low Stock Alert: {len(rows)} of your products need restocking"
+        
+        html_rows = ""
+        text_rows = ""
+        for product, sold_info, effective_stock in rows:
+            status_color = '#dc3545' if effective_stock <= 3 else '#ff9800'
+            status_icon = '🔥' if effective_stock <= 3 else '⚠️'
+            html_rows += f"""
+                        <tr>
+                            <td style="padding: 8px; border-bottom: 1px solid #dee2e6;"><strong>{product['product_name']}</strong></td>
+                            <td style="padding: 8px; text-align: center; border-bottom: 1px solid #dee2e6;">{product['stock_no']}</td>
+                            <td style="padding: 8px; text-align: center; border-bottom: 1px solid #dee2e6;">{product['current_stock']}</td>
+                            <td style="padding: 8px; text-align: center; border-bottom: 1px solid #dee2e6; color: #28a745;">{sold_info['pending_sold']}</td>
+                            <td style="padding: 8px; text-align: center; border-bottom: 1px solid #dee2e6; color: {status_color};">{status_icon} {effective_stock}</td>
+                            <td style="padding: 8px; text-align: center; border-bottom: 1px solid #dee2e6;">{sold_info['last_7_days']}</td>
+                        </tr>
+            """
+            text_rows += f"""
+        - {product['product_name']} (Stock No: {product['stock_no']}): {product['current_stock']} in stock, {sold_info['pending_sold']} pending, {effective_stock} available, {sold_info['last_7_days']} sold in the last 7 days"""
+        
+        html_content = f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="utf-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1.0">
+            <title>Low Stock Alert</title>
+            <style>
+                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+                .header {{ background-color: #ff9800; color: white; padding: 20px; text-align: center; }}
+                .content {{ padding: 30px; background-color: #f9f9f9; }}
+                .alert-box {{ background-color: #fff3cd; border: 1px solid #ffeaa7; padding: 15px; margin: 20px 0; border-radius: 5px; }}
+                .critical {{ background-color: #f8d7da; border-color: #f5c6cb; color: #721c24; }}
+                .footer {{ text-align: center; padding: 20px; color: #666; font-size: 12px; }}
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <div class="header">
+                    <h1>⚠️ Low Stock Alert</h1>
+                    <p>ATBI Incubator Management System</p>
+                </div>
+                
+                <div class="content">
+                    <p>Dear {incubatee_name},</p>
+                    
+                    <div class="alert-box {'critical' if critical_count else ''}">
+                        <h3>📊 {len(rows)} of your products are running low on stock!</h3>
+                        <p><strong>Critical:</strong> {critical_count} | <strong>Low:</strong> {len(rows) - critical_count}</p>
+                        <p>Please arrange to restock as soon as possible to avoid sales interruption.</p>
+                    </div>
+                    
+                    <table style="width:100%; border-collapse: collapse; margin: 10px 0; font-size: 13px;">
+                        <thead>
+                            <tr style="background-color: #e9ecef;">
+                                <th style="padding: 8px; text-align: left; border-bottom: 2px solid #dee2e6;">Product</th>
+                                <th style="padding: 8px; text-align: center; border-bottom: 2px solid #dee2e6;">Stock No</th>
+                                <th style="padding: 8px; text-align: center; border-bottom: 2px solid #dee2e6;">Physical</th>
+                                <th style="padding: 8px; text-align: center; border-bottom: 2px solid #dee2e6;">Pending</th>
+                                <th style="padding: 8px; text-align: center; border-bottom: 2px solid #dee2e6;">Available</th>
+                                <th style="padding: 8px; text-align: center; border-bottom: 2px solid #dee2e6;">Sold (7d)</th>
+                            </tr>
+                        </thead>
+                        <tbody>
+                            {html_rows}
+                        </tbody>
+                    </table>
+                    
+                    <p><strong>Note:</strong> "Pending" refers to units reserved by customers but not yet picked up. 
+                    These will be deducted from your stock upon pickup.</p>
+                    
+                    <p>Best regards,<br>
+                    <strong>ATBI Incubator Management System</strong></p>
+                </div>
+                
+                <div class="footer">
+                    <p>This is an automated notification from ATBI Incubator Management System.</p>
+                    <p>Notification generated: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')}</p>
+                    <p>Please do not reply to this email.</p>
+                </div>
+            </div>
+        </body>
+        </html>
+        """
+        
+        text_content = f"""
+        LOW STOCK ALERT - ATBI Incubator Management System
+        ===================================================
+        
+        Dear {incubatee_name},
+        
+        {len(rows)} of your products are running low on stock ({critical_count} critical):
+        {text_rows}
+        
+        "Pending" units are reserved by customers and will be deducted from your
+        stock once picked up. Please arrange to restock as soon as possible.
+        
+        Best regards,
+        ATBI Incubator Management System
+        
+        This is an automated notification.
+        Generated: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')}
+        Please do not reply to this email.
+        """
+        
+        return subject, html_content, text_content
@@ -0,0 +1,262 @@
+# app/utils/scheduler_lease.py
+import atexit
+import logging
+import os
+import socket
+import threading
+import zlib
+from datetime import datetime
+import redis
+from flask import current_app
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+from app.cache import get_redis_client
+from app.extension import db
+
+logger = logging.getLogger(__name__)
+
+# Identifies this gunicorn worker in lease records and status routes
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# classid half of the two-int PostgreSQL advisory lock key
+ADVISORY_LOCK_NAMESPACE = 7331
+
+# Renew the lease only if we still own it, otherwise leave it alone
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class SchedulerLease:
+    """
+    Leader lease for a background job so that only one worker runs it per tick.
+
+    Every worker starts the same APScheduler jobs; each job asks its lease
+    before doing any work. The first worker to take the lease becomes leader
+    and renews it on every tick. If the leader dies its lease expires and the
+    next worker to tick takes over.
+
+    Backends:
+      redis    - SET lease:<name> <worker> NX PX <ttl> on the cache's Redis
+      postgres - session advisory lock held on a dedicated connection;
+                 the lock is dropped by the server when the leader process dies
+      local    - any other database (SQLite in development): always leader
+
+    The backend comes from SCHEDULER_LEASE_BACKEND, or from the configuration
+    when that is unset (redis when redis_url is set, else postgres on
+    PostgreSQL, else local), and is fixed for the process so every worker
+    agrees on it. If it is unavailable the lease fails closed: nobody
+    runs the job until it is back, rather than a worker falling through to
+    another backend while the leader still holds this one.
+    """
+
+    BACKENDS = ('redis', 'postgres', 'local')
+
+    _pg_engine = None
+    _pg_lock = threading.Lock()
+    _backend = None  # Chosen once per process
+    _backend_lock = threading.Lock()
+
+    def __init__(self, name, ttl_seconds):
+        self.name = name
+        self.ttl_ms = int(ttl_seconds * 1000)
+        self.key = f"lease:{name}"
+        self.advisory_key = zlib.crc32(name.encode()) & 0x7fffffff
+        self.backend = None
+        self.acquired_at = None
+        self._redis = None
+        self._pg_conn = None
+
+    @classmethod
+    def _resolve_backend(cls):
+        with cls._backend_lock:
+            if cls._backend is None:
+                backend = current_app.config.get('SCHEDULER_LEASE_BACKEND')
+                if backend is None:
+                    if os.environ.get('redis_url'):
+                        backend = 'redis'
+                    elif db.engine.dialect.name == 'postgresql':
+                        backend = 'postgres'
+                    else:
+                        backend = 'local'
+                if backend not in cls.BACKENDS:
+                    raise ValueError(f"SCHEDULER_LEASE_BACKEND must be one of {cls.BACKENDS}, not {backend!r}")
+                cls._backend = backend
+                logger.info(f"🔐 Scheduler leases use the {backend} backend")
+            return cls._backend
+
+    # Redis backend
+
+    def _get_redis(self):
+        """The cache's Redis client, so leases and cache share one server"""
+        if self._redis is None:
+            self._redis = get_redis_client()
+        return self._redis
+
+    def _acquire_redis(self):
+        client = self._get_redis()
+        if client is None:
+            logger.warning(f"Lease {self.name}: no Redis client, not running the job")
+            return False
+        try:
+            if client.set(self.key, WORKER_ID, nx=True, px=self.ttl_ms):
+                return True
+            return bool(client.eval(_RENEW_SCRIPT, 1, self.key, WORKER_ID, self.ttl_ms))
+        except redis.RedisError as e:
+            logger.warning(f"Lease {self.name}: Redis unavailable, not running the job ({str(e)})")
+            return False
+
+    # PostgreSQL backend
+
+    @classmethod
+    def _get_pg_engine(cls):
+        """Separate, unpooled engine so the lock connection never takes a pool slot"""
+        with cls._pg_lock:
+            if cls._pg_engine is None:
+                engine_options = current_app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+                connect_args = dict(engine_options.get('connect_args', {}))
+                connect_args['application_name'] = f"lease:{WORKER_ID}"
+                cls._pg_engine = create_engine(db.engine.url, poolclass=NullPool, connect_args=connect_args)
+            return cls._pg_engine
+
+    def _acquire_postgres(self):
+        try:
+            if self._pg_conn is not None:
+                # Still leader as long as the lock connection is alive
+                self._pg_conn.execute(text("SELECT 1"))
+                return True
+
+            conn = self._get_pg_engine().connect()
+            got_lock = conn.execute(
+                text("SELECT pg_try_advisory_lock(:ns, :key)"),
+                {"ns": ADVISORY_LOCK_NAMESPACE, "key": self.advisory_key}
+            ).scalar()
+            conn.commit()
+            if got_lock:
+                self._pg_conn = conn
+                return True
+            conn.close()
+            return False
+        except Exception as e:
+            logger.warning(f"Lease {self.name}: advisory lock failed ({str(e)})")
+            self._close_pg_conn()
+            return False
+
+    def _close_pg_conn(self):
+        if self._pg_conn is not None:
+            try:
+                self._pg_conn.close()
+            except Exception:
+                pass
+            self._pg_conn = None
+
+    # Public API
+
+    def acquire(self):
+        """Take or renew the lease. Returns True if this worker should run the job."""
+        backend = self._resolve_backend()
+        if backend == 'redis':
+            result = self._acquire_redis()
+        elif backend == 'postgres':
+            result = self._acquire_postgres()
+        else:
+            result = True
+        self._mark(backend, result)
+        return result
+
+    def _mark(self, backend, is_leader):
+        if is_leader and (self.backend != backend or self.acquired_at is None):
+            self.acquired_at = datetime.utcnow()
+            logger.info(f"👑 {WORKER_ID} is now leader for '{self.name}' ({backend})")
+        elif not is_leader:
+            self.acquired_at = None
+        self.backend = backend
+        if backend != 'postgres':
+            self._close_pg_conn()
+
+    def release(self):
+        """Give up the lease so another worker can take over immediately"""
+        if self.backend == 'redis' and self._redis is not None:
+            try:
+                self._redis.eval(_RELEASE_SCRIPT, 1, self.key, WORKER_ID)
+            except redis.RedisError:
+                pass
+        self._close_pg_conn()
+        self.acquired_at = None
+
+    def holder(self):
+        """Worker currently holding the lease, if it can be determined"""
+        if self.backend in (None, 'redis') and self._get_redis() is not None:
+            try:
+                holder = self._redis.get(self.key)
+                return holder.decode() if isinstance(holder, bytes) else holder
+            except redis.RedisError:
+                return None
+        if self.backend == 'postgres':
+            try:
+                return db.session.execute(text(
+                    "SELECT a.application_name FROM pg_locks l "
+                    "JOIN pg_stat_activity a ON a.pid = l.pid "
+                    "WHERE l.locktype = 'advisory' AND l.granted "
+                    "AND l.classid = :ns AND l.objid = :key"
+                ), {"ns": ADVISORY_LOCK_NAMESPACE, "key": self.advisory_key}).scalar()
+            except Exception:
+                return None
+        if self.backend == 'local':
+            return WORKER_ID
+        return None
+
+    def status(self):
+        is_leader = self.acquired_at is not None
+        ttl_ms = None
+        if self.backend in (None, 'redis') and self._get_redis() is not None:
+            try:
+                ttl_ms = self._redis.pttl(self.key)
+            except redis.RedisError:
+                pass
+        return {
+            "name": self.name,
+            "backend": self.backend,
+            "holder": self.holder(),
+            "this_worker": WORKER_ID,
+            "is_leader": is_leader,
+            "leader_since": self.acquired_at.isoformat() if is_leader else None,
+            "lease_ttl_seconds": self.ttl_ms / 1000,
+            "lease_expires_in_ms": ttl_ms
+        }
+
+
+_leases = {}
+_leases_lock = threading.Lock()
+
+
+def get_lease(name, ttl_seconds):
+    """Get the process-wide lease for a job name"""
+    with _leases_lock:
+        lease = _leases.get(name)
+        if lease is None:
+            lease = _leases[name] = SchedulerLease(name, ttl_seconds)
+        return lease
+
+
+def interval_lease_ttl(interval_seconds):
+    """Lease TTL for a job ticking every interval_seconds: survives one missed tick"""
+    return interval_seconds * 2 + 5
+
+
+def release_all_leases():
+    for lease in list(_leases.values()):
+        lease.release()
+
+
+atexit.register(release_all_leases)
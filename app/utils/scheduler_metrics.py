@@ -0,0 +1,112 @@
+# app/utils/scheduler_metrics.py
+import threading
+import time
+from apscheduler.events import (
+    EVENT_JOB_SUBMITTED, EVENT_JOB_EXECUTED, EVENT_JOB_ERROR,
+    EVENT_JOB_MISSED, EVENT_JOB_MAX_INSTANCES
+)
+
+# APScheduler's default ThreadPoolExecutor size
+DEFAULT_POOL_SIZE = 10
+
+
+class SchedulerMetrics:
+    """
+    Thread-pool utilization for one APScheduler scheduler, built from its
+    job events: how many job threads are busy now and at peak, how many
+    runs are waiting for a thread, and what share of the pool's thread-time
+    has been spent running jobs. A job that blocks shows up as a busy
+    thread that never frees up.
+    """
+
+    def __init__(self, name, pool_size=DEFAULT_POOL_SIZE):
+        self.name = name
+        self.pool_size = pool_size
+        self.started_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._running = {}  # (job_id, scheduled run time) -> [start times]
+        self._finished_early = set()  # Runs whose executed event beat the submitted event
+        self.peak_running = 0
+        self.busy_seconds = 0.0
+        self.counts = {"submitted": 0, "completed": 0, "errors": 0, "missed": 0, "max_instances_skipped": 0}
+        self.longest_run = (None, 0.0)  # (job_id, seconds)
+
+    def attach(self, scheduler):
+        scheduler.add_listener(
+            self._on_event,
+            EVENT_JOB_SUBMITTED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES
+        )
+        return self
+
+    def _on_event(self, event):
+        now = time.monotonic()
+        with self._lock:
+            if event.code == EVENT_JOB_SUBMITTED:
+                self.counts["submitted"] += 1
+                for run_time in event.scheduled_run_times[:1]:
+                    key = (event.job_id, run_time)
+                    if key in self._finished_early:
+                        self._finished_early.discard(key)
+                    else:
+                        self._running.setdefault(key, []).append(now)
+                self.peak_running = max(self.peak_running, self._running_count())
+            elif event.code in (EVENT_JOB_EXECUTED, EVENT_JOB_ERROR):
+                self.counts["completed" if event.code == EVENT_JOB_EXECUTED else "errors"] += 1
+                key = (event.job_id, event.scheduled_run_time)
+                starts = self._running.get(key)
+                if not starts:
+                    # Very short job: it finished before its submission was recorded
+                    self._finished_early.add(key)
+                else:
+                    duration = now - starts.pop(0)
+                    self.busy_seconds += duration
+                    if duration > self.longest_run[1]:
+                        self.longest_run = (event.job_id, duration)
+                    if not starts:
+                        del self._running[key]
+            elif event.code == EVENT_JOB_MISSED:
+                self.counts["missed"] += 1
+            elif event.code == EVENT_JOB_MAX_INSTANCES:
+                self.counts["max_instances_skipped"] += 1
+
+    def _running_count(self):
+        return sum(len(starts) for starts in self._running.values())
+
+    def status(self):
+        now = time.monotonic()
+        with self._lock:
+            # Submitted runs beyond the pool size are waiting for a thread
+            active = self._running_count()
+            busy = min(active, self.pool_size)
+            # Runs still in flight count towards busy time up to now
+            in_flight = sum(now - start for starts in self._running.values() for start in starts)
+            capacity = max(now - self.started_at, 1e-9) * self.pool_size
+            return {
+                "name": self.name,
+                "pool_size": self.pool_size,
+                "busy_threads": busy,
+                "queued_runs": active - busy,
+                "peak_active_runs": self.peak_running,
+                "utilization": round(busy / self.pool_size, 3),
+                "average_utilization": round(min(self.busy_seconds + in_flight, capacity) / capacity, 4),
+                "busy_seconds": round(self.busy_seconds + in_flight, 3),
+                "longest_run": {"job_id": self.longest_run[0], "seconds": round(self.longest_run[1], 3)},
+                **self.counts
+            }
+
+
+_metrics = {}
+
+
+def track_scheduler(scheduler, name, pool_size=DEFAULT_POOL_SIZE):
+    """Start collecting utilization metrics for a scheduler under `name`"""
+    metrics = _metrics[name] = SchedulerMetrics(name, pool_size).attach(scheduler)
+    return metrics
+
+
+def scheduler_metrics(name=None):
+    """Metrics for one tracked scheduler, or all of them by name"""
+    if name is not None:
+        metrics = _metrics.get(name)
+        return metrics.status() if metrics else None
+    return {name: metrics.status() for name, metrics in _metrics.items()}
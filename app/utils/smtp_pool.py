@@ -0,0 +1,188 @@
+# app/utils/smtp_pool.py
+import atexit
+import logging
+import smtplib
+import socket
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Errors meaning the session itself is gone. Not OSError: every SMTPException
+# subclasses it, and a refused recipient or failed login must not be resent
+_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, socket.timeout)
+
+
+class _PooledConnection:
+    def __init__(self, server):
+        self.server = server
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.messages_sent = 0
+
+
+class SMTPConnectionPool:
+    """
+    Reuses authenticated SMTP sessions instead of connecting, running
+    STARTTLS and logging in for every message.
+
+    At most max_size connections exist at once; callers wait up to
+    acquire_timeout for a free one. A connection idle for longer than
+    health_check_after seconds is checked with NOOP before reuse, and one
+    that is older than max_age seconds or has sent max_messages messages
+    is closed and replaced. A send that fails because the server dropped
+    the connection is retried once on a fresh connection.
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_tls=True,
+                 max_size=2, timeout=30, acquire_timeout=60,
+                 health_check_after=30, max_age=300, max_messages=100):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.max_size = max_size
+        self.timeout = timeout
+        self.acquire_timeout = acquire_timeout
+        self.health_check_after = health_check_after
+        self.max_age = max_age
+        self.max_messages = max_messages
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self.stats = {"connections_opened": 0, "connections_reused": 0, "reconnects": 0, "messages_sent": 0}
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.username and self.password:
+                server.login(self.username, self.password)
+        except Exception:
+            self._close(server)
+            raise
+        self.stats["connections_opened"] += 1
+        return _PooledConnection(server)
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _is_usable(self, conn):
+        now = time.monotonic()
+        if now - conn.created_at > self.max_age or conn.messages_sent >= self.max_messages:
+            return False
+        if now - conn.last_used > self.health_check_after:
+            try:
+                return conn.server.noop()[0] == 250
+            except Exception:
+                return False
+        return True
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return self._connect()
+            if self._is_usable(conn):
+                self.stats["connections_reused"] += 1
+                return conn
+            self._close(conn.server)
+
+    @contextmanager
+    def connection(self):
+        """Borrow an authenticated smtplib.SMTP; broken connections are not returned to the pool"""
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise smtplib.SMTPException("Timed out waiting for a free SMTP connection")
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn.server
+            conn.last_used = time.monotonic()
+            conn.messages_sent += 1
+            with self._lock:
+                self._idle.append(conn)
+            conn = None
+        finally:
+            if conn is not None:
+                self._close(conn.server)
+            self._slots.release()
+
+    def _send(self, send):
+        try:
+            with self.connection() as server:
+                result = send(server)
+        except _CONNECTION_ERRORS as e:
+            # Server dropped a pooled session (idle timeout, restart): retry once
+            logger.info(f"SMTP connection to {self.host} lost ({str(e)}), reconnecting")
+            self.stats["reconnects"] += 1
+            self.clear()
+            with self.connection() as server:
+                result = send(server)
+        self.stats["messages_sent"] += 1
+        return result
+
+    def send_message(self, msg, from_addr=None, to_addrs=None):
+        return self._send(lambda server: server.send_message(msg, from_addr, to_addrs))
+
+    def sendmail(self, from_addr, to_addrs, msg):
+        return self._send(lambda server: server.sendmail(from_addr, to_addrs, msg))
+
+    def clear(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for conn in idle:
+            self._close(conn.server)
+
+    def status(self):
+        return dict(self.stats, host=self.host, idle=len(self._idle), max_size=self.max_size)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_smtp_pool(host, port, username=None, password=None, max_size=2, **options):
+    """Get the process-wide pool for an SMTP server and account"""
+    key = (host, port, username)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.password != password:
+            if pool is not None:
+                pool.clear()
+            pool = _pools[key] = SMTPConnectionPool(host, port, username, password, max_size=max_size, **options)
+        return pool
+
+
+def get_app_smtp_pool(app):
+    """Pool for the SMTP_* settings of a Flask app"""
+    config = app.config
+    return get_smtp_pool(
+        config.get('SMTP_HOST', 'smtp.gmail.com'),
+        config.get('SMTP_PORT', 587),
+        config.get('SMTP_USERNAME'),
+        config.get('SMTP_PASSWORD'),
+        max_size=config.get('SMTP_POOL_MAX_SIZE', 2),
+        health_check_after=config.get('SMTP_POOL_HEALTH_CHECK_SECONDS', 30),
+        max_age=config.get('SMTP_POOL_MAX_CONNECTION_AGE', 300)
+    )
+
+
+def close_all_pools():
+    for pool in list(_pools.values()):
+        pool.clear()
+
+
+atexit.register(close_all_pools)
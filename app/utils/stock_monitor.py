@@ -1,10 +1,12 @@
 
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List, Dict, Any
 from flask import current_app
+from sqlalchemy import case, func
 from app import db
 from ..models.admin import IncubateeProduct, Incubatee
+from ..models.reservation import Reservation
 
 logger = logging.getLogger(__name__)
 
@@ -53,6 +55,76 @@ class StockMonitor:
             logger.error(f"Error checking low stock products: {str(e)}")
             return []
     
+    @classmethod
+    def low_stock_sweep(cls, days_back: int = 7) -> List[Dict[str, Any]]:
+        """
+        Low stock products with incubatee info and sold quantities, in one
+        grouped query: every low stock product is joined to its reservations
+        once and the three sold figures are conditional sums. Each product
+        dict carries 'sold_info' in the shape of EmailTemplates.get_sold_quantities.
+        """
+        try:
+            since_date = datetime.utcnow() - timedelta(days=days_back)
+            completed = Reservation.status == 'completed'
+            quantity = func.coalesce(Reservation.quantity, 0)
+            
+            rows = db.session.query(
+                IncubateeProduct.product_id,
+                IncubateeProduct.name,
+                IncubateeProduct.stock_no,
+                IncubateeProduct.stock_amount,
+                Incubatee.incubatee_id,
+                Incubatee.first_name,
+                Incubatee.last_name,
+                Incubatee.company_name,
+                Incubatee.email,
+                Incubatee.phone_number,
+                func.sum(case((completed & (Reservation.completed_at >= since_date), quantity), else_=0)),
+                func.sum(case((Reservation.status.in_(['pending', 'approved']), quantity), else_=0)),
+                func.sum(case((completed, quantity), else_=0))
+            ).join(
+                Incubatee, IncubateeProduct.incubatee_id == Incubatee.incubatee_id
+            ).outerjoin(
+                Reservation, Reservation.product_id == IncubateeProduct.product_id
+            ).filter(
+                IncubateeProduct.stock_amount <= cls.LOW_STOCK_THRESHOLD,
+                Incubatee.is_approved == True
+            ).group_by(
+                IncubateeProduct.product_id,
+                Incubatee.incubatee_id
+            ).all()
+            
+            now = datetime.utcnow()
+            products_list = []
+            for (product_id, name, stock_no, stock_amount, incubatee_id, first_name, last_name,
+                 company_name, email, phone, last_7_days, pending_sold, total_sold) in rows:
+                products_list.append({
+                    'product_id': product_id,
+                    'product_name': name,
+                    'stock_no': stock_no,
+                    'current_stock': stock_amount,
+                    'threshold': cls.LOW_STOCK_THRESHOLD,
+                    'incubatee_id': incubatee_id,
+                    'incubatee_name': f"{first_name} {last_name}",
+                    'company_name': company_name,
+                    'email': email,
+                    'phone': phone,
+                    'last_checked': now,
+                    'sold_info': {
+                        'last_7_days': int(last_7_days or 0),
+                        'pending_sold': int(pending_sold or 0),
+                        'total_sold_all_time': int(total_sold or 0),
+                        'trend': 'increasing' if last_7_days else 'stable'
+                    }
+                })
+            
+            logger.info(f"Found {len(products_list)} products with low stock")
+            return products_list
+            
+        except Exception as e:
+            logger.error(f"Error in low stock sweep: {str(e)}")
+            return []
+    
     @classmethod
     def get_product_stock_status(cls, product_id: int) -> Dict[str, Any]:
         """Get stock status for a specific product"""
@@ -46,8 +46,8 @@ class StockNotificationManager:
         }
         
         try:
-            # Get all low stock products
-            low_stock_products = StockMonitor.check_low_stock_products()
+            # Low stock products with their sold quantities, in one query
+            low_stock_products = StockMonitor.low_stock_sweep()
             summary['total_products_checked'] = len(low_stock_products)
             summary['low_stock_products'] = len(low_stock_products)
             
@@ -58,65 +58,42 @@ class StockNotificationManager:
             
             logger.info(f"📊 Found {len(low_stock_products)} low stock products")
             
-            # Send notifications
-            sent_to_incubatees = set()
+            # Queue one digest per incubatee for the whole sweep at once; EmailSender
+            # applies the email interval and logs what it skips
+            queued = EmailSender.queue_low_stock_notifications(low_stock_products)
+            now = datetime.utcnow().isoformat()
             
-            for product in low_stock_products:
-                product_key = f"{product['product_id']}_{product['incubatee_id']}"
-                
-                # Always send for demo (bypass cooldown check)
-                # Comment out the next 3 lines if you want to re-enable cooldown
-                # if not self.should_send_notification(product_key):
-                #     logger.info(f"⏸️ Skipping notification for product {product['product_id']} - cooldown active")
-                #     continue
-                
-                # Send notification to incubatee
-                if product.get('email'):
-                    try:
-                        logger.info(f"📧 Attempting to send email to {product['email']} for product {product['product_name']}")
-                        
-                        success = EmailSender.send_low_stock_notification(product)
-                        
-                        if success:
-                            summary['notifications_sent'] += 1
-                            sent_to_incubatees.add(product['incubatee_id'])
-                            self.mark_notification_sent(product_key)
-                            summary['details'].append({
-                                'product_id': product['product_id'],
-                                'product_name': product['product_name'],
-                                'incubatee_email': product['email'],
-                                'status': 'sent',
-                                'timestamp': datetime.utcnow().isoformat()
-                            })
-                            logger.info(f"✅ Low stock notification sent for {product['product_name']} to {product['email']}")
-                        else:
-                            summary['failed_notifications'] += 1
-                            summary['details'].append({
-                                'product_id': product['product_id'],
-                                'product_name': product['product_name'],
-                                'incubatee_email': product['email'],
-                                'status': 'failed',
-                                'timestamp': datetime.utcnow().isoformat()
-                            })
-                            logger.error(f"❌ Failed to send notification for {product['product_name']}")
-                    except Exception as e:
-                        logger.error(f"Error sending notification for product {product['product_id']}: {str(e)}")
-                        summary['failed_notifications'] += 1
-                        summary['details'].append({
-                            'product_id': product['product_id'],
-                            'product_name': product['product_name'],
-                            'status': 'error',
-                            'error': str(e)
-                        })
-                else:
-                    logger.warning(f"No email found for incubatee of product {product['product_name']}")
-                    summary['details'].append({
-                        'product_id': product['product_id'],
-                        'product_name': product['product_name'],
-                        'status': 'skipped_no_email',
-                        'reason': 'No incubatee email found'
-                    })
+            for product in queued['queued']:
+                self.mark_notification_sent(f"{product['product_id']}_{product['incubatee_id']}")
+                summary['details'].append({
+                    'product_id': product['product_id'],
+                    'product_name': product['product_name'],
+                    'incubatee_email': product['email'],
+                    'status': 'sent',
+                    'timestamp': now
+                })
+            
+            for product in queued['skipped'] + queued['failed']:
+                summary['details'].append({
+                    'product_id': product['product_id'],
+                    'product_name': product['product_name'],
+                    'incubatee_email': product['email'],
+                    'status': 'failed',
+                    'timestamp': now
+                })
+            
+            for product in queued['no_email']:
+                logger.warning(f"No email found for incubatee of product {product['product_name']}")
+                summary['details'].append({
+                    'product_id': product['product_id'],
+                    'product_name': product['product_name'],
+                    'status': 'skipped_no_email',
+                    'reason': 'No incubatee email found'
+                })
             
+            summary['notifications_sent'] = queued['emails']
+            summary['products_notified'] = len(queued['queued'])
+            summary['failed_notifications'] = len(queued['skipped']) + len(queued['failed'])
             # Log summary
             logger.info(f"📊 Notification Summary: Sent {summary['notifications_sent']}, Failed {summary['failed_notifications']}")
             
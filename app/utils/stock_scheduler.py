@@ -1,106 +1,97 @@
 # app/utils/stock_scheduler.py
 import logging
+from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
-from datetime import datetime
+from datetime import datetime, timedelta
 from flask import current_app
 from .stock_notification_manager import StockNotificationManager
+from .scheduler_lease import get_lease, interval_lease_ttl
+from .scheduler_metrics import track_scheduler
 
 logger = logging.getLogger(__name__)
 
 class StockNotificationScheduler:
     """Scheduler for automatic stock notifications"""
     
+    POOL_SIZE = 4
+    
     def __init__(self):
         self.scheduler = None
         self.notification_manager = StockNotificationManager()
-        self.first_run_done = False
+        self.metrics = None
+        self.lease = get_lease('stock_notification_scheduler', interval_lease_ttl(5 * 60))
     
     def start(self, app):
-        """Start the scheduler with 5-minute interval, sending 2 emails"""
+        """
+        Start one interval job per NOTIFICATION_BATCHES entry. Every job repeats
+        each STOCK_CHECK_INTERVAL_MINUTES and its first run is shifted by the
+        batch's minute_offset, so batches land at fixed minutes of the cycle
+        without any job thread waiting.
+        """
         try:
             if self.scheduler and self.scheduler.running:
                 logger.info("Scheduler already running")
                 return
             
-            self.scheduler = BackgroundScheduler()
-            
-            # Schedule the FIRST email notification at 0 minutes (immediate start)
-            self.scheduler.add_job(
-                id='first_stock_check',
-                func=self.send_first_notification_job,
-                trigger='interval',
-                minutes=5,  # 5-minute interval
-                args=[app],
-                replace_existing=True,
-                next_run_time=datetime.now()  # Start immediately
-            )
+            self.scheduler = BackgroundScheduler(executors={'default': ThreadPoolExecutor(self.POOL_SIZE)})
+            self.metrics = track_scheduler(self.scheduler, 'stock_notification_scheduler', self.POOL_SIZE)
             
-            # Schedule the SECOND email notification at 4 minutes (1 minute before next cycle)
-            self.scheduler.add_job(
-                id='second_stock_check',
-                func=self.send_second_notification_job,
-                trigger='interval',
-                minutes=5,  # 5-minute interval
-                args=[app],
-                replace_existing=True,
-                next_run_time=datetime.now()  # Start immediately
-            )
+            interval_minutes = app.config.get('STOCK_CHECK_INTERVAL_MINUTES', 5)
+            cycle_start = datetime.now()
+            for batch in app.config.get('NOTIFICATION_BATCHES', []):
+                self.scheduler.add_job(
+                    id=f"stock_check_{batch['name']}",
+                    func=self.send_notification_job,
+                    trigger=IntervalTrigger(
+                        minutes=interval_minutes,
+                        start_date=cycle_start + timedelta(minutes=batch.get('minute_offset', 0))
+                    ),
+                    args=[app, batch['name']],
+                    max_instances=1,
+                    coalesce=True,
+                    replace_existing=True
+                )
+                logger.info(f"   - {batch['name']} at minute {batch.get('minute_offset', 0)}")
             
             self.scheduler.start()
-            logger.info("✅ Stock notification scheduler started")
-            logger.info("📧 Email notifications will send 2 times within each 5-minute interval")
-            logger.info("   - First email at 0 minute mark")
-            logger.info("   - Second email at 4 minute mark")
+            logger.info(f"✅ Stock notification scheduler started ({interval_minutes}-minute cycle)")
             
         except Exception as e:
             logger.error(f"❌ Failed to start scheduler: {str(e)}")
     
-    def send_first_notification_job(self, app):
-        """First notification job - runs at minute 0 of each 5-minute cycle"""
-        with app.app_context():
-            logger.info(f"📧 FIRST NOTIFICATION - Running at {datetime.now().strftime('%H:%M:%S')}")
-            
-            if current_app.config.get('AUTO_STOCK_NOTIFICATIONS', True):
-                try:
-                    result = self.notification_manager.auto_check_low_stock()
-                    logger.info(f"✅ First notification sent: {result.get('message', 'No result')}")
-                    return result
-                except Exception as e:
-                    logger.error(f"❌ Error in first notification: {str(e)}")
-                    return {'error': str(e)}
-            else:
-                logger.info("⏸️ Auto notifications disabled")
-                return {'auto_check': False, 'message': 'Auto notifications disabled'}
-    
-    def send_second_notification_job(self, app):
-        """Second notification job - runs at minute 4 of each 5-minute cycle"""
+    def send_notification_job(self, app, batch_name):
+        """Notification job for one NOTIFICATION_BATCHES entry"""
         with app.app_context():
-            # Wait 4 minutes before sending second notification
-            # This is handled by the job starting immediately and then running every 5 minutes
-            # The first job runs at minute 0, this runs at minute 4
+            if not self.lease.acquire():
+                logger.debug(f"⏭️ {batch_name} skipped - another worker holds the lease")
+                return {'skipped': True, 'message': 'Not the leader worker'}
             
-            import time
-            # We'll wait 4 minutes after the first run
-            if not self.first_run_done:
-                time.sleep(240)  # Wait 4 minutes (240 seconds)
-                self.first_run_done = True
-            
-            logger.info(f"📧 SECOND NOTIFICATION - Running at {datetime.now().strftime('%H:%M:%S')}")
+            logger.info(f"📧 {batch_name.upper()} - Running at {datetime.now().strftime('%H:%M:%S')}")
             
             if current_app.config.get('AUTO_STOCK_NOTIFICATIONS', True):
                 try:
-                    # Add a small delay to ensure it's 4 minutes after the first
                     result = self.notification_manager.auto_check_low_stock()
-                    logger.info(f"✅ Second notification sent: {result.get('message', 'No result')}")
+                    logger.info(f"✅ {batch_name} sent: {result.get('message', 'No result')}")
                     return result
                 except Exception as e:
-                    logger.error(f"❌ Error in second notification: {str(e)}")
+                    logger.error(f"❌ Error in {batch_name}: {str(e)}")
                     return {'error': str(e)}
             else:
                 logger.info("⏸️ Auto notifications disabled")
                 return {'auto_check': False, 'message': 'Auto notifications disabled'}
     
+    def get_status(self):
+        """Get scheduler status including which worker holds the lease"""
+        jobs = self.scheduler.get_jobs() if self.scheduler and self.scheduler.running else []
+        return {
+            'scheduler_running': bool(self.scheduler and self.scheduler.running),
+            'jobs': [job.id for job in jobs],
+            'next_run_times': [str(job.next_run_time) for job in jobs],
+            'lease': self.lease.status(),
+            'thread_pool': self.metrics.status() if self.metrics else None
+        }
+    
     def stop(self):
         """Stop the scheduler"""
         if self.scheduler and self.scheduler.running:
@@ -111,7 +102,8 @@ class StockNotificationScheduler:
         """Manually trigger a check (for testing or immediate needs)"""
         with app.app_context():
             logger.info("🔧 Manually triggering stock check")
-            return self.send_first_notification_job(app)
+            batches = app.config.get('NOTIFICATION_BATCHES') or [{'name': 'manual'}]
+            return self.send_notification_job(app, batches[0]['name'])
 
 # Global scheduler instance
 stock_scheduler = StockNotificationScheduler()
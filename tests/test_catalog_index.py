@@ -0,0 +1,88 @@
+# tests/test_catalog_index.py
+import uuid
+
+import pytest
+from flask import Flask
+from sqlalchemy import delete
+
+from app.extension import db
+from app.models.admin import Incubatee, IncubateeProduct, PricingUnit
+from app.services.catalog_index import CatalogIndex
+
+
+@pytest.fixture
+def app(tmp_path):
+    test_app = Flask(__name__)
+    test_app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'catalog.db'}"
+    db.init_app(test_app)
+
+    with test_app.app_context():
+        tables = [PricingUnit.__table__, Incubatee.__table__, IncubateeProduct.__table__]
+        db.metadata.create_all(db.engine, tables=tables)
+        yield test_app
+        db.session.remove()
+        db.metadata.drop_all(db.engine, tables=tables)
+
+
+@pytest.fixture
+def products(app):
+    """Product name -> id for a small catalog"""
+    unit = PricingUnit(unit_name=f"unit-{uuid.uuid4().hex[:8]}")
+    incubatee = Incubatee(first_name="Index", last_name="Test", company_name="Sweet Corner")
+    db.session.add_all([unit, incubatee])
+    db.session.flush()
+    names = ["Chocolate Cake", "Cupcake", "Pancake Mix", "Mango Jam"]
+    rows = [
+        IncubateeProduct(
+            incubatee_id=incubatee.incubatee_id, name=name, stock_no=uuid.uuid4().hex[:12],
+            products=name, details="Homemade", stock_amount=5, price_per_stocks=10,
+            pricing_unit_id=unit.unit_id
+        )
+        for name in names
+    ]
+    db.session.add_all(rows)
+    db.session.commit()
+    return {row.name: row.product_id for row in rows}
+
+
+@pytest.fixture
+def index(app, products):
+    catalog = CatalogIndex()
+    catalog.app = app
+    assert catalog.rebuild()
+    return catalog
+
+
+def _names(result):
+    return [payload["name"] for payload in result]
+
+
+def test_matches_inside_words(index):
+    result, total = index.search("cake")
+
+    assert total == 3
+    assert set(_names(result)) == {"Chocolate Cake", "Cupcake", "Pancake Mix"}
+    assert _names(result)[0] == "Chocolate Cake"  # Whole-word name match ranks first
+
+
+def test_short_and_multi_word_terms(index):
+    assert _names(index.search("pc")[0]) == ["Cupcake"]
+    assert _names(index.search("choc ca")[0]) == ["Chocolate Cake"]
+    assert _names(index.search("ncak mi")[0]) == ["Pancake Mix"]
+    assert index.search("cakes") == ([], 0)
+
+
+def test_other_fields_and_pages(index):
+    result, total = index.search("sweet", page=2, per_page=3)
+
+    assert total == 4  # Company name matches every product
+    assert len(result) == 1
+
+
+def test_deleted_product_leaves_index(index, products):
+    db.session.execute(delete(IncubateeProduct).where(IncubateeProduct.product_id == products["Cupcake"]))
+    db.session.commit()
+    index.apply(delete=[products["Cupcake"]])
+
+    assert set(_names(index.search("cake")[0])) == {"Chocolate Cake", "Pancake Mix"}
+    assert index.search("upc") == ([], 0)
@@ -0,0 +1,164 @@
+# tests/test_reservation_service.py
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from flask import Flask
+from sqlalchemy import delete
+
+from app.extension import db
+from app.models.admin import Incubatee, IncubateeProduct, PricingUnit
+from app.models.reservation import Reservation
+from app.models.user import User
+from app.services.reservation_service import APPROVAL_DELAY_MINUTES, ReservationService
+
+DATABASE_URL = os.environ.get("TEST_DATABASE_URL", "")
+
+# SQLite ignores FOR UPDATE / SKIP LOCKED, so only PostgreSQL shows whether
+# concurrent allocators keep each queue to themselves
+pytestmark = pytest.mark.skipif(
+    not DATABASE_URL.startswith("postgresql"),
+    reason="allocate_pending() row locking needs TEST_DATABASE_URL pointing at PostgreSQL"
+)
+
+THREADS = 8
+ATTEMPTS_PER_THREAD = 5
+PRODUCTS = 4
+RESERVATIONS_PER_PRODUCT = 40
+INITIAL_STOCK = 50  # Fewer units than the ~80 reserved per product
+
+
+@pytest.fixture
+def app():
+    test_app = Flask(__name__)
+    test_app.config["SQLALCHEMY_DATABASE_URI"] = DATABASE_URL
+    db.init_app(test_app)
+
+    with test_app.app_context():
+        tables = [
+            PricingUnit.__table__, Incubatee.__table__, IncubateeProduct.__table__,
+            User.__table__, Reservation.__table__
+        ]
+        db.metadata.create_all(db.engine, tables=tables)
+        yield test_app
+        db.session.remove()
+
+
+@pytest.fixture
+def queues(app):
+    """{product_id: {reservation_id: quantity}} of due pending reservations"""
+    suffix = uuid.uuid4().hex[:8]
+    unit = PricingUnit(unit_name=f"unit-{suffix}")
+    incubatee = Incubatee(first_name="Queue", last_name="Test")
+    user = User(username=f"queue-{suffix}", email=f"queue-{suffix}@example.com", password_hash="x")
+    db.session.add_all([unit, incubatee, user])
+    db.session.flush()
+
+    products = [
+        IncubateeProduct(
+            incubatee_id=incubatee.incubatee_id, name=f"Queue Test Jam {i}", stock_no=uuid.uuid4().hex[:12],
+            products="Jam", details="Concurrency test product", stock_amount=INITIAL_STOCK,
+            price_per_stocks=10, pricing_unit_id=unit.unit_id
+        )
+        for i in range(PRODUCTS)
+    ]
+    db.session.add_all(products)
+    db.session.flush()
+
+    due = datetime.now(timezone.utc) - timedelta(minutes=APPROVAL_DELAY_MINUTES + 5)
+    reservations = [
+        Reservation(
+            user_id=user.id_no, product_id=product.product_id, quantity=1 + i % 3,
+            status="pending", reserved_at=due + timedelta(seconds=i)
+        )
+        for product in products
+        for i in range(RESERVATIONS_PER_PRODUCT)
+    ]
+    db.session.add_all(reservations)
+    db.session.commit()
+    yield {
+        product.product_id: {
+            reservation.reservation_id: reservation.quantity
+            for reservation in reservations if reservation.product_id == product.product_id
+        }
+        for product in products
+    }
+
+    # Core deletes: ORM cascades would touch tables this test does not create
+    db.session.rollback()
+    product_ids = [product.product_id for product in products]
+    db.session.execute(delete(Reservation).where(Reservation.product_id.in_(product_ids)))
+    db.session.execute(delete(IncubateeProduct).where(IncubateeProduct.product_id.in_(product_ids)))
+    db.session.execute(delete(User).where(User.id_no == user.id_no))
+    db.session.execute(delete(Incubatee).where(Incubatee.incubatee_id == incubatee.incubatee_id))
+    db.session.execute(delete(PricingUnit).where(PricingUnit.unit_id == unit.unit_id))
+    db.session.commit()
+
+
+def _allocate_concurrently(app, product_ids):
+    """Every thread calls allocate_pending() ATTEMPTS_PER_THREAD times in its own session"""
+    results = []
+    errors = []
+    results_lock = threading.Lock()
+    start = threading.Barrier(THREADS)
+
+    def worker():
+        with app.app_context():
+            start.wait()
+            for _ in range(ATTEMPTS_PER_THREAD):
+                try:
+                    allocated = ReservationService.allocate_pending(product_ids)
+                except Exception as e:
+                    db.session.rollback()
+                    with results_lock:
+                        errors.append(e)
+                    continue
+                with results_lock:
+                    results.append(allocated)
+            db.session.remove()
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_allocators_decide_each_reservation_once(app, queues):
+    product_ids = list(queues)
+
+    results, errors = _allocate_concurrently(app, product_ids)
+
+    assert not errors
+    decided = {}
+    for allocated in results:
+        for product_id, result in allocated.items():
+            assert result["remaining_stock"] >= 0
+            for reservation_id, decision in result["decisions"].items():
+                assert reservation_id not in decided  # Decided by two allocators
+                assert reservation_id in queues[product_id]
+                decided[reservation_id] = decision[0]
+
+    assert set(decided) == {reservation_id for queue in queues.values() for reservation_id in queue}
+    assert ReservationService.allocate_pending(product_ids) == {}
+
+    db.session.expire_all()
+    statuses = dict(
+        db.session.query(Reservation.reservation_id, Reservation.status)
+        .filter(Reservation.product_id.in_(product_ids))
+        .all()
+    )
+    assert statuses == decided
+
+    stock = dict(
+        db.session.query(IncubateeProduct.product_id, IncubateeProduct.stock_amount)
+        .filter(IncubateeProduct.product_id.in_(product_ids))
+        .all()
+    )
+    for product_id, queue in queues.items():
+        approved = sum(quantity for reservation_id, quantity in queue.items() if decided[reservation_id] == "approved")
+        assert stock[product_id] >= 0
+        assert approved == INITIAL_STOCK - stock[product_id]
@@ -0,0 +1,162 @@
+# tests/test_smtp_pool.py
+import smtplib
+import socket
+import threading
+import time
+from email.message import EmailMessage
+
+import pytest
+
+from app.utils.smtp_pool import SMTPConnectionPool
+
+controller_module = pytest.importorskip("aiosmtpd.controller")
+
+REFUSED = "refused@example.com"
+
+
+class RecordingHandler:
+    """Accepts every message except those to REFUSED, counting RCPT attempts"""
+
+    def __init__(self):
+        self.messages = []
+        self.rcpt_attempts = {}
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        self.rcpt_attempts[address] = self.rcpt_attempts.get(address, 0) + 1
+        if address == REFUSED:
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 Message accepted"
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start(handler, port):
+    controller = controller_module.Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    return controller
+
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = _start(handler, _free_port())
+    yield controller, handler
+    controller.stop()
+
+
+def _pool(controller, **options):
+    return SMTPConnectionPool(controller.hostname, controller.port, use_tls=False, **options)
+
+
+def _message(to="user@example.com"):
+    msg = EmailMessage()
+    msg["From"] = "shop@example.com"
+    msg["To"] = to
+    msg["Subject"] = "Reservation update"
+    msg.set_content("Your reservation is ready.")
+    return msg
+
+
+def test_reuses_one_session_for_sequential_sends(smtp_server):
+    controller, handler = smtp_server
+    pool = _pool(controller)
+
+    for _ in range(5):
+        pool.send_message(_message())
+
+    assert len(handler.messages) == 5
+    assert pool.stats["connections_opened"] == 1
+    assert pool.stats["connections_reused"] == 4
+    pool.clear()
+
+
+def test_reconnects_once_when_server_drops_session():
+    handler = RecordingHandler()
+    controller = _start(handler, _free_port())
+    pool = _pool(controller)
+    pool.send_message(_message())
+
+    # Restarting the server kills the pooled session
+    controller.stop()
+    controller = _start(handler, controller.port)
+    try:
+        pool.send_message(_message())
+    finally:
+        controller.stop()
+
+    assert len(handler.messages) == 2
+    assert pool.stats["reconnects"] == 1
+    assert pool.stats["connections_opened"] == 2
+    pool.clear()
+
+
+def test_refused_recipient_is_not_retried(smtp_server):
+    controller, handler = smtp_server
+    pool = _pool(controller, max_size=2)
+    pool.send_message(_message())
+
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        pool.send_message(_message(to=REFUSED))
+
+    assert handler.rcpt_attempts[REFUSED] == 1
+    assert pool.stats["reconnects"] == 0
+    pool.clear()
+
+
+def test_acquire_timeout_is_not_retried(smtp_server):
+    controller, _ = smtp_server
+    pool = _pool(controller, max_size=1, acquire_timeout=0.2)
+    held = threading.Event()
+    release = threading.Event()
+
+    def hold_connection():
+        with pool.connection():
+            held.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold_connection)
+    holder.start()
+    held.wait(5)
+    started = time.monotonic()
+    try:
+        with pytest.raises(smtplib.SMTPException, match="Timed out waiting"):
+            pool.send_message(_message())
+        elapsed = time.monotonic() - started
+    finally:
+        release.set()
+        holder.join()
+
+    assert elapsed < 0.4  # One acquire_timeout wait, not two
+    assert pool.stats["reconnects"] == 0
+    pool.clear()
+
+
+def test_pooled_sends_are_faster_than_a_connection_per_message(smtp_server):
+    controller, _ = smtp_server
+    count = 20
+
+    started = time.perf_counter()
+    for _ in range(count):
+        with smtplib.SMTP(controller.hostname, controller.port, timeout=10) as server:
+            server.send_message(_message())
+    per_connection = (time.perf_counter() - started) / count
+
+    pool = _pool(controller)
+    started = time.perf_counter()
+    for _ in range(count):
+        pool.send_message(_message())
+    pooled = (time.perf_counter() - started) / count
+    pool.clear()
+
+    print(f"per-email latency: {per_connection * 1000:.2f} ms per connection, {pooled * 1000:.2f} ms pooled")
+    assert pool.stats["connections_opened"] == 1
+    assert pooled < per_connection
@@ -0,0 +1,166 @@
+# tests/test_stock_service.py
+import os
+import threading
+import uuid
+
+import pytest
+from flask import Flask
+from sqlalchemy import delete
+
+from app.extension import db
+from app.models.admin import Incubatee, IncubateeProduct, PricingUnit
+from app.services.stock_service import StockService
+
+THREADS = 16
+ATTEMPTS_PER_THREAD = 10
+
+
+@pytest.fixture
+def app(tmp_path):
+    """
+    Minimal app bound to TEST_DATABASE_URL (a local PostgreSQL for the real
+    row-locking behaviour), or to a throwaway SQLite file.
+    """
+    test_app = Flask(__name__)
+    database_url = os.environ.get("TEST_DATABASE_URL")
+    if database_url:
+        test_app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+    else:
+        test_app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'stock.db'}"
+        test_app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"connect_args": {"timeout": 30}}
+    db.init_app(test_app)
+
+    with test_app.app_context():
+        tables = [PricingUnit.__table__, Incubatee.__table__, IncubateeProduct.__table__]
+        db.metadata.create_all(db.engine, tables=tables)
+        yield test_app
+        db.session.remove()
+        if not database_url:
+            db.metadata.drop_all(db.engine, tables=tables)
+
+
+@pytest.fixture
+def product(app):
+    unit = PricingUnit(unit_name=f"unit-{uuid.uuid4().hex[:8]}")
+    db.session.add(unit)
+    db.session.flush()
+    incubatee = Incubatee(first_name="Stock", last_name="Test")
+    db.session.add(incubatee)
+    db.session.flush()
+    product = IncubateeProduct(
+        incubatee_id=incubatee.incubatee_id, name="Stress Test Jam", stock_no=uuid.uuid4().hex[:12],
+        products="Jam", details="Concurrency test product", stock_amount=0,
+        price_per_stocks=10, pricing_unit_id=unit.unit_id
+    )
+    db.session.add(product)
+    db.session.commit()
+    yield product.product_id
+
+    # Core deletes: ORM cascades would touch tables this test does not create
+    db.session.rollback()
+    db.session.execute(delete(IncubateeProduct).where(IncubateeProduct.product_id == product.product_id))
+    db.session.execute(delete(Incubatee).where(Incubatee.incubatee_id == incubatee.incubatee_id))
+    db.session.execute(delete(PricingUnit).where(PricingUnit.unit_id == unit.unit_id))
+    db.session.commit()
+
+
+def _set_stock(product_id, stock):
+    db.session.get(IncubateeProduct, product_id).stock_amount = stock
+    db.session.commit()
+
+
+def _stock(product_id):
+    db.session.expire_all()
+    return db.session.get(IncubateeProduct, product_id).stock_amount
+
+
+def _reserve_concurrently(app, product_id, quantity):
+    """Every thread calls reserve() ATTEMPTS_PER_THREAD times, each in its own transaction"""
+    results = []
+    errors = []
+    results_lock = threading.Lock()
+    start = threading.Barrier(THREADS)
+
+    def worker():
+        with app.app_context():
+            start.wait()
+            for _ in range(ATTEMPTS_PER_THREAD):
+                try:
+                    remaining = StockService.reserve(product_id, quantity)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    with results_lock:
+                        errors.append(e)
+                    continue
+                with results_lock:
+                    results.append(remaining)
+            db.session.remove()
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_reserves_never_oversell(app, product):
+    initial_stock = 50  # Fewer units than the 160 attempts
+    _set_stock(product, initial_stock)
+
+    results, errors = _reserve_concurrently(app, product, 1)
+
+    assert not errors
+    granted = [remaining for remaining in results if remaining is not None]
+    assert len(granted) == initial_stock
+    assert all(remaining >= 0 for remaining in granted)
+    assert sorted(granted) == list(range(initial_stock))  # Each unit handed out exactly once
+    assert _stock(product) == 0
+
+
+def test_concurrent_reserves_refuse_partial_quantities(app, product):
+    _set_stock(product, 10)
+
+    results, errors = _reserve_concurrently(app, product, 3)
+
+    assert not errors
+    assert len([remaining for remaining in results if remaining is not None]) == 3
+    assert _stock(product) == 1
+
+
+def test_concurrent_reserve_and_release_keep_stock_consistent(app, product):
+    _set_stock(product, 20)
+    remaining_seen = []
+    errors = []
+    lock = threading.Lock()
+
+    def reserve_then_release():
+        with app.app_context():
+            for _ in range(ATTEMPTS_PER_THREAD):
+                try:
+                    remaining = StockService.reserve(product, 2)
+                    db.session.commit()
+                    if remaining is not None:
+                        StockService.release(product, 2)
+                        db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    remaining = None
+                    with lock:
+                        errors.append(e)
+                if remaining is not None:
+                    with lock:
+                        remaining_seen.append(remaining)
+            db.session.remove()
+
+    threads = [threading.Thread(target=reserve_then_release) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert remaining_seen
+    assert all(remaining >= 0 for remaining in remaining_seen)
+    assert _stock(product) == 20